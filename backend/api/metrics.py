@@ -4,30 +4,44 @@ Metrics API endpoints for the LLM Metrics Proxy.
 
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from backend.database.dao import completion_requests_dao
+from backend.utils.timestamps import parse_timestamp
 from shared.types import CompletionRequestData
 
 router = APIRouter(tags=["metrics"])
 
 
+def parse_date_param(name: str, value: Optional[str]) -> Optional[int]:
+    """Parse a start/end query parameter to UTC epoch milliseconds; 400 if it is not a date."""
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {name} date '{value}': expected ISO 8601 (e.g., 2024-01-01T00:00:00Z) or epoch milliseconds"
+        )
+
+
 def get_metrics(start_date: Optional[str] = None, end_date: Optional[str] = None):
     """Get enhanced metrics from the database with optional date filtering."""
     # Use the DAO to get metrics - this ensures consistent data access patterns
-    return completion_requests_dao.get_metrics(start_date, end_date)
+    return completion_requests_dao.get_metrics(parse_date_param("start", start_date), parse_date_param("end", end_date))
 
 
 def get_completion_requests(start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[CompletionRequestData]:
     """Get completion requests from the database with optional date filtering."""
     # Use the DAO to get completion requests - this ensures consistent data access patterns
-    return completion_requests_dao.get_completion_requests(start_date, end_date)
+    return completion_requests_dao.get_completion_requests(parse_date_param("start", start_date), parse_date_param("end", end_date))
 
 
 @router.get("/metrics")
 async def metrics_endpoint(
-    start: Optional[str] = Query(None, description="Start date in ISO format (e.g., 2024-01-01T00:00:00)"),
-    end: Optional[str] = Query(None, description="End date in ISO format (e.g., 2024-01-02T00:00:00)")
+    start: Optional[str] = Query(None, description="Start date in ISO format, UTC unless it has an offset (e.g., 2024-01-01T00:00:00Z)"),
+    end: Optional[str] = Query(None, description="End date in ISO format, UTC unless it has an offset (e.g., 2024-01-02T00:00:00Z)")
 ):
     """Return current metrics as JSON with optional date filtering."""
     metrics = get_metrics(start, end)
@@ -36,8 +50,8 @@ async def metrics_endpoint(
 
 @router.get("/completion_requests")
 async def completion_requests_endpoint(
-    start: Optional[str] = Query(None, description="Start date in ISO format (e.g., 2024-01-01T00:00:00)"),
-    end: Optional[str] = Query(None, description="End date in ISO format (e.g., 2024-01-02T00:00:00)")
+    start: Optional[str] = Query(None, description="Start date in ISO format, UTC unless it has an offset (e.g., 2024-01-01T00:00:00Z)"),
+    end: Optional[str] = Query(None, description="End date in ISO format, UTC unless it has an offset (e.g., 2024-01-02T00:00:00Z)")
 ) -> List[CompletionRequestData]:
     """Return completion requests with optional date filtering."""
     requests = get_completion_requests(start, end)
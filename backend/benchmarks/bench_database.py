@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: database latency with per-call and persistent connections.
+
+Measures, on a database of --rows completion requests, the latency of a
+single-row insert, a batch insert of METRICS_BATCH_SIZE rows and a
+get_metrics call. The "per-call" rows approximate the original behaviour:
+every DAO call checks the data directory and opens (and closes) a new
+connection with SQLite's defaults. The "persistent" rows use the
+per-thread connections, opened once in WAL mode with the tuned PRAGMAs.
+
+Usage:
+    python -m backend.benchmarks.bench_database [--rows 50000] [--repeat 200]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List
+from unittest.mock import patch
+
+from backend.database import connection
+from backend.database.connection import close_all_connections
+from backend.database.dao import completion_requests_dao
+from backend.database.rollups import create_rollup_statements, register_rollup_functions
+from backend.database.schema import COMPLETION_REQUESTS_SCHEMA
+from backend.utils.config import Config
+from backend.utils.timestamps import now_ms
+
+
+def make_record(i: int, now: int) -> Dict[str, Any]:
+    """A typical request record, spread over the day before now (epoch milliseconds)."""
+    return {
+        "timestamp_ms": now - i % 86400 * 1000, "started_at_ms": now - i % 86400 * 1000 - 1200, "success": i % 50 != 0,
+        "status_code": 200 if i % 50 else 500, "response_time_ms": 1200 + i % 300, "model": f"model-{i % 5}",
+        "origin": f"client-{i % 20}", "is_streaming": i % 3 != 0, "max_tokens": 512, "temperature": 0.7,
+        "top_p": None, "message_count": 3, "prompt_tokens": 120, "completion_tokens": 250, "total_tokens": 370,
+        "finish_reason": "stop", "time_to_first_token_ms": 180 + i % 100, "time_to_last_token_ms": 1200,
+        "tokens_per_second": 308.3, "itl_mean_ms": 4.1, "itl_p50_ms": 3.9, "itl_p95_ms": 6.2,
+        "itl_p99_ms": 9.8, "itl_max_ms": 14.0, "backend": "http://ollama:11434",
+        "error_type": None if i % 50 else "http_error"
+    }
+
+
+@contextmanager
+def per_call_connection():
+    """The original get_db_connection: a new default connection for every call."""
+    connection.ensure_data_directory()
+    conn = sqlite3.connect(connection.get_db_path())
+    # The rollup queries need the sketch functions on any connection
+    register_rollup_functions(conn)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def measure(operation: Callable[[], Any], repeat: int) -> List[float]:
+    """Latencies of repeat calls, in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def run(repeat: int, batch: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+    now = now_ms()
+    record = make_record(1, now)
+    start = now - 3600 * 1000
+    return {
+        "insert 1 row": measure(lambda: completion_requests_dao.insert_completion_request(record), repeat),
+        f"insert {len(batch)} rows": measure(lambda: completion_requests_dao.insert_completion_requests(batch), max(repeat // 10, 5)),
+        "get_metrics (1h)": measure(lambda: completion_requests_dao.get_metrics(start_ms=start), max(repeat // 10, 5)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="rows in the database before measuring")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    now = now_ms()
+    batch = [make_record(i, now) for i in range(Config.METRICS_BATCH_SIZE)]
+    print(f"{args.rows} rows, {args.repeat} single-row inserts")
+    print(f"{'connections':<12} {'operation':<20} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for mode in ("per-call", "persistent"):
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "metrics.db")
+            with sqlite3.connect(db_path) as conn:
+                conn.execute(COMPLETION_REQUESTS_SCHEMA)
+                for statement in create_rollup_statements():
+                    conn.execute(statement)
+            with patch("backend.database.connection.get_db_path", return_value=db_path):
+                completion_requests_dao.insert_completion_requests([make_record(i, now) for i in range(args.rows)])
+                close_all_connections()
+                if mode == "per-call":
+                    # Back to the default rollback journal, as the original connections used
+                    with sqlite3.connect(db_path) as conn:
+                        conn.execute("PRAGMA journal_mode=DELETE")
+                    with patch("backend.database.dao.get_db_connection", per_call_connection):
+                        results = run(args.repeat, batch)
+                else:
+                    results = run(args.repeat, batch)
+                close_all_connections()
+
+            for operation, latencies in results.items():
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(f"{mode:<12} {operation:<20} {statistics.median(latencies):>9.3f} {p95:>9.3f} "
+                      f"{statistics.mean(latencies):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: logging overhead on the event loop with many concurrent streams.
+
+Runs N concurrent streamed completions through ProxyService against an
+in-process mock backend and reports the CPU time spent on the event loop
+thread under different logging setups. The "synchronous, every chunk" row
+approximates the original behaviour: records formatted and written to the
+output by the event loop, with a record for every chunk.
+
+Log output goes to /dev/null; metrics records are discarded.
+
+Usage:
+    python -m backend.benchmarks.bench_logging [--streams 500] [--chunks 200] [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import List
+
+import httpx
+
+from backend.utils.config import Config
+from backend.utils.logging_config import logging_manager, LOG_VOLUMES, TextFormatter, TEXT_FORMAT
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+from backend.services.metrics_writer import metrics_writer
+
+BACKEND_URL = "http://bench-backend"
+
+
+def build_stream(chunks: int) -> List[bytes]:
+    """Build the chunks of an OpenAI-style stream with one token per chunk."""
+    def event(payload) -> bytes:
+        return b"data: " + json.dumps(payload, separators=(",", ":")).encode() + b"\n\n"
+
+    events = [event({"choices": [{"delta": {"content": f" token{i}"}, "finish_reason": None}]}) for i in range(chunks)]
+    events.append(event({"choices": [{"delta": {}, "finish_reason": "stop"}]}))
+    events.append(event({"choices": [], "usage": {"prompt_tokens": 25, "completion_tokens": chunks, "total_tokens": chunks + 25}}))
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+
+def mock_backend(events: List[bytes]):
+    """Mock transport handler streaming the events, yielding to the loop between chunks."""
+    async def body():
+        for chunk in events:
+            await asyncio.sleep(0)
+            yield chunk
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    return handler
+
+
+def configure(mode: str, output) -> None:
+    """Apply one of the benchmarked logging setups."""
+    logging_manager.shutdown()
+    logging.disable(logging.NOTSET)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if mode == "disabled":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync-every-chunk":
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(TextFormatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(LOG_VOLUMES["debug"])
+        Config.LOG_CHUNK_SAMPLE_RATE = 1
+    else:
+        volume, sample_rate = mode.split(":")
+        logging_manager.configure(volume, "text", 1_000_000, stream=output)
+        Config.LOG_CHUNK_SAMPLE_RATE = int(sample_rate)
+
+
+async def run_streams(streams: int, events: List[bytes]) -> float:
+    """Run the concurrent streams, returning event loop thread CPU seconds."""
+    pool = UpstreamClientPool(max_connections=streams)
+    pool._clients[BACKEND_URL] = httpx.AsyncClient(base_url=BACKEND_URL, transport=httpx.MockTransport(mock_backend(events)))
+    proxy = ProxyService(BACKEND_URL, pool)
+    body = json.dumps({"model": "llama3.1:8b", "stream": True, "messages": [{"role": "user", "content": "hi"}]}).encode()
+
+    async def one(index: int):
+        request_metrics = {
+            "model": "llama3.1:8b", "origin": None, "is_streaming": True, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": f"req_{index}"
+        }
+        response = await proxy.handle_streaming_response(body, {}, time.time(), request_metrics, f"req_{index}")
+        async for _ in response.body_iterator:
+            pass
+
+    started = time.thread_time()
+    await asyncio.gather(*(one(i) for i in range(streams)))
+    elapsed = time.thread_time() - started
+    await pool.close()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    events = build_stream(args.chunks)
+    # Discard metrics records so only proxying and logging are measured
+    metrics_writer.sink = lambda rows: None
+    metrics_writer.start()
+
+    modes = (
+        ("disabled", "logging disabled"),
+        ("sync-every-chunk", "synchronous, every chunk"),
+        ("debug:1", "queued, debug, every chunk"),
+        ("debug:100", "queued, debug, 1 in 100"),
+        ("requests:100", "queued, requests (default)"),
+        ("errors:100", "queued, errors only"),
+    )
+    print(f"{args.streams} concurrent streams x {args.chunks} chunks")
+    with open(os.devnull, "w") as output:
+        # Warm up imports, connection setup and caches
+        configure("disabled", output)
+        await run_streams(args.streams, events)
+
+        baseline = None
+        for mode, label in modes:
+            configure(mode, output)
+            cpu = min([await run_streams(args.streams, events) for _ in range(args.repeat)])
+            logging_manager.shutdown()
+            baseline = baseline if baseline is not None else cpu
+            per_chunk = cpu / (args.streams * len(events)) * 1e6
+            print(f"  {label:28s}: loop CPU {cpu * 1000:8.1f} ms ({per_chunk:5.2f} us/chunk, "
+                  f"{(cpu - baseline) / baseline * 100:+6.1f}% vs disabled)")
+
+    logging.disable(logging.CRITICAL)
+    await metrics_writer.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
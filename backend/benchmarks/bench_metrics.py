@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: get_metrics with one query per figure and from the rollups.
+
+Builds an indexed database of --rows completion requests spread evenly over
+the last 30 days and measures, for dashboard windows from 1h to all time,
+the latency of the original approach (a separate SELECT over the window for
+every figure: overall counts, streamed counts, tokens, timing, inter-token
+latency, error types, distributions, ...) and of get_metrics, which reads
+the whole hours of the window from the hourly rollup, the whole minutes at
+its edges from the minutely rollup and only the remaining seconds from the
+raw rows. The rollups are rebuilt once after the bulk insert; that time is
+reported too.
+
+Usage:
+    python -m backend.benchmarks.bench_metrics [--rows 1000000] [--repeat 5]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from typing import Callable, Any, List, Optional
+from unittest.mock import patch
+
+from backend.database.connection import get_db_connection, close_all_connections
+from backend.database.dao import completion_requests_dao
+from backend.database.rollups import create_rollup_statements, rebuild_rollups
+from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, create_index_statements
+from backend.utils.timestamps import now_ms
+
+DAY_MS = 86400 * 1000
+WINDOWS = {"1h": 3600 * 1000, "24h": DAY_MS, "7d": 7 * DAY_MS, "all": None}
+
+COUNTS = "COUNT(*), SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END), SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END), AVG(response_time_ms)"
+TOKENS = "COUNT(*), SUM(total_tokens), SUM(prompt_tokens), SUM(completion_tokens)"
+TIMING = "AVG(time_to_first_token_ms), AVG(time_to_last_token_ms), AVG(time_to_last_token_ms - time_to_first_token_ms)"
+TIMED = "time_to_first_token_ms IS NOT NULL AND time_to_last_token_ms IS NOT NULL"
+ERRORS = "error_type, COUNT(*) as count"
+FAILED = "success = 0 AND error_type IS NOT NULL AND error_type != ''"
+
+# The original get_metrics: (select list, condition, group by) of each query
+PER_FIGURE_QUERIES = [
+    (COUNTS, None, None),
+    (COUNTS, "is_streaming = 1", None),
+    (TOKENS, "is_streaming = 1 AND total_tokens IS NOT NULL", None),
+    (TIMING, f"is_streaming = 1 AND {TIMED}", None),
+    ("COUNT(*), AVG(itl_mean_ms), AVG(itl_p50_ms), AVG(itl_p95_ms), AVG(itl_p99_ms), MAX(itl_max_ms)",
+     "is_streaming = 1 AND itl_mean_ms IS NOT NULL", None),
+    (ERRORS, f"is_streaming = 1 AND {FAILED}", "error_type"),
+    (COUNTS, "is_streaming = 0", None),
+    (TOKENS, "is_streaming = 0 AND total_tokens IS NOT NULL", None),
+    (TIMING, f"is_streaming = 0 AND {TIMED}", None),
+    (ERRORS, f"is_streaming = 0 AND {FAILED}", "error_type"),
+    ("model, COUNT(*) as count", "model IS NOT NULL AND model != ''", "model"),
+    ("origin, COUNT(*) as count", "origin IS NOT NULL AND origin != ''", "origin"),
+    ("backend, COUNT(*) as total, AVG(response_time_ms), AVG(itl_p95_ms), AVG(queue_time_ms)",
+     "backend IS NOT NULL AND backend != ''", "backend"),
+    ("SUM(CASE WHEN cache_hit = 1 THEN 1 ELSE 0 END), SUM(CASE WHEN coalesced = 1 THEN 1 ELSE 0 END)", None, None),
+    ("AVG(tokens_per_second)", "is_streaming = 0 AND tokens_per_second IS NOT NULL", None),
+    ("AVG(tokens_per_second)", "is_streaming = 1 AND tokens_per_second IS NOT NULL", None),
+]
+
+
+def make_row(i: int, rows: int, now: int) -> List[Any]:
+    """A request record, as (timestamp_ms, success, ...) values; rows are spread over 30 days."""
+    streaming = i % 3 != 0
+    failed = i % 40 == 0
+    return [
+        now - int(i * 30 * DAY_MS / rows), not failed, 500 if failed else 200, 800 + i % 2000,
+        f"model-{i % 6}", f"client-{i % 25}", streaming, 120, 250, 370,
+        150 + i % 300 if streaming else None, 2000 if streaming else None, 140.0,
+        4.0 if streaming else None, 3.8 if streaming else None, 7.5 if streaming else None,
+        f"http://replica-{i % 3}:11434", i % 20 == 0, 15 if i % 4 == 0 else None,
+        ("timeout", "http_error")[i % 2] if failed else None
+    ]
+
+
+ROW_FIELDS = [
+    "timestamp_ms", "success", "status_code", "response_time_ms", "model", "origin", "is_streaming",
+    "prompt_tokens", "completion_tokens", "total_tokens", "time_to_first_token_ms", "time_to_last_token_ms",
+    "tokens_per_second", "itl_mean_ms", "itl_p50_ms", "itl_p95_ms", "backend", "cache_hit", "queue_time_ms",
+    "error_type"
+]
+
+
+def per_figure_metrics(start_ms: Optional[int]) -> None:
+    """Run the original get_metrics queries and fetch their results."""
+    with get_db_connection() as conn:
+        for select, condition, group_by in PER_FIGURE_QUERIES:
+            conditions = [c for c in ("timestamp_ms >= ?" if start_ms is not None else None, condition) if c]
+            sql = f"SELECT {select} FROM completion_requests"
+            if conditions:
+                sql += f" WHERE {' AND '.join(conditions)}"
+            if group_by:
+                sql += f" GROUP BY {group_by} ORDER BY 2 DESC"
+            conn.execute(sql, [start_ms] if start_ms is not None else []).fetchall()
+
+
+def measure(operation: Callable[[], Any], repeat: int) -> List[float]:
+    """Latencies of repeat calls, in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="rows in the database, spread over 30 days")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = now_ms()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "metrics.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_index_statements() + create_rollup_statements():
+                conn.execute(statement)
+            conn.executemany(
+                f"INSERT INTO completion_requests ({', '.join(ROW_FIELDS)}) VALUES ({', '.join('?' for _ in ROW_FIELDS)})",
+                (make_row(i, args.rows, now) for i in range(args.rows))
+            )
+
+        with patch("backend.database.connection.get_db_path", return_value=db_path):
+            with get_db_connection() as conn:
+                started = time.perf_counter()
+                rebuild_rollups(conn)
+                rebuild_seconds = time.perf_counter() - started
+            print(f"{args.rows} rows over 30 days, rollups rebuilt in {rebuild_seconds:.1f}s, {args.repeat} runs each")
+            print(f"{'window':<7} {'rows':>9} {'per-figure ms':>14} {'rollups ms':>11} {'speedup':>8}")
+            for window, length in WINDOWS.items():
+                start_ms = now - length if length is not None else None
+                window_rows = completion_requests_dao.get_metrics(start_ms=start_ms).requests.total.total
+                per_figure = statistics.median(measure(lambda: per_figure_metrics(start_ms), args.repeat))
+                rolled_up = statistics.median(measure(lambda: completion_requests_dao.get_metrics(start_ms=start_ms), args.repeat))
+                print(f"{window:<7} {window_rows:>9} {per_figure:>14.1f} {rolled_up:>11.1f} {per_figure / rolled_up:>7.1f}x")
+            close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
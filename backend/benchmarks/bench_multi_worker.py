@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recording metrics from several proxy worker processes.
+
+Each worker process records completion requests as fast as it can, in
+batches of METRICS_BATCH_SIZE, for a fixed number of records. Two setups
+are compared at 1, 4 and 8 workers:
+
+- direct: every worker inserts its batches into the shared SQLite file
+  itself, as several single-process proxies on one database would. Batches
+  that fail with "database is locked" are counted as lost.
+- socket: workers send their batches to one metrics writer process over a
+  Unix socket; only the writer touches the database.
+
+Throughput is records committed per second, measured until the last
+record is in the database.
+
+Usage:
+    python -m backend.benchmarks.bench_multi_worker [--workers 1 4 8] [--records 20000] [--batch 200]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+
+def make_record(worker: int, i: int) -> Dict[str, Any]:
+    """A typical successful streamed request record."""
+    return {
+        "timestamp": datetime.now().isoformat(), "success": True, "status_code": 200,
+        "response_time_ms": 1200 + i % 300, "model": "llama3", "origin": f"worker-{worker}",
+        "is_streaming": True, "max_tokens": 512, "temperature": 0.7, "top_p": None, "message_count": 3,
+        "prompt_tokens": 120, "completion_tokens": 250, "total_tokens": 370, "finish_reason": "stop",
+        "time_to_first_token_ms": 180, "time_to_last_token_ms": 1200, "tokens_per_second": 308.3,
+        "itl_mean_ms": 4.1, "itl_p50_ms": 3.9, "itl_p95_ms": 6.2, "itl_p99_ms": 9.8, "itl_max_ms": 14.0,
+        "backend": "http://ollama:11434", "app_version": "2.0.0"
+    }
+
+
+def direct_worker(worker: int, records: int, batch_size: int, lost, start_line) -> None:
+    """Insert batches straight into the shared database."""
+    from backend.database.dao import completion_requests_dao
+    start_line.wait()
+    for start in range(0, records, batch_size):
+        batch = [make_record(worker, i) for i in range(start, min(start + batch_size, records))]
+        try:
+            completion_requests_dao.insert_completion_requests(batch)
+        except sqlite3.OperationalError:
+            with lost.get_lock():
+                lost.value += len(batch)
+
+
+def socket_worker(worker: int, records: int, batch_size: int, lost, start_line) -> None:
+    """Send batches to the metrics writer process."""
+    from backend.services.metrics_relay import MetricsRelayClient
+    client = MetricsRelayClient(os.environ["METRICS_WRITER_SOCKET"])
+    start_line.wait()
+    for start in range(0, records, batch_size):
+        batch = [make_record(worker, i) for i in range(start, min(start + batch_size, records))]
+        try:
+            client.send_batch(batch)
+        except OSError:
+            with lost.get_lock():
+                lost.value += len(batch)
+    client.close()
+
+
+def count_rows(db_path: str) -> int:
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        return conn.execute("SELECT COUNT(*) FROM completion_requests").fetchone()[0]
+
+
+def run(mode: str, workers: int, records: int, batch_size: int) -> Tuple[float, int, int]:
+    """Returns (records per second, records committed, records lost)."""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "metrics.db")
+        socket_path = os.path.join(directory, "writer.sock")
+        # Inherited by the spawned processes before they import the configuration
+        os.environ["DB_PATH"] = db_path
+        os.environ["METRICS_WRITER_SOCKET"] = socket_path
+        os.environ["METRICS_BATCH_SIZE"] = str(batch_size)
+        os.environ["LOG_VOLUME"] = "errors"
+
+        from backend.database.safe_migrations import run_safe_migrations
+        from backend.metrics_writer_server import start_writer_process
+        run_safe_migrations()
+
+        context = multiprocessing.get_context("spawn")
+        lost = context.Value("i", 0)
+        # Process start-up is left out of the timing: workers wait here once imported
+        start_line = context.Barrier(workers + 1)
+        writer = start_writer_process(socket_path) if mode == "socket" else None
+        target = socket_worker if mode == "socket" else direct_worker
+        processes = [
+            context.Process(target=target, args=(worker, records, batch_size, lost, start_line))
+            for worker in range(workers)
+        ]
+
+        for process in processes:
+            process.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for process in processes:
+            process.join()
+        expected = workers * records - lost.value
+        while count_rows(db_path) < expected:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+
+        if writer is not None:
+            writer.terminate()
+            writer.join()
+        committed = count_rows(db_path)
+        return committed / elapsed, committed, lost.value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--records", type=int, default=20000, help="records per worker")
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.records} records per worker, batches of {args.batch}")
+    print(f"{'mode':<8} {'workers':>7} {'records/s':>11} {'committed':>10} {'lost':>7}")
+    for workers in args.workers:
+        for mode in ("direct", "socket"):
+            rate, committed, lost = run(mode, workers, args.records, args.batch)
+            print(f"{mode:<8} {workers:>7} {rate:>11,.0f} {committed:>10} {lost:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: extracting metrics fields from large chat request bodies.
+
+Compares a full json.loads (the original behaviour), a full orjson parse
+(when installed) and the partial RequestFieldScanner (including its fallback
+to a full parse) on RAG-style requests with one huge context message and on
+a long multi-turn conversation.
+
+Usage:
+    python -m backend.benchmarks.bench_request_parsing [--tokens 100000] [--repeat 20]
+"""
+
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+from backend.services.request_parsing import extract_request_fields, build_request_fields, orjson
+
+PROSE_WORDS = ["the", "model", "context", "retrieval", "document", "answer", "token", "vector", "query",
+               "result", "latency", "throughput", "unicode é", "sentence.\n"]
+# Source code / JSON documents: quotes and backslashes that must be escaped
+CODE_WORDS = PROSE_WORDS + ["\"quoted\"", "tab\there", "path\\to", "{\"key\": 1}"]
+
+
+def build_body(tokens: int, messages: int, words: List[str]) -> bytes:
+    """Build a request body with roughly the given number of prompt tokens."""
+    rng = random.Random(42)
+    per_message = max(1, tokens // messages)
+    conversation = [{"role": "system", "content": "You are a helpful assistant."}]
+    for i in range(messages):
+        content = " ".join(rng.choice(words) for _ in range(per_message))
+        conversation.append({"role": "user" if i % 2 == 0 else "assistant", "content": content})
+    return json.dumps({
+        "model": "llama3.1:8b",
+        "messages": conversation,
+        "stream": True,
+        "max_tokens": 512,
+        "temperature": 0.2,
+        "top_p": 0.9
+    }).encode()
+
+
+def full_json(body: bytes) -> Dict:
+    body_dict = json.loads(body)
+    return build_request_fields(body_dict, len(body_dict.get("messages") or []) or None)
+
+
+def full_orjson(body: bytes) -> Dict:
+    body_dict = orjson.loads(body)
+    return build_request_fields(body_dict, len(body_dict.get("messages") or []) or None)
+
+
+def measure(func: Callable[[bytes], Dict], body: bytes, repeat: int) -> float:
+    """Return the best wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(body)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    parsers: List = [("json.loads (full)", full_json)]
+    if orjson is not None:
+        parsers.append(("orjson.loads (full)", full_orjson))
+    parsers.append(("partial scan", lambda body: extract_request_fields(body, "partial")))
+
+    scenarios = (
+        ("RAG prompt, 1 large prose message", 1, PROSE_WORDS),
+        ("RAG prompt, 1 large code/JSON message", 1, CODE_WORDS),
+        ("conversation, 400 prose messages", 400, PROSE_WORDS),
+    )
+    for label, messages, words in scenarios:
+        body = build_body(args.tokens, messages, words)
+        expected = full_json(body)
+        print(f"{label}: {len(body) / 1024:.0f} KiB")
+        for name, func in parsers:
+            assert func(body) == expected
+            print(f"  {name:22s}: {measure(func, body, args.repeat):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-chunk CPU cost of inspecting a streamed completion.
+
+Compares the original inspection (decode every chunk to str and json.loads
+it) against StreamMetrics, which frames events on bytes and only parses the
+events that can carry usage or a finish reason.
+
+Usage:
+    python -m backend.benchmarks.bench_stream_inspection [--tokens 4096] [--repeat 20]
+"""
+
+import json
+import time
+import logging
+import argparse
+from typing import List
+
+from backend.services.stream_metrics import StreamMetrics
+
+
+def build_stream(tokens: int) -> List[bytes]:
+    """Build the chunks of an OpenAI-style stream with one token per chunk."""
+    def event(payload) -> bytes:
+        return b"data: " + json.dumps(payload, separators=(",", ":")).encode() + b"\n\n"
+
+    base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 1700000000, "model": "llama3.1:8b"}
+    chunks = [event({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})]
+    for i in range(tokens):
+        chunks.append(event({**base, "choices": [{"index": 0, "delta": {"content": f" token{i}"}, "finish_reason": None}], "usage": None}))
+    chunks.append(event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+    chunks.append(event({**base, "choices": [], "usage": {"prompt_tokens": 25, "completion_tokens": tokens, "total_tokens": tokens + 25}}))
+    chunks.append(b"data: [DONE]\n\n")
+    return chunks
+
+
+def inspect_decode_and_parse_all(chunks: List[bytes]):
+    """The original approach: decode and JSON-parse every chunk."""
+    final_usage = None
+    finish_reason = "stream_complete"
+    for chunk in chunks:
+        chunk_text = chunk.decode('utf-8', errors='ignore')
+        if chunk_text.strip() == "data: [DONE]":
+            continue
+        if chunk_text.startswith("data: "):
+            json_str = chunk_text[6:]
+            if json_str.strip() and json_str.strip() != "[DONE]":
+                chunk_data = json.loads(json_str)
+                if chunk_data.get('usage'):
+                    final_usage = chunk_data['usage']
+                if chunk_data.get('choices') and chunk_data['choices'][0].get('finish_reason'):
+                    finish_reason = chunk_data['choices'][0]['finish_reason']
+    return final_usage, finish_reason
+
+
+def inspect_lazy(chunks: List[bytes]):
+    """The current approach: frame on bytes, parse only candidate events."""
+    stream_metrics = StreamMetrics("bench")
+    for chunk in chunks:
+        stream_metrics.feed(chunk)
+    stream_metrics.finish()
+    return stream_metrics.final_usage, stream_metrics.finish_reason
+
+
+def measure(func, chunks: List[bytes], repeat: int) -> float:
+    """Return the best per-chunk CPU time in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        func(chunks)
+        best = min(best, time.process_time() - started)
+    return best / len(chunks) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Measure parsing only, not log formatting
+    logging.disable(logging.CRITICAL)
+
+    chunks = build_stream(args.tokens)
+    assert inspect_decode_and_parse_all(chunks) == inspect_lazy(chunks)
+
+    before = measure(inspect_decode_and_parse_all, chunks, args.repeat)
+    after = measure(inspect_lazy, chunks, args.repeat)
+
+    print(f"Stream: {args.tokens} tokens, {len(chunks)} chunks, {sum(len(c) for c in chunks)} bytes")
+    print(f"decode + json.loads every chunk : {before:6.2f} us/chunk")
+    print(f"framed, lazy inspection         : {after:6.2f} us/chunk")
+    print(f"speedup                         : {before / after:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,10 @@ This module handles database backups before destructive operations like migratio
 import os
 import shutil
 import sqlite3
+from contextlib import closing
 from datetime import datetime
 from typing import Optional, Tuple
-from backend.database.connection import get_db_path
+from backend.database.connection import get_db_path, close_all_connections
 from backend.utils.config import Config
 
 def create_backup_table(table_name: str, backup_suffix: str = "_backup", db_path: Optional[str] = None) -> str:
@@ -91,6 +92,10 @@ def create_file_backup(backup_dir: Optional[str] = None, db_name: Optional[str]
     backup_path = os.path.join(backup_dir, backup_filename)
     
     try:
+        # Move commits still in the write-ahead log into the database file before copying it
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        
         # Copy the database file
         shutil.copy2(db_path, backup_path)
         
@@ -159,8 +164,11 @@ def restore_from_file_backup(backup_path: str, backup_dir: Optional[str] = None,
         current_backup = create_file_backup(backup_dir=backup_dir, db_name=os.path.basename(db_path), db_path=db_path)
         print(f"Created backup of current database before restore: {current_backup}")
         
-        # Stop any active connections (this is important for SQLite)
-        # In a real application, you'd want to ensure no active connections
+        # Close the open connections, and drop the write-ahead log that belongs to the replaced file
+        close_all_connections()
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
         
         # Restore from backup
         shutil.copy2(backup_path, db_path)
@@ -1,15 +1,32 @@
 """
 Database connection management for the LLM Metrics Proxy.
+
+Each thread keeps one long-lived connection to the database instead of
+opening one per query, so connection setup, the PRAGMAs below and the
+prepared statement cache are paid for once. Connections are opened in WAL
+mode, where readers and the metrics writer do not block each other, with
+synchronous=NORMAL (durable at checkpoints, safe against corruption) and
+a busy timeout. close_all_connections() closes every thread's connection,
+for restores that replace the database file under them.
 """
 
 import os
+import time
 import sqlite3
 import logging
+import threading
+import functools
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, List
+
+from backend.database.rollups import register_rollup_functions
+from backend.utils.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Prepared statements kept per connection (sqlite3 caches them by SQL text)
+CACHED_STATEMENTS = 256
+
 # Configuration - read from environment variable
 def get_db_path() -> str:
     """Get the database file path from environment variable."""
@@ -24,20 +41,115 @@ def ensure_data_directory():
         logger.info(f"Created data directory: {data_dir}")
 
 
+_local = threading.local()
+_lock = threading.Lock()
+# Every open connection, so they can be closed from any thread
+_connections: List[sqlite3.Connection] = []
+# Bumped by close_all_connections so threads reopen theirs
+_generation = 0
+
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """Open a connection with the PRAGMAs used for every database connection."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        # Only the owning thread uses it, but close_all_connections may close it from another
+        check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    register_rollup_functions(conn)
+    return conn
+
+
+def _thread_connection() -> sqlite3.Connection:
+    """The calling thread's connection to the current database, opened on first use."""
+    db_path = get_db_path()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == db_path and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        _discard(conn)
+
+    ensure_data_directory()
+    logger.debug("Opening database connection to %s", db_path)
+    conn = open_connection(db_path)
+    with _lock:
+        _connections.append(conn)
+        _local.generation = _generation
+    _local.conn = conn
+    _local.path = db_path
+    return conn
+
+
+def _discard(conn: sqlite3.Connection) -> None:
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
 @contextmanager
 def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
-    """Get a database connection with proper cleanup.
-    
+    """Get the thread's database connection.
+
+    The connection stays open after the block; a transaction left open by the
+    block (not committed, or interrupted by an exception) is rolled back.
+
     Usage:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM table")
     """
-    ensure_data_directory()
-    db_path = get_db_path()
-    logger.debug(f"Connecting to database: {db_path}")
-    conn = sqlite3.connect(db_path)
+    conn = _thread_connection()
     try:
         yield conn
     finally:
-        conn.close()
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def close_all_connections() -> None:
+    """Close every thread's connection; each reopens on its next use."""
+    global _generation
+    with _lock:
+        connections = list(_connections)
+        _connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to close database connection: {e}")
+    _local.conn = None
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Whether an error is SQLITE_BUSY / SQLITE_LOCKED, which may succeed when retried."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def retry_on_busy(func):
+    """Retry a database operation that hit SQLITE_BUSY beyond the busy timeout, with a growing delay."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(Config.DB_BUSY_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if attempt >= Config.DB_BUSY_RETRIES or not is_busy_error(e):
+                    raise
+                delay = 0.05 * 2 ** attempt
+                logger.warning(f"Database busy in {func.__name__}, retrying in {delay * 1000:.0f}ms")
+                time.sleep(delay)
+    return wrapper
@@ -10,8 +10,15 @@ from typing import List, Optional, Tuple, Dict, Any
 from datetime import datetime
 from contextlib import contextmanager
 
-from backend.database.connection import get_db_connection
+from backend.database.connection import get_db_connection, retry_on_busy
+from backend.database.rollups import (
+    ROLLUP_TABLES, SKETCH_TABLES, ROLLUP_DIMENSIONS, SKETCH_DIMENSIONS, ROLLUP_AGGREGATES, ROLLUP_MAXIMA,
+    ROLLUP_SKETCHES, rollup_columns, raw_aggregates_select, raw_sketches_select, split_range, update_rollups,
+    load_sketch
+)
 from backend.database.schema import validate_schema
+from backend.utils.latency_sketch import LatencySketch
+from backend.utils.timestamps import format_timestamp
 from shared.types import CompletionRequestData, Metrics, ModelUsage, FinishReason, ErrorType
 
 class CompletionRequestsDAO:
@@ -32,19 +39,29 @@ class CompletionRequestsDAO:
                 conn.rollback()
                 raise
     
+    # Columns written for each completion request
+    INSERT_FIELDS = [
+        'timestamp_ms', 'started_at_ms', 'success', 'status_code', 'response_time_ms',
+        'model', 'origin', 'is_streaming', 'max_tokens', 'temperature',
+        'top_p', 'message_count', 'prompt_tokens', 'completion_tokens',
+        'total_tokens', 'finish_reason', 'time_to_first_token_ms',
+        'time_to_last_token_ms', 'tokens_per_second', 'error_type',
+        'error_message', 'itl_mean_ms', 'itl_p50_ms', 'itl_p95_ms',
+        'itl_p99_ms', 'itl_max_ms', 'backend',
+        'cache_hit', 'cache_saved_ms',
+        'coalesced',
+        'queue_time_ms',
+        'hedge_outcome',
+        'retry_count'
+    ]
+    # Built once so every insert reuses the connection's cached prepared statement
+    INSERT_SQL = f"INSERT INTO completion_requests ({', '.join(INSERT_FIELDS)}) VALUES ({', '.join('?' for _ in INSERT_FIELDS)})"
+    
+    @retry_on_busy
     def insert_completion_request(self, data: Dict[str, Any]) -> int:
         """Insert a new completion request record."""
-        required_fields = [
-            'timestamp', 'success', 'status_code', 'response_time_ms',
-            'model', 'origin', 'is_streaming', 'max_tokens', 'temperature',
-            'top_p', 'message_count', 'prompt_tokens', 'completion_tokens',
-            'total_tokens', 'finish_reason', 'time_to_first_token_ms',
-            'time_to_last_token_ms', 'tokens_per_second', 'error_type',
-            'error_message'
-        ]
-        
         # Build the INSERT statement dynamically
-        fields = [field for field in required_fields if field in data]
+        fields = [field for field in self.INSERT_FIELDS if field in data]
         placeholders = ', '.join(['?' for _ in fields])
         field_names = ', '.join(fields)
         
@@ -53,31 +70,65 @@ class CompletionRequestsDAO:
         
         with self.get_cursor() as cursor:
             cursor.execute(sql, values)
-            return cursor.lastrowid
+            request_id = cursor.lastrowid
+            update_rollups(cursor, request_id, request_id)
+            return request_id
+    
+    @retry_on_busy
+    def insert_completion_requests(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert a batch of completion request records in a single transaction."""
+        if not rows:
+            return 0
+        
+        fields = self.INSERT_FIELDS
+        values = [[row.get(field) for field in fields] for row in rows]
+        
+        with self.get_cursor() as cursor:
+            cursor.executemany(self.INSERT_SQL, values)
+            self._update_rollups(cursor, len(values))
+            return len(values)
+    
+    @retry_on_busy
+    def insert_completion_request_rows(self, rows: List[List[Any]]) -> int:
+        """Insert a batch of records given as values in INSERT_FIELDS order, in a single transaction."""
+        if not rows:
+            return 0
+        
+        with self.get_cursor() as cursor:
+            cursor.executemany(self.INSERT_SQL, rows)
+            self._update_rollups(cursor, len(rows))
+            return len(rows)
+    
+    @staticmethod
+    def _update_rollups(cursor: sqlite3.Cursor, count: int) -> None:
+        """Add the count rows just inserted to the rollups; one transaction gives them consecutive ids."""
+        cursor.execute("SELECT last_insert_rowid()")
+        last_id = cursor.fetchone()[0]
+        update_rollups(cursor, last_id - count + 1, last_id)
     
-    def get_completion_requests(self, start_date: Optional[str] = None, 
-                               end_date: Optional[str] = None,
+    def get_completion_requests(self, start_ms: Optional[int] = None, 
+                               end_ms: Optional[int] = None,
                                limit: Optional[int] = None) -> List[CompletionRequestData]:
-        """Get completion requests with optional date filtering."""
+        """Get completion requests, newest first, with an optional time range in UTC epoch milliseconds."""
         sql = f"""
-            SELECT id, timestamp, success, status_code, response_time_ms, model, origin, 
+            SELECT id, timestamp_ms, success, status_code, response_time_ms, model, origin, 
                    is_streaming, max_tokens, temperature, top_p, message_count, 
                    prompt_tokens, completion_tokens, total_tokens, finish_reason,
                    time_to_first_token_ms, time_to_last_token_ms, tokens_per_second, 
                    error_type, error_message
-            FROM {self.table_name} WHERE 1=1
+            FROM {self.table_name} WHERE timestamp_ms IS NOT NULL
         """
         params = []
         
-        if start_date:
-            sql += " AND datetime(timestamp) >= datetime(?)"
-            params.append(start_date)
+        if start_ms is not None:
+            sql += " AND timestamp_ms >= ?"
+            params.append(start_ms)
         
-        if end_date:
-            sql += " AND datetime(timestamp) <= datetime(?)"
-            params.append(end_date)
+        if end_ms is not None:
+            sql += " AND timestamp_ms <= ?"
+            params.append(end_ms)
         
-        sql += " ORDER BY timestamp DESC"
+        sql += " ORDER BY timestamp_ms DESC"
         
         if limit:
             sql += " LIMIT ?"
@@ -92,7 +143,7 @@ class CompletionRequestsDAO:
             for row in rows:
                 # Map row data to CompletionRequestData fields using explicit column order
                 completion_request = CompletionRequestData(
-                    timestamp=row[1],  # timestamp
+                    timestamp=format_timestamp(row[1]),  # timestamp_ms
                     is_streaming=bool(row[7]),       # is_streaming
                     success=bool(row[2]),            # success
                     error_type=row[19],              # error_type
@@ -114,369 +165,246 @@ class CompletionRequestsDAO:
             
             return results
     
-    def get_metrics(self, start_date: Optional[str] = None, 
-                    end_date: Optional[str] = None) -> Metrics:
-        """Get aggregated metrics from the completion_requests table."""
-        with self.get_cursor() as cursor:
-            # Build date filter
-            date_filter = ""
-            params = []
-            if start_date and end_date:
-                date_filter = "WHERE timestamp BETWEEN ? AND ?"
-                params = [start_date, end_date]
-            elif start_date:
-                date_filter = "WHERE timestamp >= ?"
-                params = [start_date]
-            elif end_date:
-                date_filter = "WHERE timestamp <= ?"
-                params = [end_date]
-            
-            # Overall request counts
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total_requests,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_requests,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_requests,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name} 
-                    {date_filter}
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total_requests,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_requests,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_requests,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name}
-                """)
-            
-            overall_stats = cursor.fetchone()
-            total_requests = overall_stats[0] or 0
-            successful_requests = overall_stats[1] or 0
-            failed_requests = overall_stats[2] or 0
-            avg_response_time = overall_stats[3] or 0
-            
-            # Streaming requests metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 1
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 1
-                """)
-            
-            streaming_stats = cursor.fetchone()
-            streaming_total = streaming_stats[0] or 0
-            streaming_successful = streaming_stats[1] or 0
-            streaming_failed = streaming_stats[2] or 0
-            streaming_avg_response_time = streaming_stats[3] or 0
-            
-            # Streaming token metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as reported_count,
-                        SUM(total_tokens) as total,
-                        SUM(prompt_tokens) as prompt_total,
-                        SUM(completion_tokens) as completion_total
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 1 AND total_tokens IS NOT NULL
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as reported_count,
-                        SUM(total_tokens) as total,
-                        SUM(prompt_tokens) as prompt_total,
-                        SUM(completion_tokens) as completion_total
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 1 AND total_tokens IS NOT NULL
-                """)
-            
-            streaming_token_stats = cursor.fetchone()
-            streaming_reported_count = streaming_token_stats[0] or 0
-            streaming_total_tokens = streaming_token_stats[1] or 0
-            streaming_prompt_tokens = streaming_token_stats[2] or 0
-            streaming_completion_tokens = streaming_token_stats[3] or 0
-            
-            # Streaming timing metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        AVG(time_to_first_token_ms) as avg_time_to_first_token,
-                        AVG(time_to_last_token_ms) as avg_time_to_last_token,
-                        AVG(time_to_last_token_ms - time_to_first_token_ms) as avg_completion_duration
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 1 
-                    AND time_to_first_token_ms IS NOT NULL 
-                    AND time_to_last_token_ms IS NOT NULL
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        AVG(time_to_first_token_ms) as avg_time_to_first_token,
-                        AVG(time_to_last_token_ms) as avg_time_to_last_token,
-                        AVG(time_to_last_token_ms - time_to_first_token_ms) as avg_completion_duration
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 1 
-                    AND time_to_first_token_ms IS NOT NULL 
-                    AND time_to_last_token_ms IS NOT NULL
-                """)
-            
-            streaming_timing_stats = cursor.fetchone()
-            streaming_avg_time_to_first_token = streaming_timing_stats[0]
-            streaming_avg_time_to_last_token = streaming_timing_stats[1]
-            streaming_avg_completion_duration = streaming_timing_stats[2]
-            
-            # Streaming error types
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT error_type, COUNT(*) as count FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 1 AND success = 0 AND error_type IS NOT NULL AND error_type != '' 
-                    GROUP BY error_type ORDER BY count DESC
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT error_type, COUNT(*) as count FROM {self.table_name} 
-                    WHERE is_streaming = 1 AND success = 0 AND error_type IS NOT NULL AND error_type != '' 
-                    GROUP BY error_type ORDER BY count DESC
-                """)
-            streaming_error_types = dict(cursor.fetchall())
-            
-            # Non-streaming requests metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 0
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful,
-                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed,
-                        AVG(response_time_ms) as avg_response_time
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 0
-                """)
-            
-            non_streaming_stats = cursor.fetchone()
-            non_streaming_total = non_streaming_stats[0] or 0
-            non_streaming_successful = non_streaming_stats[1] or 0
-            non_streaming_failed = non_streaming_stats[2] or 0
-            non_streaming_avg_response_time = non_streaming_stats[3] or 0
-            
-            # Non-streaming token metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as reported_count,
-                        SUM(total_tokens) as total,
-                        SUM(prompt_tokens) as prompt_total,
-                        SUM(completion_tokens) as completion_total
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 0 AND total_tokens IS NOT NULL
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as reported_count,
-                        SUM(total_tokens) as total,
-                        SUM(prompt_tokens) as prompt_total,
-                        SUM(completion_tokens) as completion_total
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 0 AND total_tokens IS NOT NULL
-                """)
-            
-            non_streaming_token_stats = cursor.fetchone()
-            non_streaming_reported_count = non_streaming_token_stats[0] or 0
-            non_streaming_total_tokens = non_streaming_token_stats[1] or 0
-            non_streaming_prompt_tokens = non_streaming_token_stats[2] or 0
-            non_streaming_completion_tokens = non_streaming_token_stats[3] or 0
-            
-            # Non-streaming timing metrics
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT 
-                        AVG(time_to_first_token_ms) as avg_time_to_first_token,
-                        AVG(time_to_last_token_ms) as avg_time_to_last_token,
-                        AVG(time_to_last_token_ms - time_to_first_token_ms) as avg_completion_duration
-                    FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 0 
-                    AND time_to_first_token_ms IS NOT NULL 
-                    AND time_to_last_token_ms IS NOT NULL
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT 
-                        AVG(time_to_first_token_ms) as avg_time_to_first_token,
-                        AVG(time_to_last_token_ms) as avg_time_to_last_token,
-                        AVG(time_to_last_token_ms - time_to_first_token_ms) as avg_completion_duration
-                    FROM {self.table_name} 
-                    WHERE is_streaming = 0 
-                    AND time_to_first_token_ms IS NOT NULL 
-                    AND time_to_last_token_ms IS NOT NULL
-                """)
-            
-            non_streaming_timing_stats = cursor.fetchone()
-            non_streaming_avg_time_to_first_token = non_streaming_timing_stats[0]
-            non_streaming_avg_time_to_last_token = non_streaming_timing_stats[1]
-            non_streaming_avg_completion_duration = non_streaming_timing_stats[2]
-            
-            # Non-streaming error types
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT error_type, COUNT(*) as count FROM {self.table_name} 
-                    {date_filter} AND is_streaming = 0 AND success = 0 AND error_type IS NOT NULL AND error_type != '' 
-                    GROUP BY error_type ORDER BY count DESC
-                """, params)
-            else:
-                cursor.execute(f"""
-                    SELECT error_type, COUNT(*) as count FROM {self.table_name} 
-                    WHERE is_streaming = 0 AND success = 0 AND error_type IS NOT NULL AND error_type != '' 
-                    GROUP BY error_type ORDER BY count DESC
-                """)
-            non_streaming_error_types = dict(cursor.fetchall())
-            
-            # Model distribution
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT model, COUNT(*) as count FROM {self.table_name} 
-                    {date_filter} AND model IS NOT NULL AND model != '' 
-                    GROUP BY model ORDER BY count DESC
-                """, params)
+    @staticmethod
+    def _average(total: Optional[float], count: int) -> Optional[float]:
+        return total / count if count else None
+    
+    @staticmethod
+    def _merge_aggregates(groups: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add up the ROLLUP_AGGREGATES of several groups (maxima are maxed)."""
+        merged = {}
+        for name in ROLLUP_AGGREGATES:
+            values = [group[name] for group in groups if group[name] is not None]
+            if name in ROLLUP_MAXIMA:
+                merged[name] = max(values) if values else None
             else:
-                cursor.execute(f"""
-                    SELECT model, COUNT(*) as count FROM {self.table_name} 
-                    WHERE model IS NOT NULL AND model != '' 
-                    GROUP BY model ORDER BY count DESC
-                """)
-            model_distribution = dict(cursor.fetchall())
-            
-            # Origin distribution
-            if date_filter:
-                cursor.execute(f"""
-                    SELECT origin, COUNT(*) as count FROM {self.table_name} 
-                    {date_filter} AND origin IS NOT NULL AND origin != '' 
-                    GROUP BY origin ORDER BY count DESC
-                """, params)
+                merged[name] = sum(values)
+        return merged
+    
+    @staticmethod
+    def _merge_sketches(groups: List[Dict[str, Any]], name: str) -> LatencySketch:
+        """Merge one of the ROLLUP_SKETCHES of several groups."""
+        sketch = LatencySketch()
+        for group in groups:
+            if group[name]:
+                sketch.merge(load_sketch(group[name]))
+        return sketch
+    
+    def _rollup_union(self, start_ms: Optional[int], end_ms: Optional[int],
+                      tables: Dict[str, int]) -> Tuple[str, List[int]]:
+        """UNION ALL of the rows of tables covering [start_ms, end_ms), and raw rows grouped the same way at the edges."""
+        dimensions = SKETCH_DIMENSIONS if tables is SKETCH_TABLES else ROLLUP_DIMENSIONS
+        raw_select = raw_sketches_select() if tables is SKETCH_TABLES else raw_aggregates_select()
+        pieces = []
+        params = []
+        for table, low, high in split_range(start_ms, end_ms, tables):
+            column = "bucket_ms" if table else "timestamp_ms"
+            conditions = []
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{column} < ?")
+                params.append(high)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            if table:
+                pieces.append(f"SELECT {', '.join(rollup_columns(table)[1:])} FROM {table} {where}")
             else:
-                cursor.execute(f"""
-                    SELECT origin, COUNT(*) as count FROM {self.table_name} 
-                    WHERE origin IS NOT NULL AND origin != '' 
-                    GROUP BY origin ORDER BY count DESC
-                """)
-            origin_distribution = dict(cursor.fetchall())
-            
-            # Calculate non-streaming tokens per second - use average of individual TPS values
-            non_streaming_avg_tokens_per_second = None
-            if non_streaming_total > 0:
-                if date_filter:
-                    cursor.execute(f"""
-                        SELECT AVG(tokens_per_second) FROM {self.table_name} 
-                        {date_filter} AND is_streaming = 0 AND tokens_per_second IS NOT NULL
-                    """, params)
-                else:
-                    cursor.execute(f"""
-                        SELECT AVG(tokens_per_second) FROM {self.table_name} 
-                        WHERE is_streaming = 0 AND tokens_per_second IS NOT NULL
-                    """)
-                result = cursor.fetchone()
-                non_streaming_avg_tokens_per_second = result[0] if result and result[0] is not None else None
-            
-            # Calculate streaming tokens per second - use average of individual TPS values
-            streaming_avg_tokens_per_second = None
-            if streaming_total > 0:
-                if date_filter:
-                    cursor.execute(f"""
-                        SELECT AVG(tokens_per_second) FROM {self.table_name} 
-                        {date_filter} AND is_streaming = 1 AND tokens_per_second IS NOT NULL
-                    """, params)
-                else:
-                    cursor.execute(f"""
-                        SELECT AVG(tokens_per_second) FROM {self.table_name} 
-                        WHERE is_streaming = 1 AND tokens_per_second IS NOT NULL
-                    """)
-                result = cursor.fetchone()
-                streaming_avg_tokens_per_second = result[0] if result and result[0] is not None else None
-            
-            # Build the new metrics structure
-            from shared.types import TokenMetrics, StreamedRequests, NonStreamedRequests, RequestsSummary, Requests, Metrics
-            
-            requests_summary = RequestsSummary(
-                total=total_requests,
-                successful=successful_requests,
-                failed=failed_requests,
-                avg_response_time_ms=avg_response_time
-            )
-            
-            streamed_requests = StreamedRequests(
-                total=streaming_total,
-                successful=streaming_successful,
-                failed=streaming_failed,
-                tokens=TokenMetrics(
-                    reported_count=streaming_reported_count,
-                    total=streaming_total_tokens,
-                    prompt_total=streaming_prompt_tokens,
-                    completion_total=streaming_completion_tokens,
-                    avg_tokens_per_second=streaming_avg_tokens_per_second
-                ),
-                error_types=streaming_error_types,
-                avg_response_time_ms=streaming_avg_response_time,
-                avg_time_to_first_token_ms=streaming_avg_time_to_first_token,
-                avg_time_to_last_token_ms=streaming_avg_time_to_last_token,
-                avg_completion_duration_ms=streaming_avg_completion_duration
-            )
+                pieces.append(
+                    f"SELECT {raw_select} FROM {self.table_name} {where} "
+                    f"GROUP BY {', '.join(str(position) for position in range(1, len(dimensions) + 1))}"
+                )
+        return ' UNION ALL '.join(pieces), params
+    
+    def get_metrics(self, start_ms: Optional[int] = None, 
+                    end_ms: Optional[int] = None) -> Metrics:
+        """Get aggregated metrics from the completion_requests table, for an optional time range in UTC epoch milliseconds.
+        
+        Two queries: the whole hours and minutes in the range are read from
+        the rollups and the partial minutes at its edges from
+        completion_requests, added up per model, origin, backend, streaming
+        mode, outcome and error type, and likewise the latency sketches per
+        streaming mode. Every figure is then totalled from those groups.
+        """
+        # Both ends of the range are inclusive; split_range takes an exclusive end
+        end_exclusive = end_ms + 1 if end_ms is not None else None
+        totals = (
+            list(ROLLUP_DIMENSIONS)
+            + [f"{'MAX' if name in ROLLUP_MAXIMA else 'SUM'}({name})" for name in ROLLUP_AGGREGATES]
+        )
+        sketch_totals = list(SKETCH_DIMENSIONS) + [f"merge_sketches({name})" for name in ROLLUP_SKETCHES]
+        with self.get_cursor() as cursor:
+            union, params = self._rollup_union(start_ms, end_exclusive, ROLLUP_TABLES)
+            cursor.execute(f"""
+                SELECT {', '.join(totals)}
+                FROM ({union})
+                GROUP BY {', '.join(ROLLUP_DIMENSIONS)}
+            """, params)
+            names = list(ROLLUP_DIMENSIONS) + list(ROLLUP_AGGREGATES)
+            groups = [dict(zip(names, row)) for row in cursor.fetchall()]
             
-            non_streamed_requests = NonStreamedRequests(
-                total=non_streaming_total,
-                successful=non_streaming_successful,
-                failed=non_streaming_failed,
-                tokens=TokenMetrics(
-                    reported_count=non_streaming_reported_count,
-                    total=non_streaming_total_tokens,
-                    prompt_total=non_streaming_prompt_tokens,
-                    completion_total=non_streaming_completion_tokens,
-                    avg_tokens_per_second=non_streaming_avg_tokens_per_second
-                ),
-                error_types=non_streaming_error_types,
-                avg_time_to_first_token_ms=non_streaming_avg_time_to_first_token,
-                avg_time_to_last_token_ms=non_streaming_avg_time_to_last_token,
-                avg_completion_duration_ms=non_streaming_avg_completion_duration
+            union, params = self._rollup_union(start_ms, end_exclusive, SKETCH_TABLES)
+            cursor.execute(f"""
+                SELECT {', '.join(sketch_totals)}
+                FROM ({union})
+                GROUP BY {', '.join(SKETCH_DIMENSIONS)}
+            """, params)
+            names = list(SKETCH_DIMENSIONS) + list(ROLLUP_SKETCHES)
+            sketch_groups = [dict(zip(names, row)) for row in cursor.fetchall()]
+        
+        streamed_groups = [group for group in groups if group['is_streaming'] == 1]
+        overall = self._merge_aggregates(groups)
+        streamed = self._merge_aggregates(streamed_groups)
+        non_streamed = self._merge_aggregates([group for group in groups if group['is_streaming'] == 0])
+        response_times = self._merge_sketches(sketch_groups, 'response_time_sketch')
+        first_token_times = self._merge_sketches(
+            [group for group in sketch_groups if group['is_streaming'] == 1], 'first_token_sketch'
+        )
+        
+        model_distribution: Dict[str, int] = {}
+        origin_distribution: Dict[str, int] = {}
+        error_types: Dict[int, Dict[str, int]] = {1: {}, 0: {}}
+        backend_groups: Dict[str, List[Dict[str, Any]]] = {}
+        for group in groups:
+            total = group['requests']
+            if group['model']:
+                model_distribution[group['model']] = model_distribution.get(group['model'], 0) + total
+            if group['origin']:
+                origin_distribution[group['origin']] = origin_distribution.get(group['origin'], 0) + total
+            if not group['success'] and group['error_type'] and group['is_streaming'] in error_types:
+                errors = error_types[group['is_streaming']]
+                errors[group['error_type']] = errors.get(group['error_type'], 0) + total
+            if group['backend']:
+                backend_groups.setdefault(group['backend'], []).append(group)
+        
+        def by_count(distribution: Dict[str, int]) -> Dict[str, int]:
+            return dict(sorted(distribution.items(), key=lambda item: item[1], reverse=True))
+        
+        # Build the new metrics structure
+        from shared.types import (
+            TokenMetrics, InterTokenLatency, StreamedRequests, NonStreamedRequests, RequestsSummary, Requests,
+            BackendMetrics, ResponseCacheMetrics, Metrics
+        )
+        
+        def token_metrics(group: Dict[str, Any]) -> TokenMetrics:
+            return TokenMetrics(
+                reported_count=group['tokens_reported'],
+                total=group['tokens_total'],
+                prompt_total=group['prompt_tokens_total'],
+                completion_total=group['completion_tokens_total'],
+                avg_tokens_per_second=self._average(group['tokens_per_second_sum'], group['tokens_per_second_count'])
             )
-            
-            requests = Requests(
-                total=requests_summary,
-                streamed=streamed_requests,
-                non_streamed=non_streamed_requests
+        
+        def backend_metrics(groups: List[Dict[str, Any]]) -> BackendMetrics:
+            backend = self._merge_aggregates(groups)
+            # Time to first token of the successful streams only
+            first_tokens = self._merge_aggregates(
+                [group for group in groups if group['is_streaming'] == 1 and group['success']]
             )
-            
-            return Metrics(
-                timestamp=datetime.now().isoformat(),
-                requests=requests,
-                model_distribution=model_distribution,
-                origin_distribution=origin_distribution
+            return BackendMetrics(
+                total=backend['requests'],
+                successful=backend['successful'],
+                failed=backend['failed'],
+                avg_response_time_ms=self._average(backend['response_time_sum'], backend['response_time_count']) or 0,
+                avg_time_to_first_token_ms=self._average(first_tokens['any_first_token_sum'], first_tokens['any_first_token_count']),
+                avg_itl_p95_ms=self._average(backend['any_itl_p95_sum'], backend['any_itl_p95_count']),
+                avg_queue_time_ms=self._average(backend['queue_time_sum'], backend['queue_time_count'])
             )
+        
+        total_requests = overall['requests']
+        requests_summary = RequestsSummary(
+            total=total_requests,
+            successful=overall['successful'],
+            failed=overall['failed'],
+            avg_response_time_ms=self._average(overall['response_time_sum'], overall['response_time_count']) or 0,
+            p50_response_time_ms=response_times.quantile(0.5),
+            p95_response_time_ms=response_times.quantile(0.95),
+            p99_response_time_ms=response_times.quantile(0.99)
+        )
+        
+        streamed_requests = StreamedRequests(
+            total=streamed['requests'],
+            successful=streamed['successful'],
+            failed=streamed['failed'],
+            tokens=token_metrics(streamed),
+            error_types=by_count(error_types[1]),
+            avg_response_time_ms=self._average(streamed['response_time_sum'], streamed['response_time_count']) or 0,
+            avg_time_to_first_token_ms=self._average(streamed['first_token_sum'], streamed['timed_count']),
+            avg_time_to_last_token_ms=self._average(streamed['last_token_sum'], streamed['timed_count']),
+            avg_completion_duration_ms=self._average(streamed['completion_duration_sum'], streamed['timed_count']),
+            p50_time_to_first_token_ms=first_token_times.quantile(0.5),
+            p95_time_to_first_token_ms=first_token_times.quantile(0.95),
+            p99_time_to_first_token_ms=first_token_times.quantile(0.99),
+            inter_token_latency=InterTokenLatency(
+                reported_count=streamed['itl_count'],
+                avg_mean_ms=self._average(streamed['itl_mean_sum'], streamed['itl_count']),
+                avg_p50_ms=self._average(streamed['itl_p50_sum'], streamed['itl_count']),
+                avg_p95_ms=self._average(streamed['itl_p95_sum'], streamed['itl_count']),
+                avg_p99_ms=self._average(streamed['itl_p99_sum'], streamed['itl_count']),
+                max_ms=streamed['itl_max']
+            ) if streamed['itl_count'] else None
+        )
+        
+        non_streamed_requests = NonStreamedRequests(
+            total=non_streamed['requests'],
+            successful=non_streamed['successful'],
+            failed=non_streamed['failed'],
+            tokens=token_metrics(non_streamed),
+            error_types=by_count(error_types[0]),
+            avg_time_to_first_token_ms=self._average(non_streamed['first_token_sum'], non_streamed['timed_count']),
+            avg_time_to_last_token_ms=self._average(non_streamed['last_token_sum'], non_streamed['timed_count']),
+            avg_completion_duration_ms=self._average(non_streamed['completion_duration_sum'], non_streamed['timed_count'])
+        )
+        
+        requests = Requests(
+            total=requests_summary,
+            streamed=streamed_requests,
+            non_streamed=non_streamed_requests
+        )
+        
+        return Metrics(
+            timestamp=datetime.now().isoformat(),
+            requests=requests,
+            model_distribution=by_count(model_distribution),
+            origin_distribution=by_count(origin_distribution),
+            backend_distribution={
+                backend: backend_metrics(rows)
+                for backend, rows in sorted(
+                    backend_groups.items(), key=lambda item: sum(group['requests'] for group in item[1]), reverse=True
+                )
+            },
+            response_cache=ResponseCacheMetrics(
+                hits=overall['cache_hits'],
+                hit_ratio=overall['cache_hits'] / total_requests if total_requests else 0.0,
+                saved_time_ms=overall['cache_saved_ms'],
+                avg_hit_response_time_ms=self._average(overall['cache_hit_response_time_sum'], overall['cache_hit_response_time_count'])
+            ),
+            coalesced_requests=overall['coalesced'],
+            hedged_requests=overall['hedged'],
+            hedge_wins=overall['hedge_wins'],
+            retried_requests=overall['retried']
+        )
+    
+    def get_first_byte_times(self, start_ms: int) -> List[Tuple[str, bool, float]]:
+        """Get (model, is_streaming, first byte ms) of successful upstream requests since start_ms (UTC epoch milliseconds).
+        
+        The first byte time is the time to first token for streams and the response
+        time otherwise, without the wait for a concurrency slot. Cache hits and
+        coalesced requests never waited on a backend of their own and are left out.
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT 
+                    model,
+                    is_streaming,
+                    CASE WHEN is_streaming = 1 THEN time_to_first_token_ms ELSE response_time_ms END
+                        - COALESCE(queue_time_ms, 0) as first_byte_ms
+                FROM {self.table_name} 
+                WHERE timestamp_ms >= ? AND success = 1 AND model IS NOT NULL
+                    AND cache_hit IS NOT 1 AND coalesced IS NOT 1
+                    AND (is_streaming = 0 OR time_to_first_token_ms IS NOT NULL)
+            """, (start_ms,))
+            return cursor.fetchall()
     
     def get_table_info(self) -> List[Tuple[str, str, int, int, int, int]]:
         """Get table schema information."""
@@ -12,6 +12,8 @@ class CompletionRequest:
     """Data model for completion request metrics."""
     id: Optional[int] = None
     timestamp: Optional[datetime] = None
+    # When the request arrived, UTC epoch milliseconds (the completion time is recorded on insert)
+    started_at_ms: Optional[int] = None
     success: bool = False
     status_code: Optional[int] = None
     response_time_ms: Optional[int] = None
@@ -25,6 +27,9 @@ class CompletionRequest:
     top_p: Optional[float] = None
     message_count: Optional[int] = None
     
+    # Replica that served the request
+    backend: Optional[str] = None
+    
     # Response details
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
@@ -36,6 +41,29 @@ class CompletionRequest:
     time_to_last_token_ms: Optional[int] = None
     tokens_per_second: Optional[float] = None
     
+    # Inter-token latency (gaps between content chunks of a stream)
+    itl_mean_ms: Optional[float] = None
+    itl_p50_ms: Optional[float] = None
+    itl_p95_ms: Optional[float] = None
+    itl_p99_ms: Optional[float] = None
+    itl_max_ms: Optional[float] = None
+    
+    # Response cache
+    cache_hit: bool = False
+    cache_saved_ms: Optional[int] = None
+    
+    # Request coalescing
+    coalesced: bool = False
+    
+    # Admission queue wait
+    queue_time_ms: Optional[int] = None
+    
+    # Hedged request outcome: won (hedge answered first) or lost
+    hedge_outcome: Optional[str] = None
+    
+    # Retries before the first upstream byte
+    retry_count: Optional[int] = None
+    
     # Schema version for data migration tracking
     app_version: str = "1.0.0"
     
@@ -78,6 +106,36 @@ CREATE TABLE IF NOT EXISTS completion_requests (
     
     -- Error details
     error_type TEXT,
-    error_message TEXT
+    error_message TEXT,
+    
+    -- Inter-token latency
+    itl_mean_ms REAL,
+    itl_p50_ms REAL,
+    itl_p95_ms REAL,
+    itl_p99_ms REAL,
+    itl_max_ms REAL,
+    
+    -- Replica that served the request
+    backend TEXT,
+    
+    -- Response cache
+    cache_hit BOOLEAN DEFAULT 0,
+    cache_saved_ms INTEGER,
+    
+    -- Request coalescing
+    coalesced BOOLEAN DEFAULT 0,
+    
+    -- Admission queue wait
+    queue_time_ms INTEGER,
+    
+    -- Hedged request outcome: won (hedge answered first) or lost
+    hedge_outcome TEXT,
+    
+    -- Retries before the first upstream byte
+    retry_count INTEGER,
+    
+    -- Completion and start time, UTC epoch milliseconds (replacing timestamp)
+    timestamp_ms INTEGER,
+    started_at_ms INTEGER
 )
 """
@@ -0,0 +1,323 @@
+"""
+Rollups of completion_requests per minute and per hour.
+
+Each rollup row holds the sums, counts and maxima of the requests in one
+time bucket with the same model, origin, backend, streaming mode, outcome
+and error type. Latency sketches of their response and first token times
+are kept in separate sketch tables, keyed by bucket and streaming mode
+only: percentiles are reported overall and for streamed requests, and a
+sketch costs far more to merge than a sum. Everything can be added up
+across rows, so get_metrics answers a window from the whole buckets inside
+it and reads raw rows only for the partial buckets at its edges.
+
+The rollups are updated in the transaction that inserts the requests, so
+they always agree with the raw rows. Rebuild them from the raw rows with:
+
+    python -m backend.database.rollups
+"""
+
+import json
+import sqlite3
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# Rollup tables, finest first: table -> bucket length in ms
+ROLLUP_TABLES = {
+    "completion_requests_minutely": 60 * 1000,
+    "completion_requests_hourly": 3600 * 1000,
+}
+
+# Latency sketch tables, with the same buckets as ROLLUP_TABLES
+SKETCH_TABLES = {
+    "completion_requests_minutely_sketches": 60 * 1000,
+    "completion_requests_hourly_sketches": 3600 * 1000,
+}
+
+# Columns a rollup row is keyed by (after bucket_ms): name -> SQL over
+# completion_requests. NULLs are stored as '' (or -1 for is_streaming) since
+# NULLs never match in a primary key
+ROLLUP_DIMENSIONS = {
+    'model': "COALESCE(model, '')",
+    'origin': "COALESCE(origin, '')",
+    'backend': "COALESCE(backend, '')",
+    'is_streaming': "COALESCE(is_streaming, -1)",
+    'success': "success",
+    'error_type': "COALESCE(error_type, '')",
+}
+
+# Aggregates of a rollup row, name -> SQL over completion_requests. They are
+# sums and counts (maxima for ROLLUP_MAXIMA), so rows can be added up
+ROLLUP_AGGREGATES = {
+    'requests': "COUNT(*)",
+    'successful': "SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END)",
+    'failed': "SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END)",
+    'response_time_sum': "SUM(response_time_ms)",
+    'response_time_count': "COUNT(response_time_ms)",
+    # Token usage of the requests that reported it
+    'tokens_reported': "COUNT(total_tokens)",
+    'tokens_total': "SUM(total_tokens)",
+    'prompt_tokens_total': "SUM(CASE WHEN total_tokens IS NOT NULL THEN prompt_tokens END)",
+    'completion_tokens_total': "SUM(CASE WHEN total_tokens IS NOT NULL THEN completion_tokens END)",
+    'tokens_per_second_sum': "SUM(tokens_per_second)",
+    'tokens_per_second_count': "COUNT(tokens_per_second)",
+    # Timing of the requests with both a first and a last token time
+    'timed_count': "COUNT(time_to_last_token_ms - time_to_first_token_ms)",
+    'first_token_sum': "SUM(CASE WHEN time_to_last_token_ms IS NOT NULL THEN time_to_first_token_ms END)",
+    'last_token_sum': "SUM(CASE WHEN time_to_first_token_ms IS NOT NULL THEN time_to_last_token_ms END)",
+    'completion_duration_sum': "SUM(time_to_last_token_ms - time_to_first_token_ms)",
+    # Any first token time, for the per-backend averages
+    'any_first_token_sum': "SUM(time_to_first_token_ms)",
+    'any_first_token_count': "COUNT(time_to_first_token_ms)",
+    # Inter-token latency, written for streams as a whole
+    'itl_count': "COUNT(itl_mean_ms)",
+    'itl_mean_sum': "SUM(itl_mean_ms)",
+    'itl_p50_sum': "SUM(CASE WHEN itl_mean_ms IS NOT NULL THEN itl_p50_ms END)",
+    'itl_p95_sum': "SUM(CASE WHEN itl_mean_ms IS NOT NULL THEN itl_p95_ms END)",
+    'itl_p99_sum': "SUM(CASE WHEN itl_mean_ms IS NOT NULL THEN itl_p99_ms END)",
+    'itl_max': "MAX(CASE WHEN itl_mean_ms IS NOT NULL THEN itl_max_ms END)",
+    'any_itl_p95_sum': "SUM(itl_p95_ms)",
+    'any_itl_p95_count': "COUNT(itl_p95_ms)",
+    # Admission queue wait
+    'queue_time_sum': "SUM(queue_time_ms)",
+    'queue_time_count': "COUNT(queue_time_ms)",
+    # Response cache hits, coalesced, hedged and retried requests
+    'cache_hits': "SUM(CASE WHEN cache_hit = 1 THEN 1 ELSE 0 END)",
+    'cache_saved_ms': "SUM(CASE WHEN cache_hit = 1 THEN cache_saved_ms END)",
+    'cache_hit_response_time_sum': "SUM(CASE WHEN cache_hit = 1 THEN response_time_ms END)",
+    'cache_hit_response_time_count': "COUNT(CASE WHEN cache_hit = 1 THEN response_time_ms END)",
+    'coalesced': "SUM(CASE WHEN coalesced = 1 THEN 1 ELSE 0 END)",
+    'hedged': "SUM(CASE WHEN hedge_outcome IS NOT NULL THEN 1 ELSE 0 END)",
+    'hedge_wins': "SUM(CASE WHEN hedge_outcome = 'won' THEN 1 ELSE 0 END)",
+    'retried': "SUM(CASE WHEN retry_count > 0 THEN 1 ELSE 0 END)"
+}
+ROLLUP_MAXIMA = {'itl_max'}
+
+# Columns a sketch row is keyed by (after bucket_ms), and its latency
+# sketches: name -> completion_requests column
+SKETCH_DIMENSIONS = {
+    'is_streaming': "COALESCE(is_streaming, -1)",
+}
+ROLLUP_SKETCHES = {
+    'response_time_sketch': "response_time_ms",
+    'first_token_sketch': "time_to_first_token_ms",
+}
+
+
+def dump_sketch(sketch: LatencySketch) -> Optional[str]:
+    """A sketch as stored in a rollup row: compact JSON, or None if it is empty."""
+    return json.dumps(sketch.to_dict(), separators=(",", ":")) if sketch.count else None
+
+
+def load_sketch(data: Optional[str]) -> LatencySketch:
+    """A stored sketch, or an empty one for None."""
+    return LatencySketch.from_dict(json.loads(data)) if data else LatencySketch()
+
+
+class _SketchAggregate:
+    """SQL aggregate latency_sketch(value): the stored sketch of the non-NULL values."""
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+
+    def step(self, value):
+        if value is not None:
+            self.sketch.add(value)
+
+    def finalize(self):
+        return dump_sketch(self.sketch)
+
+
+class _MergeAggregate:
+    """SQL aggregate merge_sketches(sketch): the stored sketches merged into one.
+
+    Bucket counts are added straight from the stored form; merging runs once
+    per rollup row read, so building a LatencySketch for each would dominate.
+    """
+
+    def __init__(self):
+        self.merged = None
+
+    def step(self, data):
+        if not data:
+            return
+        other = json.loads(data)
+        merged = self.merged
+        if merged is None:
+            self.merged = other
+            return
+        if other["relative_accuracy"] != merged["relative_accuracy"]:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        buckets = merged["buckets"]
+        for key, count in other["buckets"].items():
+            buckets[key] = buckets.get(key, 0) + count
+        merged["zero_count"] += other["zero_count"]
+        merged["count"] += other["count"]
+        merged["sum"] += other["sum"]
+        merged["min"] = min(merged["min"], other["min"])
+        merged["max"] = max(merged["max"], other["max"])
+
+    def finalize(self):
+        return json.dumps(self.merged, separators=(",", ":")) if self.merged else None
+
+
+def _merge_sketch_pair(first: Optional[str], second: Optional[str]) -> Optional[str]:
+    """SQL function merge_sketch_pair(a, b), for adding a batch to an existing rollup row."""
+    if not first or not second:
+        return first or second
+    merged = _MergeAggregate()
+    merged.step(first)
+    merged.step(second)
+    return merged.finalize()
+
+
+def register_rollup_functions(conn: sqlite3.Connection) -> None:
+    """Register the sketch functions the rollup queries use on a connection."""
+    conn.create_aggregate("latency_sketch", 1, _SketchAggregate)
+    conn.create_aggregate("merge_sketches", 1, _MergeAggregate)
+    conn.create_function("merge_sketch_pair", 2, _merge_sketch_pair, deterministic=True)
+
+
+def _dimensions(table: str) -> Dict[str, str]:
+    return SKETCH_DIMENSIONS if table in SKETCH_TABLES else ROLLUP_DIMENSIONS
+
+
+def rollup_table_schema(table: str) -> str:
+    """CREATE TABLE statement of a rollup or sketch table, clustered by bucket."""
+    dimensions = _dimensions(table)
+    columns = ["bucket_ms INTEGER NOT NULL"] + [
+        f"{name} {'INTEGER' if name in ('is_streaming', 'success') else 'TEXT'} NOT NULL" for name in dimensions
+    ]
+    if table in SKETCH_TABLES:
+        columns += [f"{name} TEXT" for name in ROLLUP_SKETCHES]
+    else:
+        columns += [f"{name} NUMERIC" for name in ROLLUP_AGGREGATES]
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {', '.join(columns)},
+            PRIMARY KEY (bucket_ms, {', '.join(dimensions)})
+        ) WITHOUT ROWID
+    """
+
+
+def create_rollup_statements() -> List[str]:
+    """CREATE TABLE statements of every rollup and sketch table."""
+    return [rollup_table_schema(table) for table in {**ROLLUP_TABLES, **SKETCH_TABLES}]
+
+
+def rollup_columns(table: str) -> List[str]:
+    """Column names of a rollup or sketch table, in schema order."""
+    values = ROLLUP_SKETCHES if table in SKETCH_TABLES else ROLLUP_AGGREGATES
+    return ["bucket_ms"] + list(_dimensions(table)) + list(values)
+
+
+def raw_aggregates_select(bucket_expression: Optional[str] = None) -> str:
+    """SELECT list aggregating completion_requests rows into rollup columns.
+
+    Sums are 0 rather than NULL when there is nothing to add, so rollup rows
+    can be added to with +. Group by the leading columns: the bucket, if
+    bucket_expression is given, and the dimensions.
+    """
+    columns = [f"{bucket_expression} AS bucket_ms"] if bucket_expression else []
+    columns += [f"{sql} AS {name}" for name, sql in ROLLUP_DIMENSIONS.items()]
+    columns += [
+        f"{sql} AS {name}" if name in ROLLUP_MAXIMA else f"COALESCE({sql}, 0) AS {name}"
+        for name, sql in ROLLUP_AGGREGATES.items()
+    ]
+    return ', '.join(columns)
+
+
+def raw_sketches_select(bucket_expression: Optional[str] = None) -> str:
+    """SELECT list aggregating completion_requests rows into sketch columns, grouped like raw_aggregates_select."""
+    columns = [f"{bucket_expression} AS bucket_ms"] if bucket_expression else []
+    columns += [f"{sql} AS {name}" for name, sql in SKETCH_DIMENSIONS.items()]
+    columns += [f"latency_sketch({column}) AS {name}" for name, column in ROLLUP_SKETCHES.items()]
+    return ', '.join(columns)
+
+
+@lru_cache(maxsize=None)
+def _upsert_sql(table: str, bucket_ms: int, condition: str) -> str:
+    """Add the completion_requests rows matching condition to a rollup or sketch table."""
+    dimensions = _dimensions(table)
+    bucket = f"timestamp_ms - timestamp_ms % {bucket_ms}"
+    if table in SKETCH_TABLES:
+        select = raw_sketches_select(bucket)
+        updates = [f"{name} = merge_sketch_pair({name}, excluded.{name})" for name in ROLLUP_SKETCHES]
+    else:
+        select = raw_aggregates_select(bucket)
+        updates = [
+            f"{name} = COALESCE(MAX({name}, excluded.{name}), {name}, excluded.{name})" if name in ROLLUP_MAXIMA
+            else f"{name} = {name} + excluded.{name}"
+            for name in ROLLUP_AGGREGATES
+        ]
+    return f"""
+        INSERT INTO {table} ({', '.join(rollup_columns(table))})
+        SELECT {select}
+        FROM completion_requests
+        WHERE timestamp_ms IS NOT NULL AND {condition}
+        GROUP BY {', '.join(str(position) for position in range(1, len(dimensions) + 2))}
+        ON CONFLICT (bucket_ms, {', '.join(dimensions)}) DO UPDATE SET {', '.join(updates)}
+    """
+
+
+def update_rollups(cursor: sqlite3.Cursor, first_id: int, last_id: int) -> None:
+    """Add the requests with ids first_id to last_id, just inserted, to every rollup and sketch table."""
+    for table, bucket_ms in {**ROLLUP_TABLES, **SKETCH_TABLES}.items():
+        cursor.execute(_upsert_sql(table, bucket_ms, "id BETWEEN ? AND ?"), (first_id, last_id))
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> int:
+    """Regenerate every rollup and sketch table from completion_requests, in one transaction; returns the rows rolled up."""
+    tables = {**ROLLUP_TABLES, **SKETCH_TABLES}
+    cursor = conn.cursor()
+    for statement in create_rollup_statements():
+        cursor.execute(statement)
+    for table, bucket_ms in tables.items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(_upsert_sql(table, bucket_ms, "1 = 1"))
+    cursor.execute("SELECT COUNT(*) FROM completion_requests WHERE timestamp_ms IS NOT NULL")
+    rolled_up = cursor.fetchone()[0]
+    conn.commit()
+    logger.info(f"Rebuilt {len(tables)} rollup tables from {rolled_up} requests")
+    return rolled_up
+
+
+def split_range(start_ms: Optional[int], end_ms: Optional[int],
+                tables: Dict[str, int] = ROLLUP_TABLES) -> List[Tuple[Optional[str], Optional[int], Optional[int]]]:
+    """Split [start_ms, end_ms) into (table, start, end) pieces, and (None, start, end) pieces of raw rows.
+
+    The coarsest table takes the whole buckets inside the range, the next one
+    the whole buckets left at either edge, and raw rows whatever remains. A
+    None start or end leaves that side unbounded. tables maps tables to their
+    bucket lengths, finest first: ROLLUP_TABLES or SKETCH_TABLES.
+    """
+    pieces = []
+    remaining = [(start_ms, end_ms)]
+    for table, bucket_ms in reversed(list(tables.items())):
+        finer = []
+        for low, high in remaining:
+            # First and last bucket boundaries inside the range
+            first = None if low is None else -(-low // bucket_ms) * bucket_ms
+            last = None if high is None else high // bucket_ms * bucket_ms
+            if first is not None and last is not None and first >= last:
+                finer.append((low, high))
+                continue
+            pieces.append((table, first, last))
+            if low is not None and low < first:
+                finer.append((low, first))
+            if high is not None and last < high:
+                finer.append((last, high))
+        remaining = finer
+    return pieces + [(None, low, high) for low, high in remaining]
+
+
+if __name__ == "__main__":
+    from backend.database.connection import get_db_connection, get_db_path
+
+    print(f"Rebuilding rollups of {get_db_path()}")
+    with get_db_connection() as conn:
+        print(f"Rolled up {rebuild_rollups(conn)} requests")
@@ -11,7 +11,7 @@ import os
 from backend.database.schema import (
     get_schema_version, set_schema_version, 
     schema_needs_migration, validate_schema,
-    CURRENT_SCHEMA_VERSION
+    CURRENT_SCHEMA_VERSION, COMPLETION_REQUESTS_INDEXES, create_index_statements
 )
 from backend.database.backup import (
     create_file_backup, create_backup_table,
@@ -19,6 +19,7 @@ from backend.database.backup import (
     cleanup_backup_table
 )
 from backend.database.connection import get_db_connection, get_db_path
+from backend.database.rollups import create_rollup_statements, rebuild_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +84,11 @@ class SafeMigrationManager:
                 # Run the migration directly
                 migration.migration_func()
             else:
+                # The backup table of an earlier step in this run has the same
+                # name; the file backup still covers a full rollback
+                if self.backup_tables:
+                    cleanup_backup_table(self.backup_tables.pop())
+
                 # Create backup table for the main table
                 backup_table = create_backup_table("completion_requests")
                 self.backup_tables.append(backup_table)
@@ -93,12 +99,16 @@ class SafeMigrationManager:
                 migration.migration_func()
                 logger.info(f"Migration function completed for step {migration.version}")
             
-            # Validate the result
-            logger.info(f"Validating schema after migration {migration.version}")
-            is_valid, errors = validate_schema()
-            if not is_valid:
-                logger.error(f"Schema validation failed after migration {migration.version}: {errors}")
-                return False
+            # Validate the result. validate_schema checks the current schema, which
+            # an upgrade over several versions only has after its last step
+            if any(later.version > migration.version for later in self.migrations):
+                logger.info("Schema validation deferred to the last migration")
+            else:
+                logger.info(f"Validating schema after migration {migration.version}")
+                is_valid, errors = validate_schema()
+                if not is_valid:
+                    logger.error(f"Schema validation failed after migration {migration.version}: {errors}")
+                    return False
             
             # Update schema version
             logger.info(f"Updating schema version to {migration.version}")
@@ -221,6 +231,29 @@ class SafeMigrationManager:
 # Create migration manager instance
 migration_manager = SafeMigrationManager()
 
+# Per-request inter-token latency statistics, added in schema version 4
+ITL_COLUMNS = ['itl_mean_ms', 'itl_p50_ms', 'itl_p95_ms', 'itl_p99_ms', 'itl_max_ms']
+
+# The indexes as added in schema version 11, on the ISO text timestamp;
+# version 12 rebuilds them on timestamp_ms
+SCHEMA_11_INDEXES = {
+    "idx_completion_requests_timestamp": ("timestamp", "success", "response_time_ms"),
+    "idx_completion_requests_streaming_timestamp": ("is_streaming", "timestamp", "success", "response_time_ms"),
+    "idx_completion_requests_model_timestamp": ("model", "timestamp"),
+    "idx_completion_requests_origin_timestamp": ("origin", "timestamp"),
+}
+
+# Rows converted per transaction by the schema version 12 timestamp migration
+TIMESTAMP_BATCH_SIZE = 10000
+
+# UTC epoch milliseconds of the ISO text timestamp. Values with a "T" were
+# written by datetime.now().isoformat() in local time; the others are
+# CURRENT_TIMESTAMP defaults, which SQLite writes in UTC
+TIMESTAMP_MS_SQL = """
+    CAST(ROUND((CASE WHEN instr(timestamp, 'T') > 0 THEN julianday(timestamp, 'utc') ELSE julianday(timestamp) END
+        - 2440587.5) * 86400000) AS INTEGER)
+"""
+
 # Define migration steps
 def create_initial_schema():
     """Create the initial database schema."""
@@ -265,10 +298,30 @@ def create_initial_schema():
                     tokens_per_second REAL,
                     app_version TEXT DEFAULT '1.0.0',
                     error_type TEXT,
-                    error_message TEXT
+                    error_message TEXT,
+                    itl_mean_ms REAL,
+                    itl_p50_ms REAL,
+                    itl_p95_ms REAL,
+                    itl_p99_ms REAL,
+                    itl_max_ms REAL,
+                    backend TEXT,
+                    cache_hit BOOLEAN DEFAULT 0,
+                    cache_saved_ms INTEGER,
+                    coalesced BOOLEAN DEFAULT 0,
+                    queue_time_ms INTEGER,
+                    hedge_outcome TEXT,
+                    retry_count INTEGER,
+                    timestamp_ms INTEGER,
+                    started_at_ms INTEGER
                 )
             """)
             
+            # Create its indexes and rollups
+            for statement in create_index_statements():
+                cursor.execute(statement)
+            for statement in create_rollup_statements():
+                cursor.execute(statement)
+            
             # Create schema_version table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS schema_version (
@@ -356,10 +409,233 @@ def add_app_versioning():
         logger.info("App versioning migration completed successfully")
 
 
+def add_itl_columns():
+    """Add inter-token latency statistics columns to completion_requests table."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which ITL columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        for column in ITL_COLUMNS:
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE completion_requests ADD COLUMN {column} REAL")
+                logger.info(f"Added {column} column to completion_requests table")
+            else:
+                logger.info(f"{column} column already exists")
+        
+        conn.commit()
+
+
+def add_backend_column():
+    """Add backend column recording which replica served each request."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check if backend column already exists
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'backend' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN backend TEXT")
+            conn.commit()
+            logger.info("Added backend column to completion_requests table")
+        else:
+            logger.info("Backend column already exists")
+
+
+def add_cache_columns():
+    """Add response cache hit columns to completion_requests table."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'cache_hit' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN cache_hit BOOLEAN DEFAULT 0")
+            logger.info("Added cache_hit column to completion_requests table")
+        else:
+            logger.info("cache_hit column already exists")
+        
+        if 'cache_saved_ms' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN cache_saved_ms INTEGER")
+            logger.info("Added cache_saved_ms column to completion_requests table")
+        else:
+            logger.info("cache_saved_ms column already exists")
+        
+        conn.commit()
+
+
+def add_coalesced_column():
+    """Add column marking requests that shared another request's upstream call."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'coalesced' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN coalesced BOOLEAN DEFAULT 0")
+            logger.info("Added coalesced column to completion_requests table")
+        else:
+            logger.info("coalesced column already exists")
+        
+        conn.commit()
+
+
+def add_queue_time_column():
+    """Add queue_time_ms column recording how long a request waited for a concurrency slot."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'queue_time_ms' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN queue_time_ms INTEGER")
+            logger.info("Added queue_time_ms column to completion_requests table")
+        else:
+            logger.info("queue_time_ms column already exists")
+        
+        conn.commit()
+
+
+def add_hedge_outcome_column():
+    """Add hedge_outcome column recording whether a hedged request was answered by its hedge."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'hedge_outcome' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN hedge_outcome TEXT")
+            logger.info("Added hedge_outcome column to completion_requests table")
+        else:
+            logger.info("hedge_outcome column already exists")
+        
+        conn.commit()
+
+
+def add_retry_count_column():
+    """Add retry_count column recording how often a request was retried before its first upstream byte."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'retry_count' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN retry_count INTEGER")
+            logger.info("Added retry_count column to completion_requests table")
+        else:
+            logger.info("retry_count column already exists")
+        
+        conn.commit()
+
+
+def add_query_indexes():
+    """Add the indexes used by time-range, streaming, model and origin queries."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # IF NOT EXISTS keeps this idempotent; building them reads the table once each
+        for statement in create_index_statements(SCHEMA_11_INDEXES):
+            cursor.execute(statement)
+        logger.info(f"Ensured {len(SCHEMA_11_INDEXES)} indexes on completion_requests")
+        
+        conn.commit()
+
+
+def convert_timestamps_to_epoch_ms():
+    """Add epoch millisecond completion and start times, converted in batches from the ISO timestamps."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check which columns already exist
+        cursor.execute("PRAGMA table_info(completion_requests)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'timestamp_ms' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN timestamp_ms INTEGER")
+            logger.info("Added timestamp_ms column to completion_requests table")
+        else:
+            logger.info("timestamp_ms column already exists")
+        
+        if 'started_at_ms' not in columns:
+            cursor.execute("ALTER TABLE completion_requests ADD COLUMN started_at_ms INTEGER")
+            logger.info("Added started_at_ms column to completion_requests table")
+        else:
+            logger.info("started_at_ms column already exists")
+        
+        # The text timestamp indexes are useless to the new queries; drop them
+        # before converting so the batches do not have to maintain them
+        for index_name, index_columns in COMPLETION_REQUESTS_INDEXES.items():
+            cursor.execute(f"PRAGMA index_info({index_name})")
+            existing_columns = tuple(column[2] for column in sorted(cursor.fetchall()))
+            if existing_columns and existing_columns != index_columns:
+                cursor.execute(f"DROP INDEX {index_name}")
+                logger.info(f"Dropped index {index_name} on {existing_columns}")
+        
+        conn.commit()
+        
+        # Convert in id ranges, one short transaction each, so the write lock is
+        # released between batches and an interrupted run resumes where it stopped.
+        # The request started response_time_ms before it completed
+        cursor.execute("SELECT MIN(id), MAX(id) FROM completion_requests WHERE timestamp_ms IS NULL")
+        first_id, last_id = cursor.fetchone()
+        if first_id is not None:
+            for batch_start in range(first_id, last_id + 1, TIMESTAMP_BATCH_SIZE):
+                cursor.execute(f"""
+                    UPDATE completion_requests
+                    SET timestamp_ms = {TIMESTAMP_MS_SQL},
+                        started_at_ms = {TIMESTAMP_MS_SQL} - COALESCE(response_time_ms, 0)
+                    WHERE id >= ? AND id < ? AND timestamp_ms IS NULL
+                """, (batch_start, batch_start + TIMESTAMP_BATCH_SIZE))
+                conn.commit()
+                logger.info(f"Converted timestamps up to id {min(batch_start + TIMESTAMP_BATCH_SIZE - 1, last_id)} of {last_id}")
+        
+        cursor.execute("SELECT COUNT(*) FROM completion_requests WHERE timestamp_ms IS NOT NULL")
+        converted = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM completion_requests WHERE timestamp_ms IS NULL")
+        unconverted = cursor.fetchone()[0]
+        logger.info(f"{converted} rows have epoch millisecond timestamps")
+        if unconverted:
+            logger.warning(f"{unconverted} rows have no parseable timestamp and are left out of time-range queries")
+        
+        for statement in create_index_statements():
+            cursor.execute(statement)
+        conn.commit()
+
+
+def add_rollup_tables():
+    """Add the minute and hour rollup tables and fill them from the existing requests."""
+    with get_db_connection() as conn:
+        # Rebuilding clears and refills them, so a rerun does not count a request twice
+        rebuild_rollups(conn)
+
+
 # Add migrations to the manager
 migration_manager.add_migration(MigrationStep(1, "Create initial schema", create_initial_schema))
 migration_manager.add_migration(MigrationStep(2, "Add origin column", add_origin_column))
 migration_manager.add_migration(MigrationStep(3, "Add schema versioning and recalculate metrics", add_app_versioning))
+migration_manager.add_migration(MigrationStep(4, "Add inter-token latency columns", add_itl_columns))
+migration_manager.add_migration(MigrationStep(5, "Add backend column", add_backend_column))
+migration_manager.add_migration(MigrationStep(6, "Add response cache columns", add_cache_columns))
+migration_manager.add_migration(MigrationStep(7, "Add coalesced column", add_coalesced_column))
+migration_manager.add_migration(MigrationStep(8, "Add queue_time_ms column for admission queue wait", add_queue_time_column))
+migration_manager.add_migration(MigrationStep(9, "Add hedge_outcome column for hedged requests", add_hedge_outcome_column))
+migration_manager.add_migration(MigrationStep(10, "Add retry_count column for upstream retries", add_retry_count_column))
+migration_manager.add_migration(MigrationStep(11, "Add indexes for time-range and dimension queries", add_query_indexes))
+migration_manager.add_migration(MigrationStep(12, "Store timestamps as UTC epoch milliseconds", convert_timestamps_to_epoch_ms))
+migration_manager.add_migration(MigrationStep(13, "Add minute and hour rollup tables", add_rollup_tables))
 
 def run_safe_migrations() -> bool:
     """Run migrations with full safety measures."""
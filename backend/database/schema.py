@@ -8,10 +8,11 @@ methods for schema validation and comparison.
 from typing import List, Tuple, Dict, Any
 import sqlite3
 from backend.database.connection import get_db_connection
+from backend.database.rollups import ROLLUP_TABLES, SKETCH_TABLES, rollup_columns
 from backend.utils.config import Config
 
 # Current schema version - increment this when making schema changes
-CURRENT_SCHEMA_VERSION = 3
+CURRENT_SCHEMA_VERSION = 13
 
 # Schema definition for the completion_requests table
 COMPLETION_REQUESTS_SCHEMA = """
@@ -37,10 +38,46 @@ CREATE TABLE IF NOT EXISTS completion_requests (
     tokens_per_second REAL,
     app_version TEXT DEFAULT '1.0.0',
     error_type TEXT,
-    error_message TEXT
+    error_message TEXT,
+    itl_mean_ms REAL,
+    itl_p50_ms REAL,
+    itl_p95_ms REAL,
+    itl_p99_ms REAL,
+    itl_max_ms REAL,
+    backend TEXT,
+    cache_hit BOOLEAN DEFAULT 0,
+    cache_saved_ms INTEGER,
+    coalesced BOOLEAN DEFAULT 0,
+    queue_time_ms INTEGER,
+    hedge_outcome TEXT,
+    retry_count INTEGER,
+    timestamp_ms INTEGER,
+    started_at_ms INTEGER
 )
 """
 
+# Indexes on completion_requests: name -> columns. Metrics queries filter on a
+# timestamp_ms range, so it comes first or right after an equality column; the
+# trailing columns let the commonest aggregates be read from the index alone.
+# The ISO text timestamp column predates timestamp_ms and is no longer queried
+COMPLETION_REQUESTS_INDEXES = {
+    # Time range of every query; covers the overall request counts
+    "idx_completion_requests_timestamp": ("timestamp_ms", "success", "response_time_ms"),
+    # Streamed and non-streamed breakdowns; covers their request counts
+    "idx_completion_requests_streaming_timestamp": ("is_streaming", "timestamp_ms", "success", "response_time_ms"),
+    # Model and origin distributions
+    "idx_completion_requests_model_timestamp": ("model", "timestamp_ms"),
+    "idx_completion_requests_origin_timestamp": ("origin", "timestamp_ms"),
+}
+
+
+def create_index_statements(indexes: Dict[str, Tuple[str, ...]] = COMPLETION_REQUESTS_INDEXES) -> List[str]:
+    """CREATE INDEX statements for COMPLETION_REQUESTS_INDEXES (or another name -> columns mapping)."""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name} ON completion_requests ({', '.join(columns)})"
+        for name, columns in indexes.items()
+    ]
+
 # Schema version table
 SCHEMA_VERSION_TABLE = """
 CREATE TABLE IF NOT EXISTS schema_version (
@@ -153,7 +190,21 @@ def validate_schema() -> Tuple[bool, List[str]]:
                 ('tokens_per_second', 'REAL', 0, None, 0),
                 ('error_type', 'TEXT', 0, None, 0),
                 ('error_message', 'TEXT', 0, None, 0),
-                ('app_version', 'TEXT', 0, '1.0.0', 0)  # Added at the end by ALTER TABLE
+                ('app_version', 'TEXT', 0, '1.0.0', 0),  # Added at the end by ALTER TABLE
+                ('itl_mean_ms', 'REAL', 0, None, 0),
+                ('itl_p50_ms', 'REAL', 0, None, 0),
+                ('itl_p95_ms', 'REAL', 0, None, 0),
+                ('itl_p99_ms', 'REAL', 0, None, 0),
+                ('itl_max_ms', 'REAL', 0, None, 0),
+                ('backend', 'TEXT', 0, None, 0),
+                ('cache_hit', 'BOOLEAN', 0, '0', 0),
+                ('cache_saved_ms', 'INTEGER', 0, None, 0),
+                ('coalesced', 'BOOLEAN', 0, '0', 0),
+                ('queue_time_ms', 'INTEGER', 0, None, 0),
+                ('hedge_outcome', 'TEXT', 0, None, 0),
+                ('retry_count', 'INTEGER', 0, None, 0),
+                ('timestamp_ms', 'INTEGER', 0, None, 0),
+                ('started_at_ms', 'INTEGER', 0, None, 0)
             ]
             
             # Check column count
@@ -161,17 +212,18 @@ def validate_schema() -> Tuple[bool, List[str]]:
                 errors.append(f"Expected {len(expected_columns)} columns, got {len(columns)}")
                 return False, errors
             
+            # Columns are matched by name: ALTER TABLE appends columns, so a
+            # migrated table and a freshly created one differ in column order
+            # PRAGMA table_info returns: (cid, name, type, notnull, default_value, pk)
+            columns_by_name = {column[1]: column for column in columns}
+            
             # Check each column
-            for i, (expected_name, expected_type, expected_notnull, expected_default, expected_pk) in enumerate(expected_columns):
-                if i >= len(columns):
+            for expected_name, expected_type, expected_notnull, expected_default, expected_pk in expected_columns:
+                if expected_name not in columns_by_name:
                     errors.append(f"Missing column {expected_name}")
                     continue
                 
-                # PRAGMA table_info returns: (cid, name, type, notnull, default_value, pk)
-                col_cid, col_name, col_type, col_notnull, col_default, col_pk = columns[i]
-                
-                if col_name != expected_name:
-                    errors.append(f"Column {i}: expected name '{expected_name}', got '{col_name}'")
+                col_cid, col_name, col_type, col_notnull, col_default, col_pk = columns_by_name[expected_name]
                 
                 if col_type.upper() != expected_type.upper():
                     errors.append(f"Column {expected_name}: expected type '{expected_type}', got '{col_type}'")
@@ -182,6 +234,29 @@ def validate_schema() -> Tuple[bool, List[str]]:
                 if col_pk != expected_pk:
                     errors.append(f"Column {expected_name}: expected pk {expected_pk}, got {col_pk}")
             
+            # Check the indexes the metrics queries rely on
+            # PRAGMA index_info returns: (seqno, cid, name)
+            cursor.execute("PRAGMA index_list(completion_requests)")
+            index_names = {index[1] for index in cursor.fetchall()}
+            for index_name, expected_index_columns in COMPLETION_REQUESTS_INDEXES.items():
+                if index_name not in index_names:
+                    errors.append(f"Missing index {index_name}")
+                    continue
+                
+                cursor.execute(f"PRAGMA index_info({index_name})")
+                index_columns = tuple(column[2] for column in sorted(cursor.fetchall()))
+                if index_columns != expected_index_columns:
+                    errors.append(f"Index {index_name}: expected columns {expected_index_columns}, got {index_columns}")
+            
+            # Check the rollup and sketch tables get_metrics reads
+            for table in {**ROLLUP_TABLES, **SKETCH_TABLES}:
+                cursor.execute(f"PRAGMA table_info({table})")
+                table_columns = [column[1] for column in cursor.fetchall()]
+                if not table_columns:
+                    errors.append(f"Missing rollup table {table}")
+                elif table_columns != rollup_columns(table):
+                    errors.append(f"Rollup table {table}: expected columns {rollup_columns(table)}, got {table_columns}")
+            
             return len(errors) == 0, errors
             
     except Exception as e:
@@ -6,22 +6,31 @@ This service proxies requests to the OpenAI-compatible backend while collecting
 detailed metrics about each request for analysis and monitoring.
 """
 
+import os
 import time
 import logging
-import httpx
 from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from backend.services.proxy_service import ProxyService
+from backend.services.model_router import ModelRouter
+from backend.services.response_cache import response_cache
+from backend.services.request_coalescer import RequestCoalescer
+from backend.services.models_cache import ModelsCache
+from backend.services.concurrency_limiter import ConcurrencyLimits
+from backend.services.rate_limiter import RateLimiter
+from backend.services.hedging import Hedging
+from backend.services.retry_policy import RetryPolicy
+from backend.services.request_body import read_request_body, RequestBodyTooLarge
+from backend.services.upstream_client import upstream_clients
+from backend.services.metrics_writer import metrics_writer
 from backend.utils.config import Config
+from backend.utils.logging_config import logging_manager
 from backend.database.safe_migrations import run_safe_migrations
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records are formatted and written by a background thread
+logging_manager.configure(Config.LOG_VOLUME, Config.LOG_FORMAT, Config.LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -37,14 +46,27 @@ app.add_middleware(
 )
 
 # Initialize proxy service
-proxy_service = ProxyService(Config.get_backend_url())
+proxy_service = ProxyService(
+    ModelRouter.from_config(),
+    upstream_clients,
+    cache=response_cache if Config.RESPONSE_CACHE_ENABLED else None,
+    coalescer=RequestCoalescer(streams=Config.COALESCE_STREAMS) if Config.COALESCE_ENABLED else None,
+    models_cache=ModelsCache(Config.MODELS_CACHE_TTL, Config.MODELS_CACHE_MAX_STALE) if Config.MODELS_CACHE_TTL > 0 else None,
+    limits=ConcurrencyLimits.from_config(),
+    rate_limiter=RateLimiter.from_config(),
+    hedging=Hedging.from_config(),
+    retry_policy=RetryPolicy.from_config()
+)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup."""
+    if Config.METRICS_WRITER_MODE == "socket":
+        # The metrics writer process owns the database and runs the migrations
+        logger.info(f"Sending metrics to the writer process at {Config.METRICS_WRITER_SOCKET}")
     # Run database migrations with full safety measures
-    if run_safe_migrations():
+    elif run_safe_migrations():
         logger.info("Database migrations completed successfully")
     else:
         logger.error("CRITICAL: Database migrations failed")
@@ -55,28 +77,70 @@ async def startup_event():
         import sys
         sys.exit(1)
     
+    # Open the long-lived upstream connection pool
+    await upstream_clients.start(proxy_service.router.urls)
+    
+    # Probe replicas in the background so failed ones rejoin the rotation
+    proxy_service.router.start_health_checks(
+        upstream_clients, Config.HEALTH_CHECK_INTERVAL, Config.HEALTH_CHECK_PATH, Config.HEALTH_CHECK_TIMEOUT
+    )
+    
+    # Record metrics off the request path
+    metrics_writer.start()
+    
+    # Learn the hedge delays from recorded first byte times
+    if proxy_service.hedging is not None:
+        proxy_service.hedging.start()
+    
     logger.info(f"LLM Metrics Proxy started")
-    logger.info(f"Proxying to: {Config.get_backend_url()}")
+    logger.info(f"Proxying to: {', '.join(proxy_service.router.urls)} (routes: {len(proxy_service.router.routes)})")
     logger.info(f"Listening on port: {Config.get_proxy_port()}")
     logger.info(f"Metrics dashboard available on separate port")
     
     print(f"LLM Metrics Proxy started")
-    print(f"Proxying to: {Config.get_backend_url()}")
+    print(f"Proxying to: {', '.join(proxy_service.router.urls)} (routes: {len(proxy_service.router.routes)})")
     print(f"Listening on port: {Config.get_proxy_port()}")
     print(f"Metrics dashboard available on separate port")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release resources on shutdown."""
+    await proxy_service.router.stop_health_checks()
+    if proxy_service.hedging is not None:
+        await proxy_service.hedging.stop()
+    await upstream_clients.close()
+    logger.info("Upstream connections closed")
+    
+    # Finish writing cached responses to the disk tier
+    await response_cache.flush()
+    
+    # Flush any metrics still queued
+    await metrics_writer.stop()
+    
+    # Write out any log records still queued
+    logging_manager.shutdown()
+
+
 @app.post("/v1/chat/completions")
 async def proxy_chat_completions(request: Request):
     """Proxy chat completion requests to backend and track enhanced metrics."""
     start_time = time.time()
     request_id = f"req_{int(start_time * 1000)}"
     
-    logger.info(f"[{request_id}] New completion request received")
-    
-    # Get request body
-    body = await request.body()
-    logger.info(f"[{request_id}] Request body size: {len(body)} bytes")
+    # Get request body; large ones are only read up to the fields needed for routing when body streaming is on
+    try:
+        body = await read_request_body(
+            request, Config.MAX_REQUEST_BODY_BYTES, Config.REQUEST_BODY_STREAMING, Config.REQUEST_BODY_SNIFF_BYTES
+        )
+    except RequestBodyTooLarge as e:
+        request_metrics = proxy_service.extract_request_metrics(request, None)
+        request_metrics["request_id"] = request_id
+        return proxy_service.reject_oversized_body(start_time, request_metrics, e)
+    if isinstance(body, bytes):
+        logger.debug("[%s] New completion request received - body size: %d bytes", request_id, len(body))
+    else:
+        logger.debug("[%s] New completion request received - streaming body after %d bytes", request_id, len(body.head))
     
     # Get request headers
     headers = dict(request.headers)
@@ -86,24 +150,32 @@ async def proxy_chat_completions(request: Request):
     
     # Extract request parameters for metrics
     request_metrics = proxy_service.extract_request_metrics(request, body)
+    request_metrics["request_id"] = request_id
+    
+    logger.debug("[%s] Request details - Model: %s, Origin: %s, Streaming: %s, Messages: %s",
+                 request_id, request_metrics['model'], request_metrics['origin'],
+                 request_metrics['is_streaming'], request_metrics['message_count'])
     
-    logger.info(f"[{request_id}] Request details - Model: {request_metrics['model']}, "
-                f"Origin: {request_metrics['origin']}, "
-                f"Streaming: {request_metrics['is_streaming']}, Messages: {request_metrics['message_count']}")
+    # Fail fast on models the backends do not list instead of tying up a backend connection
+    if Config.MODELS_VALIDATE and not await proxy_service.is_known_model(request_metrics["model"]):
+        logger.debug("[%s] Rejecting unknown model %s", request_id, request_metrics['model'])
+        return proxy_service.reject_unknown_model(start_time, request_metrics)
+    
+    # Turn away clients over their request or token budget before any backend work
+    if proxy_service.rate_limiter is not None:
+        rejection = proxy_service.check_rate_limit(headers, start_time, request_metrics)
+        if rejection is not None:
+            return rejection
     
     try:
         # Forward request to backend
-        logger.info(f"[{request_id}] Forwarding request to backend: {Config.get_backend_url()}/v1/chat/completions")
-        
         if request_metrics["is_streaming"]:
             # Handle streaming responses
-            logger.info(f"[{request_id}] Handling streaming response")
             return await proxy_service.handle_streaming_response(
                 body, headers, start_time, request_metrics, request_id
             )
         else:
             # Handle non-streaming responses
-            logger.info(f"[{request_id}] Handling non-streaming response")
             return await proxy_service.handle_non_streaming_response(
                 body, headers, start_time, request_metrics, request_id
             )
@@ -126,26 +198,11 @@ async def proxy_chat_completions(request: Request):
 @app.get("/v1/models")
 async def proxy_models():
     """Proxy models list requests to backend without logging to database."""
-    logger.info("Models list request received")
+    logger.debug("Models list request received")
     
     try:
-        # Forward request to backend
-        logger.info(f"Forwarding models request to backend: {Config.get_backend_url()}/v1/models")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{Config.get_backend_url()}/v1/models",
-                timeout=30.0
-            )
-            
-            logger.info(f"Backend models response - Status: {response.status_code}")
-            
-            # Return the response from backend
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
+        # Served from the models cache; forwarded to the backends (and merged across pools) when it is stale
+        return await proxy_service.list_models()
             
     except Exception as e:
         logger.error(f"Models request failed with error: {e}")
@@ -163,6 +220,31 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/proxy/stats")
+async def proxy_stats():
+    """Expose in-memory proxy counters (backends, upstream pool, response cache, coalescing, metrics writer and logging)."""
+    return {
+        "backends": proxy_service.router.get_stats(),
+        "upstream": upstream_clients.get_stats(),
+        "response_cache": response_cache.get_stats() if proxy_service.cache is not None else None,
+        "coalescing": proxy_service.coalescer.get_stats() if proxy_service.coalescer is not None else None,
+        "models_cache": proxy_service.models_cache.get_stats() if proxy_service.models_cache is not None else None,
+        "admission": proxy_service.limits.get_stats() if proxy_service.limits is not None else None,
+        "rate_limits": proxy_service.rate_limiter.get_stats() if proxy_service.rate_limiter is not None else None,
+        "hedging": proxy_service.hedging.get_stats() if proxy_service.hedging is not None else None,
+        "retries": proxy_service.retry_policy.get_stats() if proxy_service.retry_policy is not None else None,
+        "circuit_breakers": proxy_service.router.get_circuit_breakers() if proxy_service.circuit_breakers else None,
+        "metrics_writer": metrics_writer.get_stats(),
+        "logging": logging_manager.get_stats()
+    }
+
+
+@app.get("/proxy/circuit-breakers")
+async def circuit_breakers():
+    """Expose each backend's circuit breaker state, window counts and recent state transitions."""
+    return proxy_service.router.get_circuit_breakers()
+
+
 @app.get("/test-stream")
 async def test_stream():
     """Test streaming endpoint to verify streaming functionality."""
@@ -182,4 +264,16 @@ async def test_stream():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=Config.get_proxy_port())
+    if Config.PROXY_WORKERS > 1:
+        # One writer process owns the database; the workers send it their records
+        from backend.metrics_writer_server import start_writer_process
+        writer_process = start_writer_process(Config.METRICS_WRITER_SOCKET)
+        os.environ["METRICS_WRITER_MODE"] = "socket"
+        try:
+            uvicorn.run("backend.metrics_proxy:app", host="0.0.0.0", port=Config.get_proxy_port(),
+                        workers=Config.PROXY_WORKERS)
+        finally:
+            writer_process.terminate()
+            writer_process.join()
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=Config.get_proxy_port())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Metrics Writer Server
+
+Single writer process for multi-worker proxy deployments. It runs the
+database migrations, owns the only write connection to the metrics
+database and commits the records that proxy workers (running with
+METRICS_WRITER_MODE=socket) send over a local Unix socket.
+
+Started automatically by the proxy when PROXY_WORKERS is above 1, or on
+its own with:
+    python -m backend.metrics_writer_server
+"""
+
+import sys
+import time
+import signal
+import asyncio
+import logging
+import multiprocessing
+
+from backend.database.dao import completion_requests_dao
+from backend.database.safe_migrations import run_safe_migrations
+from backend.services.metrics_relay import MetricsRelayServer
+from backend.services.metrics_writer import MetricsWriter
+from backend.utils.config import Config
+from backend.utils.logging_config import logging_manager
+
+logger = logging.getLogger(__name__)
+
+
+async def serve(socket_path: str, ready=None) -> None:
+    """Accept records until SIGTERM or SIGINT, then flush them."""
+    if not run_safe_migrations():
+        logger.error("CRITICAL: Database migrations failed, metrics writer not started")
+        sys.exit(1)
+
+    writer = MetricsWriter.from_config(sink=completion_requests_dao.insert_completion_request_rows)
+    # Records from every worker arrive here, so larger commits pay off
+    writer.batch_size = Config.METRICS_WRITER_BATCH_SIZE
+    writer.start()
+    server = MetricsRelayServer(socket_path, writer)
+    await server.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    if ready is not None:
+        ready.set()
+
+    await stopping.wait()
+    await server.stop()
+    await writer.stop()
+    logger.info(f"Metrics writer stopped - received: {server.received_total}")
+
+
+def run(socket_path: str, ready=None) -> None:
+    """Process entry point."""
+    logging_manager.configure(Config.LOG_VOLUME, Config.LOG_FORMAT, Config.LOG_QUEUE_SIZE)
+    try:
+        asyncio.run(serve(socket_path, ready))
+    finally:
+        logging_manager.shutdown()
+
+
+def start_writer_process(socket_path: str, timeout: float = 60.0) -> multiprocessing.Process:
+    """Start the writer in a child process and wait until it accepts connections."""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=run, args=(socket_path, ready), name="metrics-writer")
+    process.start()
+    deadline = time.monotonic() + timeout
+    while not ready.wait(0.1):
+        if not process.is_alive() or time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError("Metrics writer failed to start")
+    return process
+
+
+if __name__ == "__main__":
+    print(f"Metrics writer listening on {Config.METRICS_WRITER_SOCKET}")
+    print(f"Database path: {Config.get_db_path()}")
+    run(Config.METRICS_WRITER_SOCKET)
@@ -0,0 +1,226 @@
+"""
+Backend selection for the LLM Metrics Proxy.
+
+A BackendPool holds the replicas that can serve a request and picks one per
+request, either the replica with the fewest in-flight requests or the one
+with the lowest (load-weighted) EWMA of time to first token. Replicas are
+taken out of rotation after repeated failures (passive health checking) and
+probed in the background (active health checking). Replicas can also have a
+CircuitBreaker, which keeps them out of rotation while their recent error or
+slow request rate is too high.
+"""
+
+import time
+import asyncio
+import logging
+import itertools
+from typing import Dict, Any, List, Optional, Iterable, Union
+
+from backend.services.circuit_breaker import CircuitBreaker, CircuitOpen
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+ROUTING_STRATEGIES = ("least_outstanding", "ewma_ttft")
+
+
+class Backend:
+    """One upstream replica and its routing state."""
+
+    def __init__(self, url: str, breaker: Optional[CircuitBreaker] = None):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        if breaker is not None:
+            breaker.name = self.url
+        self.in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.ewma_ttft_ms: Optional[float] = None
+
+        # Health state
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_at: Optional[float] = None
+        self.last_check_at: Optional[float] = None
+        self.last_check_ok: Optional[bool] = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "consecutive_failures": self.consecutive_failures,
+            "ewma_ttft_ms": round(self.ewma_ttft_ms, 1) if self.ewma_ttft_ms is not None else None,
+            "last_check_ok": self.last_check_ok,
+            "circuit": self.breaker.state if self.breaker is not None else None
+        }
+
+
+class BackendPool:
+    """Routes requests across replicas and tracks their health."""
+
+    def __init__(
+        self,
+        urls: Iterable[Union[str, Backend]],
+        strategy: str = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        failure_threshold: int = 3,
+        eject_seconds: float = 30.0
+    ):
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}', expected one of {ROUTING_STRATEGIES}")
+        # Backend instances can be shared between pools so their load and health are too
+        self.backends: List[Backend] = [url if isinstance(url, Backend) else Backend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("A backend pool needs at least one backend")
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        # Rotates the starting point so ties are spread across replicas
+        self._rotation = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, urls: Optional[List[Union[str, Backend]]] = None) -> "BackendPool":
+        """Build a pool from the application configuration."""
+        urls = urls if urls is not None else Config.get_backend_urls()
+        return cls(
+            [url if isinstance(url, Backend) else Backend(url, CircuitBreaker.from_config()) for url in urls],
+            strategy=Config.ROUTING_STRATEGY,
+            ewma_alpha=Config.ROUTING_EWMA_ALPHA,
+            failure_threshold=Config.BACKEND_FAILURE_THRESHOLD,
+            eject_seconds=Config.BACKEND_EJECT_SECONDS
+        )
+
+    @property
+    def urls(self) -> List[str]:
+        return [backend.url for backend in self.backends]
+
+    def _available(self, backend: Backend, now: float) -> bool:
+        """Healthy, or ejected long enough ago to be given another try."""
+        return backend.healthy or (backend.ejected_at is not None and now - backend.ejected_at >= self.eject_seconds)
+
+    def _score(self, backend: Backend) -> float:
+        if self.strategy == "ewma_ttft":
+            # Unmeasured replicas score 0 so they get sampled; load keeps one fast replica from taking everything
+            return (backend.ewma_ttft_ms or 0.0) * (backend.in_flight + 1)
+        return backend.in_flight
+
+    def select(self, exclude: Iterable[Backend] = ()) -> Backend:
+        """Pick the replica for the next request; raises CircuitOpen if every replica's circuit is open."""
+        backends = self.backends
+        if len(backends) == 1 and backends[0].breaker is None:
+            return backends[0]
+
+        now = time.monotonic()
+        allowed = [b for b in backends if b.breaker is None or b.breaker.allows(now)]
+        if not allowed:
+            for backend in backends:
+                backend.breaker.rejected_total += 1
+            raise CircuitOpen(self.urls, min(backend.breaker.retry_after(now) for backend in backends))
+
+        excluded = set(id(backend) for backend in exclude)
+        candidates = [b for b in allowed if id(b) not in excluded and self._available(b, now)]
+        if not candidates:
+            # Every replica is failing: keep trying rather than refusing all traffic
+            candidates = [b for b in allowed if id(b) not in excluded] or allowed
+
+        start = next(self._rotation) % len(candidates)
+        rotated = candidates[start:] + candidates[:start]
+        backend = min(rotated, key=self._score)
+        if backend.breaker is not None:
+            backend.breaker.on_select()
+        return backend
+
+    def begin(self, backend: Backend) -> None:
+        """Count a request as in flight on a replica."""
+        backend.in_flight += 1
+        backend.requests_total += 1
+
+    def end(self, backend: Backend) -> None:
+        backend.in_flight -= 1
+
+    def record_success(self, backend: Backend, ttft_ms: Optional[float] = None) -> None:
+        """Passive health: a response was received from the replica."""
+        if backend.breaker is not None:
+            backend.breaker.record(True, ttft_ms)
+        backend.consecutive_failures = 0
+        if not backend.healthy:
+            logger.info(f"Backend {backend.url} is serving again")
+            backend.healthy = True
+            backend.ejected_at = None
+        if ttft_ms is not None:
+            if backend.ewma_ttft_ms is None:
+                backend.ewma_ttft_ms = ttft_ms
+            else:
+                backend.ewma_ttft_ms += self.ewma_alpha * (ttft_ms - backend.ewma_ttft_ms)
+
+    def record_failure(self, backend: Backend) -> None:
+        """Passive health: the replica failed to connect or returned a server error."""
+        if backend.breaker is not None:
+            backend.breaker.record(False)
+        backend.errors_total += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            if backend.healthy:
+                logger.warning(f"Backend {backend.url} ejected after {backend.consecutive_failures} consecutive failures")
+            backend.healthy = False
+            backend.ejected_at = time.monotonic()
+
+    async def check_health(self, upstream, path: str = "/v1/models", timeout: float = 5.0) -> None:
+        """Active health: probe every replica once."""
+        async def probe(backend: Backend):
+            try:
+                response = await upstream.get_client(backend.url).get(path, timeout=timeout)
+                ok = response.status_code < 500
+            except Exception as e:
+                logger.debug("Health check of %s failed: %s", backend.url, e)
+                ok = False
+
+            backend.last_check_at = time.monotonic()
+            backend.last_check_ok = ok
+            if ok and not backend.healthy:
+                logger.info(f"Backend {backend.url} passed its health check")
+                backend.healthy = True
+                backend.consecutive_failures = 0
+                backend.ejected_at = None
+            elif not ok and backend.healthy:
+                logger.warning(f"Backend {backend.url} failed its health check")
+                backend.healthy = False
+                backend.ejected_at = time.monotonic()
+
+        await asyncio.gather(*(probe(backend) for backend in self.backends))
+
+    def start_health_checks(self, upstream, interval: float, path: str = "/v1/models", timeout: float = 5.0) -> None:
+        """Probe replicas every interval seconds in the background (called on app startup)."""
+        if interval <= 0 or self._health_task is not None:
+            return
+
+        async def run():
+            while True:
+                try:
+                    await self.check_health(upstream, path, timeout)
+                except Exception as e:
+                    logger.error(f"Backend health check failed: {e}")
+                await asyncio.sleep(interval)
+
+        self._health_task = asyncio.get_running_loop().create_task(run())
+
+    async def stop_health_checks(self) -> None:
+        """Stop background probing (called on app shutdown)."""
+        task, self._health_task = self._health_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Routing strategy and per-replica state for the /proxy/stats endpoint."""
+        return {
+            "strategy": self.strategy,
+            "backends": {backend.url: backend.get_stats() for backend in self.backends}
+        }
@@ -0,0 +1,201 @@
+"""
+Per-backend circuit breakers.
+
+Passive health checking ejects a replica after a few consecutive failures,
+which misses a backend that fails half its requests or has become very
+slow. A CircuitBreaker keeps the outcomes of the last few seconds of
+requests to its backend in memory and opens when too many of them failed,
+or had a first byte slower than a threshold. While open the backend gets
+no traffic: requests go to other replicas of the pool, or, when every
+replica's breaker is open, are answered with a 503 at once instead of
+waiting out a connect timeout each. After a while the breaker half-opens
+and lets a few probe requests through; it closes again once they all
+succeed and reopens if one fails.
+"""
+
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Any, List, Optional
+
+from backend.services.concurrency_limiter import AdmissionRejected
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# The rolling window is kept in this many buckets
+WINDOW_BUCKETS = 10
+
+# Recent transitions kept per breaker for the /proxy/circuit-breakers endpoint
+MAX_TRANSITIONS = 20
+
+
+class CircuitOpen(AdmissionRejected):
+    """A request turned away because every replica that could serve it has an open circuit."""
+
+    def __init__(self, urls: List[str], retry_after: float):
+        super().__init__(503, "circuit_open", f"Circuit open for {', '.join(urls)}")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens on the error or slow request rate of a rolling window; half-opens with probes after open_seconds."""
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        min_requests: int = 20,
+        window: float = 10.0,
+        open_seconds: float = 30.0,
+        probes: int = 3,
+        slow_ms: float = 0.0,
+        slow_rate: float = 0.5
+    ):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.slow_ms = slow_ms
+        self.slow_rate = slow_rate
+        # Set by the Backend the breaker guards, for logs
+        self.name = ""
+
+        self.state = CLOSED
+        self.changed_at = time.monotonic()
+        # [start, requests, failures, slow] per bucket, oldest first, with running totals
+        self._buckets: Deque[List[float]] = deque()
+        self.requests = 0
+        self.failures = 0
+        self.slow = 0
+        # Half-open probes let through and succeeded so far
+        self.probes_sent = 0
+        self.probes_succeeded = 0
+
+        # Counters
+        self.opened_total = 0
+        self.rejected_total = 0
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=MAX_TRANSITIONS)
+
+    @classmethod
+    def from_config(cls) -> Optional["CircuitBreaker"]:
+        """A breaker configured from the environment, or None when circuit breaking is disabled."""
+        if not Config.CIRCUIT_BREAKER_ENABLED:
+            return None
+        return cls(
+            error_rate=Config.CIRCUIT_ERROR_RATE,
+            min_requests=Config.CIRCUIT_MIN_REQUESTS,
+            window=Config.CIRCUIT_WINDOW,
+            open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+            probes=Config.CIRCUIT_HALF_OPEN_PROBES,
+            slow_ms=Config.CIRCUIT_SLOW_MS,
+            slow_rate=Config.CIRCUIT_SLOW_RATE
+        )
+
+    def allows(self, now: float) -> bool:
+        """Whether a request may be routed to the backend now."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if now - self.changed_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN, now, f"open for {self.open_seconds:g}s")
+        elif self.probes_sent >= self.probes and now - self.changed_at >= self.open_seconds:
+            # Probes that never reported back (cancelled or hedged away) must not hold the breaker half-open
+            self.probes_sent = self.probes_succeeded
+            self.changed_at = now
+        return self.probes_sent < self.probes
+
+    def retry_after(self, now: float) -> float:
+        """Seconds until the breaker lets a request through again."""
+        if self.state == OPEN:
+            return max(self.open_seconds - (now - self.changed_at), 0.0)
+        return 0.0
+
+    def on_select(self) -> None:
+        """A request was routed to the backend; in half-open state it is one of the probes."""
+        if self.state == HALF_OPEN:
+            self.probes_sent += 1
+
+    def record(self, ok: bool, ttft_ms: Optional[float] = None) -> None:
+        """Count the outcome of a request: ok if the backend answered, slow if its first byte took over slow_ms."""
+        now = time.monotonic()
+        slow = ok and self.slow_ms > 0 and ttft_ms is not None and ttft_ms >= self.slow_ms
+
+        if self.state == HALF_OPEN:
+            if not ok or slow:
+                self._transition(OPEN, now, "probe " + ("failed" if not ok else f"took {ttft_ms:.0f}ms"))
+                return
+            self.probes_succeeded += 1
+            if self.probes_succeeded >= self.probes:
+                self._transition(CLOSED, now, f"{self.probes_succeeded} probes succeeded")
+            return
+        if self.state == OPEN:
+            # Requests sent before the breaker opened; they must not count towards the next window
+            return
+
+        self._count(now, ok, slow)
+        if self.requests < self.min_requests:
+            return
+        if self.failures / self.requests >= self.error_rate:
+            self._transition(OPEN, now, f"{self.failures}/{self.requests} requests failed in {self.window:g}s")
+        elif self.slow_ms > 0 and self.slow / self.requests >= self.slow_rate:
+            self._transition(OPEN, now, f"{self.slow}/{self.requests} first bytes over {self.slow_ms:g}ms in {self.window:g}s")
+
+    def _count(self, now: float, ok: bool, slow: bool) -> None:
+        width = self.window / WINDOW_BUCKETS
+        buckets = self._buckets
+        while buckets and now - buckets[0][0] >= self.window:
+            _, requests, failures, slow_requests = buckets.popleft()
+            self.requests -= requests
+            self.failures -= failures
+            self.slow -= slow_requests
+        if not buckets or now - buckets[-1][0] >= width:
+            buckets.append([now, 0, 0, 0])
+        bucket = buckets[-1]
+        bucket[1] += 1
+        self.requests += 1
+        if not ok:
+            bucket[2] += 1
+            self.failures += 1
+        if slow:
+            bucket[3] += 1
+            self.slow += 1
+
+    def _reset_window(self) -> None:
+        self._buckets.clear()
+        self.requests = self.failures = self.slow = 0
+
+    def _transition(self, state: str, now: float, reason: str) -> None:
+        previous, self.state = self.state, state
+        self.changed_at = now
+        self.probes_sent = self.probes_succeeded = 0
+        if state == OPEN:
+            self.opened_total += 1
+            self._reset_window()
+            logger.warning(f"Circuit for {self.name} opened: {reason}")
+        else:
+            logger.info(f"Circuit for {self.name} {state.replace('_', '-')}: {reason}")
+        self.transitions.append({
+            "timestamp": datetime.now().isoformat(),
+            "from": previous,
+            "to": state,
+            "reason": reason
+        })
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "state": self.state,
+            "seconds_in_state": round(now - self.changed_at, 1),
+            "retry_after": round(self.retry_after(now), 1),
+            "window": {"requests": self.requests, "failures": self.failures, "slow": self.slow},
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+            "transitions": list(self.transitions)
+        }
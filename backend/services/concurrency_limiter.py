@@ -0,0 +1,198 @@
+"""
+Concurrency limits with an admission queue.
+
+Backends such as Ollama and vLLM slow down sharply past a certain number
+of parallel sequences, so the number of requests forwarded at once can be
+capped per backend replica or per model. Requests over the cap wait in a
+FIFO queue; when the queue is full they are turned away with a 429, and
+when they have waited too long with a 503.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Any, Optional
+
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+LIMIT_SCOPES = ("backend", "model")
+
+# Limiters for at most this many keys are kept; idle ones are dropped beyond it
+MAX_LIMITERS = 4096
+
+
+class AdmissionRejected(Exception):
+    """A request turned away by admission control."""
+
+    def __init__(self, status_code: int, error_type: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_type = error_type
+
+
+class ConcurrencyLimiter:
+    """At most limit requests at once; up to max_queue more wait up to max_wait seconds in turn."""
+
+    def __init__(self, limit: int, max_queue: int = 100, max_wait: float = 30.0):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # Counters
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.peak_queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if none is free."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted_total += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(429, "queue_full", f"Too many requests: {self.active} in flight and {len(self._waiters)} queued")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        self.peak_queued = max(self.peak_queued, len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.max_wait if self.max_wait > 0 else None)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait ended; pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise AdmissionRejected(503, "queue_timeout", f"No capacity within {self.max_wait:g}s") from None
+            raise
+        # The releasing request handed its slot over, so active is unchanged
+        self.admitted_total += 1
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free without queueing."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted_total += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """Return a slot, handing it to the longest waiting request if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "peak_queued": self.peak_queued,
+            "admitted_total": self.admitted_total,
+            "queued_total": self.queued_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout
+        }
+
+
+def parse_limit_overrides(spec: str) -> Dict[str, int]:
+    """Parse "key=limit;key=limit" into a dict; keys are backend URLs or model names."""
+    overrides = {}
+    for entry in spec.split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key, sep, limit = entry.rpartition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid concurrency limit '{entry}', expected key=limit")
+        overrides[key.strip().rstrip("/")] = int(limit)
+    return overrides
+
+
+class ConcurrencyLimits:
+    """One ConcurrencyLimiter per backend replica or per model, created on first use."""
+
+    def __init__(
+        self,
+        limit: int,
+        max_queue: int = 100,
+        max_wait: float = 30.0,
+        scope: str = "backend",
+        overrides: Optional[Dict[str, int]] = None
+    ):
+        if scope not in LIMIT_SCOPES:
+            raise ValueError(f"Unknown concurrency limit scope '{scope}', expected one of {', '.join(LIMIT_SCOPES)}")
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.scope = scope
+        self.overrides = overrides or {}
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    @classmethod
+    def from_config(cls) -> Optional["ConcurrencyLimits"]:
+        """Limits from the environment, or None when no limit is configured."""
+        overrides = parse_limit_overrides(Config.CONCURRENCY_LIMIT_OVERRIDES)
+        if Config.CONCURRENCY_LIMIT <= 0 and not overrides:
+            return None
+        return cls(
+            Config.CONCURRENCY_LIMIT,
+            max_queue=Config.ADMISSION_QUEUE_SIZE,
+            max_wait=Config.ADMISSION_MAX_WAIT,
+            scope=Config.CONCURRENCY_LIMIT_SCOPE,
+            overrides=overrides
+        )
+
+    def get(self, backend_url: str, model: Optional[str]) -> Optional[ConcurrencyLimiter]:
+        """The limiter for a request, or None if its backend or model is not limited."""
+        key = backend_url if self.scope == "backend" else model
+        if key is None:
+            return None
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limit = self.overrides.get(key, self.limit)
+            if limit <= 0:
+                return None
+            if len(self._limiters) >= MAX_LIMITERS:
+                self._prune()
+            limiter = self._limiters[key] = ConcurrencyLimiter(limit, self.max_queue, self.max_wait)
+        return limiter
+
+    def _prune(self) -> None:
+        for key in [key for key, limiter in self._limiters.items() if limiter.idle]:
+            del self._limiters[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current admission state for the /proxy/stats endpoint."""
+        return {
+            "scope": self.scope,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "limiters": {key: limiter.get_stats() for key, limiter in self._limiters.items()}
+        }
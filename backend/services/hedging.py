@@ -0,0 +1,219 @@
+"""
+Hedged requests.
+
+A replica that is stuck (swapping a model in, wedged on a long prompt, or
+half dead) holds every request routed to it until it recovers, which
+dominates tail time to first token. With hedging enabled, a request that
+has not produced its first byte within the model's historical p95 first
+byte time is sent again to a secondary backend; whichever answers first is
+used and the other is cancelled.
+
+The delays are learned from completion_requests: every minute the first
+byte times (time to first token for streams, response time otherwise,
+minus any admission queue wait) of the last hour's successful requests are
+summarised per model in latency sketches. Models without enough history
+are not hedged unless a default delay is configured. Hedges are paid for
+from a RequestBudget so they add at most a fixed fraction of extra load.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple, TypeVar
+
+from backend.database.dao import completion_requests_dao
+from backend.services.backend_pool import Backend
+from backend.services.request_budget import RequestBudget
+from backend.utils.config import Config
+from backend.utils.latency_sketch import LatencySketch
+from backend.utils.timestamps import now_ms
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Seconds between reloads of the learned delays
+REFRESH_INTERVAL = 60.0
+
+
+class HedgeDelays:
+    """Per-model first byte time percentiles learned from recorded requests."""
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        window_seconds: float = 3600.0,
+        min_samples: int = 20,
+        default_delay_ms: float = 0.0
+    ):
+        self.quantile = quantile
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.default_delay_ms = default_delay_ms
+        # (model, is_streaming) -> delay in ms
+        self.delays: Dict[Tuple[str, bool], float] = {}
+        self.loaded_at: Optional[datetime] = None
+
+    def delay_ms(self, model: Optional[str], is_streaming: bool) -> Optional[float]:
+        """How long to wait for a first byte before hedging, or None to not hedge."""
+        delay = self.delays.get((model, bool(is_streaming)))
+        if delay is None and self.default_delay_ms > 0:
+            return self.default_delay_ms
+        return delay
+
+    def load(self) -> None:
+        """Recompute the delays from the database (blocking; run off the event loop)."""
+        since_ms = now_ms() - int(self.window_seconds * 1000)
+        sketches: Dict[Tuple[str, bool], LatencySketch] = {}
+        for model, is_streaming, first_byte_ms in completion_requests_dao.get_first_byte_times(since_ms):
+            key = (model, bool(is_streaming))
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = LatencySketch()
+            sketch.add(first_byte_ms)
+
+        self.delays = {
+            key: sketch.quantile(self.quantile)
+            for key, sketch in sketches.items()
+            if sketch.count >= self.min_samples
+        }
+        self.loaded_at = datetime.now()
+        logger.debug("Loaded hedge delays for %d models", len(self.delays))
+
+
+class Hedging:
+    """Decides when to hedge, where to, and keeps the outcome counters."""
+
+    def __init__(self, delays: HedgeDelays, budget: RequestBudget, backend_url: Optional[str] = None):
+        self.delays = delays
+        self.budget = budget
+        # Without a configured secondary another replica of the request's pool is used
+        self.backend = Backend(backend_url) if backend_url else None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.hedged_total = 0
+        self.wins = 0
+        self.losses = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["Hedging"]:
+        """Build the hedging policy from the application configuration, or None if it is disabled."""
+        if not Config.HEDGE_ENABLED:
+            return None
+        delays = HedgeDelays(
+            quantile=Config.HEDGE_QUANTILE,
+            window_seconds=Config.HEDGE_WINDOW,
+            min_samples=Config.HEDGE_MIN_SAMPLES,
+            default_delay_ms=Config.HEDGE_DEFAULT_DELAY_MS
+        )
+        return cls(delays, RequestBudget(Config.HEDGE_BUDGET), Config.HEDGE_BACKEND_URL or None)
+
+    def delay(self, model: Optional[str], is_streaming: bool) -> Optional[float]:
+        """Seconds to wait before hedging a request, or None if it is not hedged."""
+        # Every hedgeable request earns its share of the budget
+        self.budget.deposit()
+        delay_ms = self.delays.delay_ms(model, is_streaming)
+        return delay_ms / 1000 if delay_ms is not None else None
+
+    def record(self, outcome: Optional[str]) -> None:
+        if outcome == "won":
+            self.wins += 1
+        elif outcome == "lost":
+            self.losses += 1
+
+    def start(self) -> None:
+        """Reload the delays every minute in the background (called on app startup)."""
+        if self._refresh_task is not None:
+            return
+
+        async def run():
+            while True:
+                try:
+                    await asyncio.to_thread(self.delays.load)
+                except Exception as e:
+                    logger.error(f"Failed to load hedge delays: {e}")
+                await asyncio.sleep(REFRESH_INTERVAL)
+
+        self._refresh_task = asyncio.get_running_loop().create_task(run())
+
+    async def stop(self) -> None:
+        """Stop reloading the delays (called on app shutdown)."""
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.url if self.backend is not None else None,
+            "quantile": self.delays.quantile,
+            "hedged_total": self.hedged_total,
+            "wins": self.wins,
+            "losses": self.losses,
+            "budget": self.budget.get_stats(),
+            "delays_ms": {
+                f"{model} ({'stream' if is_streaming else 'non-stream'})": round(delay, 1)
+                for (model, is_streaming), delay in self.delays.delays.items()
+            },
+            "delays_loaded_at": self.delays.loaded_at.isoformat() if self.delays.loaded_at else None
+        }
+
+
+async def race(
+    primary: Awaitable[T],
+    delay: float,
+    start_hedge: Callable[[], Optional[Awaitable[T]]],
+    accept: Callable[[T], bool],
+    discard: Callable[[T], Awaitable[None]]
+) -> Tuple[T, Optional[str]]:
+    """Await primary, starting the hedge if it has not finished within delay seconds.
+
+    Returns the result used and the hedge outcome: None when no hedge was
+    sent, "won" when the hedge's result was used and "lost" otherwise. A
+    result that accept rejects (or an exception) only wins if the other
+    attempt fails too, in which case the primary's outcome is used. The
+    other attempt is cancelled, or its result passed to discard.
+    """
+    first = asyncio.ensure_future(primary)
+    try:
+        await asyncio.wait({first}, timeout=delay)
+    except BaseException:
+        first.cancel()
+        raise
+    if first.done():
+        return first.result(), None
+
+    hedge = start_hedge()
+    if hedge is None:
+        try:
+            return await first, None
+        except BaseException:
+            first.cancel()
+            raise
+    second = asyncio.ensure_future(hedge)
+
+    attempts = (first, second)
+    winner = None
+    try:
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in attempts:
+                if task in done and task.exception() is None and accept(task.result()):
+                    winner = task
+                    break
+        winner = winner or first
+        return winner.result(), "won" if winner is second else "lost"
+    finally:
+        for task in attempts:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+            if not task.cancelled() and task.exception() is None:
+                await discard(task.result())
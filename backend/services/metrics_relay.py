@@ -0,0 +1,168 @@
+"""
+Relay of metrics records from proxy workers to a single writer process.
+
+SQLite allows one writer at a time, so when the proxy runs as several
+worker processes they do not write the database themselves. Each worker's
+MetricsWriter uses a MetricsRelayClient as its sink, which sends every
+batch over a local Unix socket to the writer process. There a
+MetricsRelayServer feeds the records to the one MetricsWriter that owns
+the database connection and commits them in batches; the records stay
+lists of values in INSERT_FIELDS order all the way to executemany.
+
+Frames are a 4-byte big-endian length followed by a JSON payload. A
+connection opens with {"fields": [...]}, after which each frame is a list
+of rows holding the values of those fields in order, so field names are
+not repeated for every record.
+"""
+
+import os
+import json
+import socket
+import struct
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Set
+
+from backend.database.dao import CompletionRequestsDAO
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(payload: Any) -> bytes:
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Any:
+    """Read one frame; None when the peer closed the connection between frames."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+    return json.loads(await reader.readexactly(length))
+
+
+class MetricsRelayClient:
+    """MetricsWriter sink sending batches to the writer process."""
+
+    def __init__(self, socket_path: str, fields: Optional[List[str]] = None, timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.fields = fields or CompletionRequestsDAO.INSERT_FIELDS
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        # Batches are normally sent from the writer's worker thread, but write-through ones from the event loop
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall(encode_frame({"fields": self.fields}))
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def send_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """Send a batch of records, reconnecting once if the connection was lost."""
+        frame = encode_frame([[row.get(field) for field in self.fields] for row in rows])
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(frame)
+                    return len(rows)
+                except OSError as e:
+                    self._close()
+                    if attempt:
+                        raise
+                    logger.warning(f"Metrics writer connection lost, reconnecting: {e}")
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+class MetricsRelayServer:
+    """Accepts batches from worker processes and queues them on the local writer."""
+
+    def __init__(self, socket_path: str, writer):
+        self.socket_path = socket_path
+        self.writer = writer
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+        # Counters
+        self.received_total = 0
+
+    async def start(self) -> None:
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        socket_dir = os.path.dirname(self.socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        logger.info(f"Metrics writer listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for connection in list(self._connections):
+                connection.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, connection: asyncio.StreamWriter) -> None:
+        self._connections.add(connection)
+        try:
+            hello = await read_frame(reader)
+            if not isinstance(hello, dict) or "fields" not in hello:
+                raise ValueError("Expected a fields frame first")
+            fields = hello["fields"]
+            # Workers running other code may send other fields; put them in INSERT_FIELDS order
+            positions = None
+            if fields != CompletionRequestsDAO.INSERT_FIELDS:
+                positions = [fields.index(field) if field in fields else None for field in CompletionRequestsDAO.INSERT_FIELDS]
+            while True:
+                rows = await read_frame(reader)
+                if rows is None:
+                    break
+                # Stop reading while the writer catches up; workers then block on the socket
+                while self.writer.queue_depth and self.writer.queue_depth + len(rows) > self.writer.max_queue_size:
+                    await asyncio.sleep(self.writer.flush_interval / 10)
+                for row in rows:
+                    if positions is not None:
+                        row = [row[position] if position is not None else None for position in positions]
+                    self.writer.submit(row)
+                self.received_total += len(rows)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.warning(f"Metrics relay connection dropped: {e}")
+        finally:
+            self._connections.discard(connection)
+            connection.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "socket_path": self.socket_path,
+            "connections": len(self._connections),
+            "received_total": self.received_total
+        }
@@ -6,6 +6,8 @@ import logging
 from typing import Optional
 from backend.database.dao import completion_requests_dao
 from backend.database.models import CompletionRequest
+from backend.services.metrics_writer import metrics_writer
+from backend.utils.timestamps import now_ms
 
 logger = logging.getLogger(__name__)
 
@@ -28,16 +30,31 @@ def record_request(
     time_to_first_token_ms: Optional[int] = None,
     time_to_last_token_ms: Optional[int] = None,
     tokens_per_second: Optional[float] = None,
+    itl_mean_ms: Optional[float] = None,
+    itl_p50_ms: Optional[float] = None,
+    itl_p95_ms: Optional[float] = None,
+    itl_p99_ms: Optional[float] = None,
+    itl_max_ms: Optional[float] = None,
+    backend: Optional[str] = None,
+    cache_hit: bool = False,
+    cache_saved_ms: Optional[int] = None,
+    coalesced: bool = False,
+    queue_time_ms: Optional[int] = None,
+    hedge_outcome: Optional[str] = None,
+    retry_count: Optional[int] = None,
+    started_at_ms: Optional[int] = None,
     error_type: Optional[str] = None,
     error_message: Optional[str] = None
 ) -> None:
     """Record a completion request with enhanced metrics in the database."""
     try:
         # Use the DAO to insert the completion request
-        from datetime import datetime
+        timestamp_ms = now_ms()
         
         request_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp_ms': timestamp_ms,
+            # Callers that do not know when the request arrived get it from the response time
+            'started_at_ms': started_at_ms if started_at_ms is not None else timestamp_ms - (response_time_ms or 0),
             'success': success,
             'status_code': status_code,
             'response_time_ms': response_time_ms,
@@ -55,13 +72,30 @@ def record_request(
             'time_to_first_token_ms': time_to_first_token_ms,
             'time_to_last_token_ms': time_to_last_token_ms,
             'tokens_per_second': tokens_per_second,
+            'itl_mean_ms': itl_mean_ms,
+            'itl_p50_ms': itl_p50_ms,
+            'itl_p95_ms': itl_p95_ms,
+            'itl_p99_ms': itl_p99_ms,
+            'itl_max_ms': itl_max_ms,
+            'backend': backend,
+            'cache_hit': cache_hit,
+            'cache_saved_ms': cache_saved_ms,
+            'coalesced': coalesced,
+            'queue_time_ms': queue_time_ms,
+            'hedge_outcome': hedge_outcome,
+            'retry_count': retry_count,
             'app_version': '2.0.0',  # Current app version using response_time based calculation
             'error_type': error_type,
             'error_message': error_message
         }
         
-        completion_requests_dao.insert_completion_request(request_data)
-        logger.info(f"Request recorded successfully - Success: {success}, Status: {status_code}, Time: {response_time_ms}ms")
+        if metrics_writer.is_running:
+            # Hand off to the background writer so the event loop never waits on a commit
+            if not metrics_writer.submit(request_data):
+                logger.warning(f"Metrics queue full, request record dropped - Status: {status_code}")
+        else:
+            completion_requests_dao.insert_completion_request(request_data)
+            logger.debug("Request recorded - Success: %s, Status: %s, Time: %sms", success, status_code, response_time_ms)
     except Exception as e:
         logger.error(f"Failed to record request to database: {e}")
 
@@ -86,6 +120,19 @@ def record_request_from_model(request: CompletionRequest) -> None:
         time_to_first_token_ms=request.time_to_first_token_ms,
         time_to_last_token_ms=request.time_to_last_token_ms,
         tokens_per_second=request.tokens_per_second,
+        itl_mean_ms=request.itl_mean_ms,
+        itl_p50_ms=request.itl_p50_ms,
+        itl_p95_ms=request.itl_p95_ms,
+        itl_p99_ms=request.itl_p99_ms,
+        itl_max_ms=request.itl_max_ms,
+        backend=request.backend,
+        cache_hit=request.cache_hit,
+        cache_saved_ms=request.cache_saved_ms,
+        coalesced=request.coalesced,
+        queue_time_ms=request.queue_time_ms,
+        hedge_outcome=request.hedge_outcome,
+        retry_count=request.retry_count,
+        started_at_ms=request.started_at_ms,
         error_type=request.error_type,
         error_message=request.error_message
     )
@@ -0,0 +1,194 @@
+"""
+Write-behind recorder for completion request metrics.
+
+Request handlers hand finished records to an in-memory queue and return
+immediately. A background task drains the queue and writes the rows in
+batched transactions on a worker thread, so the event loop never waits on
+SQLite commits. In multi-worker deployments the batches are sent to a
+separate writer process instead (see metrics_relay).
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Callable, Optional
+
+from backend.database.dao import completion_requests_dao
+from backend.services.metrics_relay import MetricsRelayClient
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# What to do with a new record when the queue is full
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "write_through")
+
+
+class MetricsWriter:
+    """Bounded queue of metrics records drained by a background batch writer."""
+
+    def __init__(
+        self,
+        sink: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        max_queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        overflow_policy: str = "drop_newest"
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}")
+
+        self.sink = sink or completion_requests_dao.insert_completion_requests
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+
+        self._queue: deque = deque()
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._stopping = False
+
+        # Counters
+        self.enqueued_total = 0
+        self.written_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.batches_total = 0
+        self.last_batch_size = 0
+        self.last_flush_ms: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, sink: Optional[Callable[[List[Dict[str, Any]]], Any]] = None) -> "MetricsWriter":
+        """Build a writer from the application configuration."""
+        if sink is None and Config.METRICS_WRITER_MODE == "socket":
+            # Another process owns the database; hand it the batches
+            sink = MetricsRelayClient(Config.METRICS_WRITER_SOCKET).send_batch
+        return cls(
+            sink=sink,
+            max_queue_size=Config.METRICS_QUEUE_SIZE,
+            batch_size=Config.METRICS_BATCH_SIZE,
+            flush_interval=Config.METRICS_FLUSH_INTERVAL,
+            overflow_policy=Config.METRICS_OVERFLOW_POLICY
+        )
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the background writer is accepting records."""
+        return self._task is not None and not self._stopping
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        """Start the background writer on the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Metrics writer started (queue={self.max_queue_size}, batch={self.batch_size}, "
+                    f"interval={self.flush_interval}s, overflow={self.overflow_policy})")
+
+    async def stop(self) -> None:
+        """Stop accepting records and flush everything still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._batch_ready.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+        logger.info(f"Metrics writer stopped - written: {self.written_total}, dropped: {self.dropped_total}, "
+                    f"failed: {self.failed_total}")
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a record for writing. Returns False if the record was dropped."""
+        if not self.is_running:
+            # No background writer (e.g. scripts and tests): write inline
+            self._write_batch([record])
+            return True
+
+        if len(self._queue) >= self.max_queue_size:
+            if self.overflow_policy == "drop_newest":
+                self.dropped_total += 1
+                return False
+            if self.overflow_policy == "drop_oldest":
+                self._queue.popleft()
+                self.dropped_total += 1
+            else:
+                # write_through: keep the record at the cost of blocking this caller
+                self._write_batch([record])
+                return True
+
+        self._queue.append(record)
+        self.enqueued_total += 1
+        if len(self._queue) >= self.batch_size:
+            self._notify()
+        return True
+
+    def _notify(self) -> None:
+        """Wake the writer task, from the event loop thread or any other thread."""
+        if threading.get_ident() == self._loop_thread:
+            self._batch_ready.set()
+        else:
+            self._loop.call_soon_threadsafe(self._batch_ready.set)
+
+    async def _run(self) -> None:
+        """Drain the queue in batches until stopped and empty."""
+        while True:
+            if len(self._queue) < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+
+            if self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                await asyncio.to_thread(self._write_batch, batch)
+            elif self._stopping:
+                return
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Write one batch through the sink, counting the outcome."""
+        started = time.perf_counter()
+        try:
+            self.sink(batch)
+            self.written_total += len(batch)
+            self.batches_total += 1
+            self.last_batch_size = len(batch)
+        except Exception as e:
+            self.failed_total += len(batch)
+            logger.error(f"Failed to write {len(batch)} metrics records: {e}")
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue and writer counters."""
+        return {
+            "running": self.is_running,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow_policy": self.overflow_policy,
+            "enqueued_total": self.enqueued_total,
+            "written_total": self.written_total,
+            "dropped_total": self.dropped_total,
+            "failed_total": self.failed_total,
+            "batches_total": self.batches_total,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms
+        }
+
+
+# Global writer instance
+metrics_writer = MetricsWriter.from_config()
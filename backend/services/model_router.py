@@ -0,0 +1,147 @@
+"""
+Model-aware routing for the LLM Metrics Proxy.
+
+Maps the `model` field of a request to the backend pool serving it. Routes
+are exact model names or glob patterns (`llama3*`, `qwen2.5-coder:*`);
+exact names win, then patterns in the order they were configured, then the
+default pool. Patterns are compiled into a single regular expression and
+results are memoised per model name, so routing is a dict lookup on the
+request path.
+"""
+
+import re
+import fnmatch
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.services.backend_pool import Backend, BackendPool
+from backend.services.circuit_breaker import CircuitBreaker
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bound on memoised model names, so arbitrary client-supplied names cannot grow it forever
+MAX_CACHED_MODELS = 4096
+
+
+def parse_model_routes(spec: str) -> List[Tuple[str, List[str]]]:
+    """Parse MODEL_ROUTES: `pattern=url[,url...]` entries separated by semicolons."""
+    routes = []
+    for entry in spec.split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        pattern, separator, urls = entry.partition("=")
+        url_list = [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+        if not separator or not pattern.strip() or not url_list:
+            raise ValueError(f"Invalid model route '{entry}', expected 'pattern=url[,url...]'")
+        routes.append((pattern.strip(), url_list))
+    return routes
+
+
+def is_glob(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+class ModelRouter:
+    """Resolves a model name to the backend pool that serves it."""
+
+    def __init__(self, routes: List[Tuple[str, BackendPool]], default: BackendPool):
+        self.routes = routes
+        self.default = default
+        self._exact: Dict[str, BackendPool] = {}
+        self._pattern_pools: List[BackendPool] = []
+        alternatives = []
+        for pattern, pool in routes:
+            if not is_glob(pattern):
+                self._exact.setdefault(pattern, pool)
+                continue
+            alternatives.append(f"(?P<r{len(self._pattern_pools)}>{fnmatch.translate(pattern)})")
+            self._pattern_pools.append(pool)
+        self._patterns = re.compile("|".join(alternatives)) if alternatives else None
+        self._cache: Dict[Optional[str], BackendPool] = {}
+        self._health_pool: Optional[BackendPool] = None
+
+    @classmethod
+    def from_config(cls) -> "ModelRouter":
+        """Build the routing table from MODEL_ROUTES, with BACKEND_URLS as the default pool."""
+        # One Backend per URL, shared by every pool it appears in
+        backends: Dict[str, Backend] = {}
+
+        def pool_for(urls: List[str]) -> BackendPool:
+            return BackendPool.from_config([backends.setdefault(url, Backend(url, CircuitBreaker.from_config())) for url in urls])
+
+        default = pool_for(Config.get_backend_urls())
+        routes = [(pattern, pool_for(urls)) for pattern, urls in parse_model_routes(Config.MODEL_ROUTES)]
+        return cls(routes, default)
+
+    def route(self, model: Optional[str]) -> BackendPool:
+        """Get the pool serving a model."""
+        pool = self._cache.get(model)
+        if pool is not None:
+            return pool
+
+        pool = self._resolve(model)
+        if len(self._cache) >= MAX_CACHED_MODELS:
+            self._cache.clear()
+        self._cache[model] = pool
+        return pool
+
+    def _resolve(self, model: Optional[str]) -> BackendPool:
+        if model is None:
+            return self.default
+        pool = self._exact.get(model)
+        if pool is not None:
+            return pool
+        if self._patterns is not None:
+            match = self._patterns.match(model)
+            if match:
+                return self._pattern_pools[int(match.lastgroup[1:])]
+        return self.default
+
+    @property
+    def pools(self) -> List[BackendPool]:
+        """Every distinct pool, the default first."""
+        pools = [self.default]
+        for _, pool in self.routes:
+            if all(pool is not existing for existing in pools):
+                pools.append(pool)
+        return pools
+
+    @property
+    def backends(self) -> List[Backend]:
+        """Every distinct replica across all pools."""
+        backends: Dict[str, Backend] = {}
+        for pool in self.pools:
+            for backend in pool.backends:
+                backends.setdefault(backend.url, backend)
+        return list(backends.values())
+
+    @property
+    def urls(self) -> List[str]:
+        return [backend.url for backend in self.backends]
+
+    def start_health_checks(self, upstream, interval: float, path: str = "/v1/models", timeout: float = 5.0) -> None:
+        """Probe every replica once per interval, however many pools it belongs to."""
+        if self._health_pool is not None:
+            return
+        self._health_pool = BackendPool(self.backends, strategy=self.default.strategy)
+        self._health_pool.start_health_checks(upstream, interval, path, timeout)
+
+    async def stop_health_checks(self) -> None:
+        if self._health_pool is not None:
+            await self._health_pool.stop_health_checks()
+            self._health_pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Routing table and per-replica state for the /proxy/stats endpoint."""
+        return {
+            "strategy": self.default.strategy,
+            "backends": {backend.url: backend.get_stats() for backend in self.backends},
+            "routes": {pattern: pool.urls for pattern, pool in self.routes},
+            "default": self.default.urls
+        }
+
+    def get_circuit_breakers(self) -> Dict[str, Any]:
+        """Circuit breaker state and recent transitions per replica for the /proxy/circuit-breakers endpoint."""
+        return {backend.url: backend.breaker.get_stats() for backend in self.backends if backend.breaker is not None}
@@ -0,0 +1,145 @@
+"""
+Cached /v1/models list with stale-while-revalidate.
+
+The models list is fetched from the backends at most once per TTL. After
+the TTL the cached list is still served, for up to max_stale seconds,
+while a single background request refreshes it, so clients never wait on
+a slow backend once the list has been loaded. The cached model ids are
+also used to reject chat requests for unknown models without contacting
+a backend.
+"""
+
+import time
+import json
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, FrozenSet, Callable, Awaitable
+
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelsList:
+    """A successful /v1/models response and the model ids it lists."""
+    content: bytes
+    content_type: str
+    model_ids: FrozenSet[str]
+    fetched_at: float
+
+
+class ModelsCache:
+    """Caches the models list and refreshes it in the background once stale."""
+
+    def __init__(self, ttl: float = 30.0, max_stale: float = 300.0, recheck_interval: float = 5.0):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        # Minimum age before an unknown model triggers an immediate refresh
+        self.recheck_interval = recheck_interval
+        self.entry: Optional[ModelsList] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _age(self) -> float:
+        return time.monotonic() - self.entry.fetched_at
+
+    async def get(self, fetch: Callable[[], Awaitable[Response]]) -> Response:
+        """The models list, from the cache when possible."""
+        if self.entry is not None:
+            age = self._age()
+            if age < self.ttl:
+                self.hits += 1
+                return self._response(self.entry)
+            if age < self.ttl + self.max_stale:
+                self.stale_hits += 1
+                self._start_refresh(fetch)
+                return self._response(self.entry)
+
+        try:
+            return await self._refresh(fetch)
+        except Exception:
+            if self.entry is None:
+                raise
+            # Too stale to serve without trying, but better than failing
+            logger.warning("Models refresh failed, serving the last list fetched")
+            return self._response(self.entry)
+
+    async def model_ids(self, fetch: Callable[[], Awaitable[Response]]) -> Optional[FrozenSet[str]]:
+        """The known model ids, or None if the list cannot be loaded."""
+        try:
+            await self.get(fetch)
+        except Exception as e:
+            logger.warning(f"Models list unavailable: {e}")
+        return self.entry.model_ids if self.entry is not None else None
+
+    async def is_known(self, model: str, fetch: Callable[[], Awaitable[Response]]) -> bool:
+        """Whether a model is listed, refreshing once first if the list is not brand new."""
+        model_ids = await self.model_ids(fetch)
+        if model_ids is None or model in model_ids:
+            # Fail open when the list is unavailable
+            return True
+        if self._age() >= self.recheck_interval:
+            # The model may have been added since the list was fetched
+            try:
+                await self._refresh(fetch)
+            except Exception as e:
+                logger.warning(f"Models refresh failed: {e}")
+        return model in self.entry.model_ids
+
+    def _start_refresh(self, fetch: Callable[[], Awaitable[Response]]) -> None:
+        if self._refresh_task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(fetch))
+            task.add_done_callback(self._background_refresh_done)
+            self._refresh_task = task
+
+    def _background_refresh_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background models refresh failed: {task.exception()}")
+
+    async def _refresh(self, fetch: Callable[[], Awaitable[Response]]) -> Response:
+        """Refresh now, joining a refresh already in progress."""
+        self._start_refresh(fetch)
+        return await asyncio.shield(self._refresh_task)
+
+    async def _fetch(self, fetch: Callable[[], Awaitable[Response]]) -> Response:
+        try:
+            self.refreshes += 1
+            response = await fetch()
+            if response.status_code == 200:
+                data = json.loads(response.body)
+                self.entry = ModelsList(
+                    content=response.body,
+                    content_type=response.headers.get("content-type", "application/json"),
+                    model_ids=frozenset(model.get("id") for model in data.get("data", [])),
+                    fetched_at=time.monotonic()
+                )
+            return response
+        except Exception:
+            self.refresh_errors += 1
+            raise
+        finally:
+            self._refresh_task = None
+
+    @staticmethod
+    def _response(entry: ModelsList) -> Response:
+        return Response(content=entry.content, status_code=200, media_type=entry.content_type)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current cache state for the /proxy/stats endpoint."""
+        return {
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+            "models": len(self.entry.model_ids) if self.entry is not None else None,
+            "age_seconds": round(self._age(), 1) if self.entry is not None else None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors
+        }
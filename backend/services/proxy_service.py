@@ -2,15 +2,34 @@
 Proxy service for handling OpenAI API requests and responses.
 """
 
+import math
 import time
 import json
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from contextlib import AsyncExitStack
+from typing import Dict, Any, List, Optional, Union, AsyncIterator
 import httpx
 from fastapi import Request, Response, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 from backend.database.models import CompletionRequest
 from backend.services.metrics_service import record_request_from_model
+from backend.services.upstream_client import UpstreamClientPool, upstream_clients
+from backend.services.backend_pool import Backend, BackendPool
+from backend.services.model_router import ModelRouter
+from backend.services.response_cache import ResponseCache, CachedResponse, is_cacheable, cache_key
+from backend.services.request_coalescer import RequestCoalescer, StreamFlight
+from backend.services.models_cache import ModelsCache
+from backend.services.concurrency_limiter import ConcurrencyLimits, ConcurrencyLimiter, AdmissionRejected
+from backend.services.circuit_breaker import CircuitOpen
+from backend.services.rate_limiter import RateLimiter
+from backend.services.hedging import Hedging, race
+from backend.services.retry_policy import RetryPolicy
+from backend.services.stream_metrics import StreamMetrics
+from backend.services.request_parsing import extract_request_fields
+from backend.services.request_body import StreamedRequestBody, RequestBodyTooLarge
+from backend.utils.config import Config
+from backend.utils.logging_config import log_event
 
 logger = logging.getLogger(__name__)
 
@@ -30,13 +49,129 @@ def safe_metrics_recording(func):
     return wrapper
 
 
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes its body iterator as soon as the response ends.
+    
+    When the client disconnects Starlette stops iterating but leaves the generator
+    suspended until it is garbage collected; closing it at once lets the generator
+    close its upstream stream and record the cancellation.
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+class UpstreamAttempt:
+    """One backend's copy of a request, holding its in-flight count and concurrency slot until closed."""
+    
+    def __init__(self, pool: BackendPool, backend: Backend, limiter: Optional[ConcurrencyLimiter]):
+        self.pool = pool
+        self.backend = backend
+        self.limiter = limiter
+        self.response: Optional[httpx.Response] = None
+        self.first_chunk: Optional[bytes] = None
+        self._chunks: Optional[AsyncIterator[bytes]] = None
+        self._stack = AsyncExitStack()
+        self._closed = False
+    
+    async def open_stream(self, upstream: UpstreamClientPool, body, headers: Dict[str, str]) -> "UpstreamAttempt":
+        """Start a streamed request and wait for its first chunk (the first byte a client would see)."""
+        try:
+            self.response = await self._stack.enter_async_context(upstream.stream(
+                self.backend.url, "POST", "/v1/chat/completions", content=body, headers=headers
+            ))
+            if self.response.status_code == 200:
+                self._chunks = self.response.aiter_bytes()
+                try:
+                    self.first_chunk = await self._chunks.__anext__()
+                except StopAsyncIteration:
+                    pass
+        except BaseException:
+            await self.close()
+            raise
+        return self
+    
+    async def send(self, upstream: UpstreamClientPool, body, headers: Dict[str, str]) -> "UpstreamAttempt":
+        """Send a request and wait for the response headers; read() reads the body."""
+        try:
+            self.response = await self._stack.enter_async_context(upstream.stream(
+                self.backend.url, "POST", "/v1/chat/completions", content=body, headers=headers
+            ))
+        except BaseException:
+            await self.close()
+            raise
+        return self
+    
+    async def read(self) -> httpx.Response:
+        """Read the full response body, then close the attempt."""
+        try:
+            await self.response.aread()
+        finally:
+            await self.close()
+        return self.response
+    
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The streamed response body, starting with the chunk already read."""
+        if self.first_chunk is None:
+            return
+        yield self.first_chunk
+        async for chunk in self._chunks:
+            yield chunk
+    
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._stack.aclose()
+        finally:
+            self.pool.end(self.backend)
+            if self.limiter is not None:
+                self.limiter.release()
+
+
 class ProxyService:
     """Service for proxying OpenAI API requests to backend."""
     
-    def __init__(self, backend_base_url: str):
-        self.backend_base_url = backend_base_url
+    def __init__(
+        self,
+        backends: Union[str, List[str], BackendPool, ModelRouter],
+        upstream: Optional[UpstreamClientPool] = None,
+        cache: Optional[ResponseCache] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        models_cache: Optional[ModelsCache] = None,
+        limits: Optional[ConcurrencyLimits] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        hedging: Optional[Hedging] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        if isinstance(backends, ModelRouter):
+            self.router = backends
+        else:
+            if not isinstance(backends, BackendPool):
+                backends = BackendPool.from_config([backends] if isinstance(backends, str) else list(backends))
+            # A single pool serves every model
+            self.router = ModelRouter([], backends)
+        self.upstream = upstream or upstream_clients
+        self.cache = cache
+        self.coalescer = coalescer
+        self.models_cache = models_cache
+        self.limits = limits
+        self.rate_limiter = rate_limiter
+        self.hedging = hedging
+        self.retry_policy = retry_policy
+        self.circuit_breakers = any(backend.breaker is not None for backend in self.router.backends)
     
-    def extract_request_metrics(self, request: Request, body: bytes) -> Dict[str, Any]:
+    def extract_request_metrics(
+        self,
+        request: Request,
+        body: Optional[Union[bytes, StreamedRequestBody]]
+    ) -> Dict[str, Any]:
         """Extract metrics from the incoming request."""
         metrics = {
             "model": None,
@@ -52,18 +187,17 @@ class ProxyService:
         headers = dict(request.headers)
         metrics["origin"] = headers.get("origin")
         
+        if body is None:
+            return metrics
+        if isinstance(body, StreamedRequestBody):
+            # Only the head has been read; the remaining fields are filled in once the upload finishes
+            metrics.update(body.fields or {})
+            body.on_complete = metrics.update
+            return metrics
+        
         try:
-            body_dict = json.loads(body)
-            metrics["model"] = body_dict.get("model")
-            metrics["is_streaming"] = body_dict.get("stream", False)
-            metrics["max_tokens"] = body_dict.get("max_tokens")
-            metrics["temperature"] = body_dict.get("temperature")
-            metrics["top_p"] = body_dict.get("top_p")
-            
-            # Count messages in conversation
-            messages = body_dict.get("messages", [])
-            metrics["message_count"] = len(messages) if messages else None
-            
+            # Reads only the top-level fields; message contents are never decoded
+            metrics.update(extract_request_fields(body, Config.REQUEST_PARSE_MODE))
         except Exception as e:
             logger.error(f"Error parsing request body: {e}")
         
@@ -71,222 +205,706 @@ class ProxyService:
     
     async def handle_streaming_response(
         self,
-        body: bytes,
+        body: Union[bytes, StreamedRequestBody],
         headers: Dict[str, str],
         start_time: float,
         request_metrics: Dict[str, Any],
         request_id: str
     ) -> StreamingResponse:
         """Handle streaming responses with real-time token forwarding."""
+        key = self._request_key(body, headers, request_metrics)
+        cached = await self.cache.get(key) if key is not None and self.cache is not None else None
+        if cached is not None:
+            logger.debug("[%s] Replaying cached stream", request_id)
+            return ClosingStreamingResponse(
+                self._replay_cached_stream(cached, start_time, request_metrics),
+                media_type=cached.content_type,
+                headers={"x-cache": "HIT"}
+            )
         
-        async def stream_generator():
+        async def stream_generator(flight: Optional[StreamFlight] = None):
             first_token_received = False
             first_token_time = None
             last_token_time = None
             chunk_count = 0
+            # Decided once per stream so skipped chunk logs cost a single boolean check
+            sample_rate = Config.LOG_CHUNK_SAMPLE_RATE
+            log_chunks = sample_rate > 0 and logger.isEnabledFor(logging.DEBUG)
+            # Chunks kept for the response cache, dropped once the entry would be too large
+            captured = [] if key is not None and self.cache is not None else None
+            captured_bytes = 0
+            stream_metrics = None
+            recorded = False
             
+            # Selected when the stream starts so in-flight counts cover the whole stream
+            pool = self.router.route(request_metrics.get("model"))
+            backend = pool.select()
+            request_metrics["backend"] = backend.url
+            if flight is not None:
+                flight.backend = backend.url
+            pool.begin(backend)
             try:
-                logger.info(f"[{request_id}] Creating streaming client connection")
-                async with httpx.AsyncClient() as stream_client:
-                    logger.info(f"[{request_id}] Streaming request to backend")
-                    async with stream_client.stream(
-                        "POST", 
-                        f"{self.backend_base_url}/v1/chat/completions", 
-                        content=body, 
-                        headers=headers, 
-                        timeout=300.0
-                    ) as response:
-                        
-                        logger.info(f"[{request_id}] Backend response status: {response.status_code}")
-                        
-                        if response.status_code != 200:
-                            # Handle error response
-                            error_content = await response.aread()
-                            logger.error(f"[{request_id}] Backend returned error status: {response.status_code}")
-                            
-                            # Record failed request
-                            self._record_failed_request(
-                                start_time, request_metrics, response.status_code,
-                                "http_error", f"Backend returned {response.status_code}"
-                            )
-                            yield error_content
-                            return
-                        
-                        logger.info(f"[{request_id}] Starting to stream response chunks")
-                        
-                        # Variables to capture usage from stream
-                        final_usage = None
-                        finish_reason = "stream_complete"
-                        
-                        # Stream tokens as they arrive
-                        async for chunk in response.aiter_bytes():
-                            chunk_text = chunk.decode('utf-8', errors='ignore')
-                            
-                            # Check if this is the final usage chunk (before data: [DONE])
-                            if chunk_text.strip() == "data: [DONE]":
-                                logger.info(f"[{request_id}] Stream ended with [DONE] marker")
-                                continue
-                            
-                            # Try to parse chunk for usage information
-                            if chunk_text.startswith("data: "):
-                                try:
-                                    # Extract the JSON part after "data: "
-                                    json_str = chunk_text[6:]  # Remove "data: " prefix
-                                    if json_str.strip() and json_str.strip() != "[DONE]":
-                                        chunk_data = json.loads(json_str)
-                                        
-                                        # Debug logging to see what we're processing
-                                        logger.info(f"[{request_id}] Processing chunk: {json_str[:100]}...")
-                                        
-                                        # Check if this chunk contains usage info
-                                        if 'usage' in chunk_data and chunk_data['usage']:
-                                            usage = chunk_data['usage']
-                                            if usage.get('prompt_tokens') or usage.get('completion_tokens') or usage.get('total_tokens'):
-                                                final_usage = usage
-                                                logger.info(f"[{request_id}] Captured usage from stream: {usage}")
-                                            else:
-                                                logger.info(f"[{request_id}] Usage found but no token data: {usage}")
-                                        else:
-                                            logger.info(f"[{request_id}] No usage in chunk: {list(chunk_data.keys())}")
-                                        
-                                        # Check for finish reason
-                                        if 'choices' in chunk_data and chunk_data['choices']:
-                                            choice = chunk_data['choices'][0]
-                                            if 'finish_reason' in choice and choice['finish_reason']:
-                                                finish_reason = choice['finish_reason']
-                                                logger.info(f"[{request_id}] Captured finish reason: {finish_reason}")
-                                except (json.JSONDecodeError, KeyError) as e:
-                                    # Not a JSON chunk or missing expected fields, continue
-                                    logger.info(f"[{request_id}] JSON parse error for chunk: {chunk_text[:200]}... Error: {e}")
-                                    # Try to extract usage from malformed JSON if possible
-                                    if 'usage' in chunk_text and ('prompt_tokens' in chunk_text or 'completion_tokens' in chunk_text):
-                                        logger.info(f"[{request_id}] Attempting to extract usage from malformed JSON: {chunk_text}")
-                                        # Simple regex extraction as fallback
-                                        import re
-                                        prompt_match = re.search(r'"prompt_tokens":(\d+)', chunk_text)
-                                        completion_match = re.search(r'"completion_tokens":(\d+)', chunk_text)
-                                        total_match = re.search(r'"total_tokens":(\d+)', chunk_text)
-                                        
-                                        if prompt_match and completion_match and total_match:
-                                            fallback_usage = {
-                                                'prompt_tokens': int(prompt_match.group(1)),
-                                                'completion_tokens': int(completion_match.group(1)),
-                                                'total_tokens': int(total_match.group(1))
-                                            }
-                                            final_usage = fallback_usage
-                                            logger.info(f"[{request_id}] Extracted usage from malformed JSON: {fallback_usage}")
-                                    pass
-                            
-                            if not first_token_received:
-                                first_token_received = True
-                                first_token_time = time.time()
-                                logger.info(f"[{request_id}] First token received after {int((first_token_time - start_time) * 1000)}ms")
-                            
-                            chunk_count += 1
-                            last_token_time = time.time()
-                            yield chunk
-                        
-                        logger.info(f"[{request_id}] Streaming completed. Total chunks: {chunk_count}")
-                        
-                        # Record metrics after streaming completes
-                        if first_token_received and last_token_time:
-                            self._record_successful_request(
-                                start_time, request_metrics, first_token_time, last_token_time,
-                                final_usage, finish_reason
-                            )
-                        else:
-                            # Record failed streaming attempt
-                            self._record_failed_request(
-                                start_time, request_metrics, 500,
-                                "streaming_incomplete", "Streaming did not complete successfully"
-                            )
+                limiter = await self._admit(backend, request_metrics)
+            except BaseException:
+                pool.end(backend)
+                raise
+            attempt = None
+            try:
+                attempt = await self._send_upstream(
+                    UpstreamAttempt(pool, backend, limiter), body, headers, request_metrics, stream=True
+                )
+                # A hedge may have answered first
+                backend = attempt.backend
+                response = attempt.response
+                if flight is not None:
+                    flight.backend = backend.url
+                
+                logger.debug("[%s] Backend response status: %d", request_id, response.status_code)
+                
+                if response.status_code != 200:
+                    # Handle error response
+                    error_content = await response.aread()
+                    logger.error("[%s] Backend returned error status: %d", request_id, response.status_code)
+                    self._record_backend_status(pool, backend, response.status_code)
+                    
+                    # Record failed request
+                    self._record_failed_request(
+                        start_time, request_metrics, response.status_code,
+                        "http_error", f"Backend returned {response.status_code}"
+                    )
+                    recorded = True
+                    if flight is not None:
+                        flight.outcome = {"status_code": response.status_code, "error_type": "http_error",
+                                          "error_message": f"Backend returned {response.status_code}"}
+                    yield error_content
+                    return
+                
+                # Frames SSE events across chunks and captures usage / finish reason
+                stream_metrics = StreamMetrics(request_id)
+                
+                # Stream tokens as they arrive
+                async for chunk in attempt.chunks():
+                    stream_metrics.feed(chunk)
+                    
+                    # The closing [DONE] marker is forwarded but is not a token
+                    if chunk.strip() == b"data: [DONE]":
+                        if captured is not None:
+                            captured.append(chunk)
+                        yield chunk
+                        continue
+                    
+                    if not first_token_received:
+                        first_token_received = True
+                        first_token_time = time.time()
+                        logger.debug("[%s] First token received after %dms",
+                                     request_id, int((first_token_time - start_time) * 1000))
+                        pool.record_success(backend, (first_token_time - start_time) * 1000)
                     
+                    chunk_count += 1
+                    last_token_time = time.time()
+                    if log_chunks and chunk_count % sample_rate == 0:
+                        logger.debug("[%s] Chunk %d: %d bytes", request_id, chunk_count, len(chunk))
+                    if captured is not None:
+                        captured_bytes += len(chunk)
+                        if captured_bytes > self.cache.max_entry_bytes:
+                            captured = None
+                        else:
+                            captured.append(chunk)
+                    yield chunk
+                
+                stream_metrics.finish()
+                final_usage = stream_metrics.final_usage
+                finish_reason = stream_metrics.finish_reason
+                itl_stats = stream_metrics.itl_stats()
+                
+                logger.debug("[%s] Streaming completed. Total chunks: %d", request_id, chunk_count)
+                
+                # Record metrics after streaming completes
+                if first_token_received and last_token_time:
+                    self._record_successful_request(
+                        start_time, request_metrics, first_token_time, last_token_time,
+                        final_usage, finish_reason, itl_stats
+                    )
+                    if flight is not None:
+                        flight.outcome = {"usage": final_usage, "finish_reason": finish_reason, "itl_stats": itl_stats}
+                    # Only streams that really finished are worth replaying; the "stream_complete"
+                    # default also covers streams the backend cut off before any finish reason
+                    if captured is not None and (stream_metrics.done or finish_reason != "stream_complete"):
+                        self.cache.put(key, CachedResponse(
+                            content=b"".join(captured),
+                            status_code=200,
+                            content_type=response.headers.get("content-type", "text/event-stream"),
+                            is_streaming=True,
+                            response_time_ms=int((last_token_time - start_time) * 1000),
+                            prompt_tokens=final_usage.get("prompt_tokens") if final_usage else None,
+                            completion_tokens=final_usage.get("completion_tokens") if final_usage else None,
+                            total_tokens=final_usage.get("total_tokens") if final_usage else None,
+                            finish_reason=finish_reason
+                        ))
+                else:
+                    # Record failed streaming attempt
+                    self._record_failed_request(
+                        start_time, request_metrics, 500,
+                        "streaming_incomplete", "Streaming did not complete successfully"
+                    )
+                    if flight is not None:
+                        flight.outcome = {"status_code": 500, "error_type": "streaming_incomplete",
+                                          "error_message": "Streaming did not complete successfully"}
+            
+            except RequestBodyTooLarge:
+                # The upload went over the limit; recorded by the caller with the 413
+                raise
             except Exception as e:
                 # Record streaming error
-                logger.error(f"[{request_id}] Streaming error: {e}")
+                logger.error("[%s] Streaming error: %s", request_id, e)
+                if attempt is not None and not first_token_received:
+                    # Failures before the stream opened were counted by _send_upstream
+                    pool.record_failure(backend)
                 self._record_failed_request(
                     start_time, request_metrics, 500,
                     "streaming_error", str(e)
                 )
+                if flight is not None:
+                    flight.outcome = {"status_code": 500, "error_type": "streaming_error", "error_message": str(e)}
                 raise
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away (or, for a shared stream, every client did); leaving the
+                # upstream stream closes the backend connection, which aborts the generation
+                if not recorded:
+                    logger.info("[%s] Client disconnected, upstream stream closed", request_id)
+                    self._record_cancelled_request(
+                        start_time, request_metrics, first_token_time,
+                        stream_metrics.final_usage if stream_metrics else None,
+                        stream_metrics.content_count if stream_metrics else 0
+                    )
+                raise
+            finally:
+                # Closes the upstream stream and frees the backend's in-flight count and slot
+                if attempt is not None:
+                    await attempt.close()
+        
+        if key is not None and self.coalescer is not None and self.coalescer.streams:
+            # Identical streams share one upstream call, read in the background and fanned out
+            flight, coalesced = self.coalescer.stream(key, stream_generator)
+            if coalesced:
+                logger.debug("[%s] Joining an identical in-flight stream", request_id)
+                request_metrics["coalesced"] = True
+                stream = self._follow_stream(flight, start_time, request_metrics)
+            else:
+                stream = flight.subscribe()
+        else:
+            stream = stream_generator()
+        
+        if self.limits is not None or self.circuit_breakers or isinstance(body, StreamedRequestBody):
+            # Hold the response until the first chunk so requests turned away while queued or by an
+            # open circuit get a 429/503, and streamed uploads that go over the size limit a 413
+            try:
+                stream = await self._started(stream)
+            except AdmissionRejected as e:
+                return self._reject_admission(start_time, request_metrics, e)
+            except RequestBodyTooLarge as e:
+                return self.reject_oversized_body(start_time, request_metrics, e)
+            except Exception as e:
+                # The stream recorded the failure itself; answer like the endpoint's own error handler
+                # here so the request is not recorded a second time as a connection_error
+                return JSONResponse({"detail": f"Failed to connect to backend: {e}"}, status_code=500)
         
-        logger.info(f"[{request_id}] Returning streaming response")
-        return StreamingResponse(
-            stream_generator(),
+        return ClosingStreamingResponse(
+            stream,
             media_type="text/event-stream"
         )
     
     async def handle_non_streaming_response(
         self,
-        body: bytes,
+        body: Union[bytes, StreamedRequestBody],
         headers: Dict[str, str],
         start_time: float,
         request_metrics: Dict[str, Any],
         request_id: str
     ) -> Response:
         """Handle non-streaming responses."""
-        logger.info(f"[{request_id}] Sending non-streaming request to backend")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.backend_base_url}/v1/chat/completions",
-                content=body,
-                headers=headers,
-                timeout=300.0
+        key = self._request_key(body, headers, request_metrics)
+        cached = await self.cache.get(key) if key is not None and self.cache is not None else None
+        if cached is not None:
+            logger.debug("[%s] Serving cached response", request_id)
+            self._record_cache_hit(start_time, request_metrics, cached, time.time())
+            return Response(
+                content=cached.content,
+                status_code=cached.status_code,
+                media_type=cached.content_type,
+                headers={"x-cache": "HIT"}
             )
-            
-            # Calculate response time
-            response_time_ms = int((time.time() - start_time) * 1000)
-            logger.info(f"[{request_id}] Backend response received - Status: {response.status_code}, Time: {response_time_ms}ms")
-            
-            # Extract response metrics
-            prompt_tokens = None
-            completion_tokens = None
-            total_tokens = None
-            finish_reason = None
-            
-            if response.status_code == 200:
-                try:
-                    response_data = response.json()
-                    
-                    # Extract token usage
-                    usage = response_data.get("usage", {})
-                    prompt_tokens = usage.get("prompt_tokens")
-                    completion_tokens = usage.get("completion_tokens")
-                    total_tokens = usage.get("total_tokens")
-                    
-                    # Extract finish reason
-                    choices = response_data.get("choices", [])
-                    if choices:
-                        finish_reason = choices[0].get("finish_reason")
-                    
-                    logger.info(f"[{request_id}] Response parsed - Tokens: {total_tokens}, Finish reason: {finish_reason}")
-                    
-                    # Record successful request
-                    self._record_successful_non_streaming_request(
-                        start_time, request_metrics, response.status_code,
-                        prompt_tokens, completion_tokens, total_tokens, finish_reason
-                    )
-                    
-                except Exception as e:
-                    logger.error(f"[{request_id}] Error parsing response: {e}")
-                    self._record_failed_request(
-                        start_time, request_metrics, response.status_code,
-                        "response_parse_error", str(e)
-                    )
+        
+        async def send():
+            pool = self.router.route(request_metrics.get("model"))
+            backend = pool.select()
+            request_metrics["backend"] = backend.url
+            pool.begin(backend)
+            try:
+                limiter = await self._admit(backend, request_metrics)
+            except BaseException:
+                pool.end(backend)
+                raise
+            attempt = await self._send_upstream(
+                UpstreamAttempt(pool, backend, limiter), body, headers, request_metrics, stream=False
+            )
+            # The backend has started answering, so a failure reading the body is not retried:
+            # the generation may already have run
+            try:
+                response = await attempt.read()
+            except Exception:
+                attempt.pool.record_failure(attempt.backend)
+                raise
+            self._record_backend_status(attempt.pool, attempt.backend, response.status_code)
+            return attempt.backend.url, response
+        
+        try:
+            if key is not None and self.coalescer is not None:
+                # Identical requests already in flight share its response
+                (backend_url, response), coalesced = await self.coalescer.request(key, send)
+                request_metrics["backend"] = backend_url
+                request_metrics["coalesced"] = coalesced
             else:
-                # Record failed request
+                _, response = await send()
+        except AdmissionRejected as e:
+            return self._reject_admission(start_time, request_metrics, e)
+        except RequestBodyTooLarge as e:
+            return self.reject_oversized_body(start_time, request_metrics, e)
+        
+        # Calculate response time
+        response_time_ms = int((time.time() - start_time) * 1000)
+        logger.debug("[%s] Backend response received - Status: %d, Time: %dms",
+                     request_id, response.status_code, response_time_ms)
+        
+        # Extract response metrics
+        prompt_tokens = None
+        completion_tokens = None
+        total_tokens = None
+        finish_reason = None
+        
+        if response.status_code == 200:
+            try:
+                response_data = response.json()
+                
+                # Extract token usage
+                usage = response_data.get("usage", {})
+                prompt_tokens = usage.get("prompt_tokens")
+                completion_tokens = usage.get("completion_tokens")
+                total_tokens = usage.get("total_tokens")
+                
+                # Extract finish reason
+                choices = response_data.get("choices", [])
+                if choices:
+                    finish_reason = choices[0].get("finish_reason")
+                
+                # Record successful request
+                self._record_successful_non_streaming_request(
+                    start_time, request_metrics, response.status_code,
+                    prompt_tokens, completion_tokens, total_tokens, finish_reason
+                )
+                
+                if key is not None and self.cache is not None and not request_metrics.get("coalesced"):
+                    self.cache.put(key, CachedResponse(
+                        content=response.content,
+                        status_code=response.status_code,
+                        content_type=response.headers.get("content-type", "application/json"),
+                        is_streaming=False,
+                        response_time_ms=response_time_ms,
+                        prompt_tokens=prompt_tokens,
+                        completion_tokens=completion_tokens,
+                        total_tokens=total_tokens,
+                        finish_reason=finish_reason
+                    ))
+                
+            except Exception as e:
+                logger.error("[%s] Error parsing response: %s", request_id, e)
                 self._record_failed_request(
                     start_time, request_metrics, response.status_code,
-                    "http_error", f"Backend returned {response.status_code}"
+                    "response_parse_error", str(e)
                 )
+        else:
+            # Record failed request
+            self._record_failed_request(
+                start_time, request_metrics, response.status_code,
+                "http_error", f"Backend returned {response.status_code}"
+            )
+        
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers=dict(response.headers)
+        )
+    
+    def _request_key(
+        self,
+        body: Union[bytes, StreamedRequestBody],
+        headers: Dict[str, str],
+        request_metrics: Dict[str, Any]
+    ) -> Optional[str]:
+        """Key of a deterministic request for caching and coalescing, or None if neither applies."""
+        if (self.cache is None and self.coalescer is None) or not is_cacheable(request_metrics, headers):
+            return None
+        if isinstance(body, StreamedRequestBody):
+            # Keys hash the whole body, which a streamed upload never holds
+            return None
+        return cache_key(body)
+    
+    async def _send_upstream(
+        self,
+        attempt: UpstreamAttempt,
+        body: Union[bytes, StreamedRequestBody],
+        headers: Dict[str, str],
+        request_metrics: Dict[str, Any],
+        stream: bool
+    ) -> UpstreamAttempt:
+        """Send the request up to its first byte, retrying failures on another replica when allowed.
+        
+        Failed attempts count against their backend's health; the attempt returned
+        is the one that answered.
+        """
+        policy = self.retry_policy
+        if policy is not None:
+            policy.budget.deposit()
+        failed: List[Backend] = []
+        while True:
+            try:
+                return await self._send_hedged(attempt, body, headers, request_metrics, stream)
+            except RequestBodyTooLarge:
+                raise
+            except Exception as e:
+                attempt.pool.record_failure(attempt.backend)
+                failed.append(attempt.backend)
+                retries = len(failed) - 1
+                # A streamed upload can only be sent once
+                if policy is None or not isinstance(body, bytes) or not policy.should_retry(e, retries):
+                    raise
+                
+                retries += 1
+                delay = policy.backoff(retries)
+                logger.info("[%s] Upstream %s failed before the first byte (%s: %s), retry %d in %.0fms",
+                            request_metrics.get('request_id'), attempt.backend.url, type(e).__name__, e,
+                            retries, delay * 1000)
+                request_metrics["retry_count"] = retries
+                await asyncio.sleep(delay)
             
-            logger.info(f"[{request_id}] Returning non-streaming response")
+            pool = attempt.pool
+            backend = pool.select(exclude=failed)
+            request_metrics["backend"] = backend.url
+            pool.begin(backend)
+            try:
+                limiter = await self._admit(backend, request_metrics)
+            except BaseException:
+                pool.end(backend)
+                raise
+            attempt = UpstreamAttempt(pool, backend, limiter)
+    
+    async def _send_hedged(
+        self,
+        attempt: UpstreamAttempt,
+        body: Union[bytes, StreamedRequestBody],
+        headers: Dict[str, str],
+        request_metrics: Dict[str, Any],
+        stream: bool
+    ) -> UpstreamAttempt:
+        """Send the request, hedging it to a second backend if its first byte is late."""
+        def send(attempt: UpstreamAttempt):
+            if stream:
+                return attempt.open_stream(self.upstream, body, headers)
+            return attempt.send(self.upstream, body, headers)
+        
+        # A streamed upload can only be sent once
+        delay = None
+        if self.hedging is not None and isinstance(body, bytes):
+            delay = self.hedging.delay(request_metrics.get("model"), request_metrics.get("is_streaming"))
+        if delay is None:
+            return await send(attempt)
+        
+        def start_hedge():
+            hedge = self._hedge_attempt(attempt, request_metrics)
+            if hedge is None:
+                return None
+            logger.debug("[%s] No first byte from %s after %dms, hedging to %s",
+                         request_metrics.get("request_id"), attempt.backend.url, delay * 1000, hedge.backend.url)
+            return send(hedge)
+        
+        result, outcome = await race(
+            send(attempt), delay, start_hedge,
+            accept=lambda result: result.response.status_code < 500,
+            discard=UpstreamAttempt.close
+        )
+        if outcome is not None:
+            request_metrics["hedge_outcome"] = outcome
+            request_metrics["backend"] = result.backend.url
+            self.hedging.record(outcome)
+        return result
+    
+    def _hedge_attempt(self, primary: UpstreamAttempt, request_metrics: Dict[str, Any]) -> Optional[UpstreamAttempt]:
+        """A second attempt at a request on the hedge backend, or None if it cannot be hedged now."""
+        pool = primary.pool
+        if self.hedging.backend is not None:
+            backend = self.hedging.backend
+        elif len(pool.backends) > 1:
+            try:
+                backend = pool.select(exclude=[primary.backend])
+            except CircuitOpen:
+                return None
+        else:
+            return None
+        # Hedges never queue: one that has to wait for a slot would not answer sooner
+        limiter = self.limits.get(backend.url, request_metrics.get("model")) if self.limits is not None else None
+        if limiter is not None and not limiter.try_acquire():
+            return None
+        if not self.hedging.budget.try_spend():
+            if limiter is not None:
+                limiter.release()
+            return None
+        self.hedging.hedged_total += 1
+        pool.begin(backend)
+        return UpstreamAttempt(pool, backend, limiter)
+    
+    async def _admit(self, backend: Backend, request_metrics: Dict[str, Any]) -> Optional[ConcurrencyLimiter]:
+        """Wait for a concurrency slot on the backend or model, if it is limited."""
+        limiter = self.limits.get(backend.url, request_metrics.get("model")) if self.limits is not None else None
+        if limiter is None:
+            return None
+        queued_at = time.monotonic()
+        try:
+            await limiter.acquire()
+        finally:
+            # Retries add the wait for the next backend's slot
+            request_metrics["queue_time_ms"] = (request_metrics.get("queue_time_ms") or 0) + int((time.monotonic() - queued_at) * 1000)
+        if request_metrics["queue_time_ms"]:
+            logger.debug("[%s] Admitted after %dms in queue", request_metrics.get("request_id"), request_metrics["queue_time_ms"])
+        return limiter
+    
+    def _reject_admission(self, start_time: float, request_metrics: Dict[str, Any], error: AdmissionRejected) -> JSONResponse:
+        """Answer a request turned away by admission control."""
+        logger.warning("[%s] Rejected by admission control: %s", request_metrics.get('request_id'), error)
+        self._record_failed_request(start_time, request_metrics, error.status_code, error.error_type, str(error))
+        return JSONResponse(
+            {"error": {"message": str(error), "type": "server_error", "param": None, "code": error.error_type}},
+            status_code=error.status_code,
+            headers={"retry-after": str(max(1, math.ceil(getattr(error, "retry_after", 1))))}
+        )
+    
+    @staticmethod
+    async def _started(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Wait for the first chunk of a stream, so errors raised before it reach the caller."""
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        
+        async def resumed():
+            try:
+                if first is not None:
+                    yield first
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+        
+        return resumed()
+    
+    async def _follow_stream(
+        self,
+        flight: StreamFlight,
+        start_time: float,
+        request_metrics: Dict[str, Any]
+    ):
+        """Relay a stream started by an identical request and record this client's own row."""
+        first_token_time = None
+        last_token_time = None
+        try:
+            async for chunk in flight.subscribe():
+                if chunk.strip() != b"data: [DONE]":
+                    last_token_time = time.time()
+                    first_token_time = first_token_time or last_token_time
+                yield chunk
+        except AdmissionRejected:
+            # The stream never started; recorded by the caller with the rejection
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # This client went away; the shared stream is only stopped when every client has
+            request_metrics["backend"] = flight.backend
+            self._record_cancelled_request(start_time, request_metrics, first_token_time, None, None)
+            raise
+        except Exception as e:
+            request_metrics["backend"] = flight.backend
+            self._record_failed_request(start_time, request_metrics, 500, "streaming_error", str(e))
+            raise
+        
+        request_metrics["backend"] = flight.backend
+        outcome = flight.outcome or {}
+        if "error_type" not in outcome and first_token_time:
+            self._record_successful_request(
+                start_time, request_metrics, first_token_time, last_token_time,
+                outcome.get("usage"), outcome.get("finish_reason"), outcome.get("itl_stats")
+            )
+        else:
+            self._record_failed_request(
+                start_time, request_metrics, outcome.get("status_code", 500),
+                outcome.get("error_type", "streaming_incomplete"),
+                outcome.get("error_message", "Streaming did not complete successfully")
+            )
+    
+    async def _replay_cached_stream(
+        self,
+        cached: CachedResponse,
+        start_time: float,
+        request_metrics: Dict[str, Any]
+    ):
+        """Send a cached stream event by event, as the backend sent it."""
+        content = cached.content
+        first_event_time = None
+        position = 0
+        while position < len(content):
+            end = content.find(b"\n\n", position)
+            end = len(content) if end == -1 else end + 2
+            if first_event_time is None:
+                first_event_time = time.time()
+            yield content[position:end]
+            position = end
+        self._record_cache_hit(start_time, request_metrics, cached, first_event_time or time.time())
+    
+    async def list_models(self) -> Response:
+        """Get /v1/models, from the models cache when one is configured."""
+        if self.models_cache is None:
+            return await self._list_backend_models()
+        return await self.models_cache.get(self._list_backend_models)
+    
+    async def is_known_model(self, model: Optional[str]) -> bool:
+        """Whether the backends list the model; unknown when there is no model or no cached list."""
+        if model is None or self.models_cache is None:
+            return True
+        return await self.models_cache.is_known(model, self._list_backend_models)
+    
+    def reject_unknown_model(self, start_time: float, request_metrics: Dict[str, Any]) -> JSONResponse:
+        """Answer a request for an unlisted model with a 404 without contacting a backend."""
+        message = f"The model '{request_metrics['model']}' does not exist"
+        self._record_failed_request(start_time, request_metrics, 404, "model_not_found", message)
+        return JSONResponse(
+            {"error": {"message": message, "type": "invalid_request_error", "param": "model", "code": "model_not_found"}},
+            status_code=404
+        )
+    
+    def reject_oversized_body(self, start_time: float, request_metrics: Dict[str, Any], error: RequestBodyTooLarge) -> JSONResponse:
+        """Answer a request whose body is over the size limit."""
+        logger.warning("[%s] Rejected oversized request body: %s", request_metrics.get('request_id'), error)
+        self._record_failed_request(start_time, request_metrics, 413, "request_too_large", str(error))
+        return JSONResponse(
+            {"error": {"message": str(error), "type": "invalid_request_error", "param": None, "code": "request_too_large"}},
+            status_code=413
+        )
+    
+    async def _list_backend_models(self) -> Response:
+        """Get /v1/models from the backends, merged across pools when models are routed to several."""
+        pools = self.router.pools
+        if len(pools) == 1:
+            response = await self.upstream.request(pools[0].select().url, "GET", "/v1/models", timeout=30.0)
+            logger.debug("Backend models response - Status: %d", response.status_code)
             return Response(
                 content=response.content,
                 status_code=response.status_code,
                 headers=dict(response.headers)
             )
+        
+        results = await asyncio.gather(*(self._fetch_models(pool) for pool in pools), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        
+        # A model served by several pools is listed once
+        models = []
+        seen = set()
+        for pool, result in zip(pools, results):
+            if isinstance(result, Exception):
+                logger.warning("Models request to %s failed: %s", ', '.join(pool.urls), result)
+                continue
+            for model in result:
+                if model.get("id") not in seen:
+                    seen.add(model.get("id"))
+                    models.append(model)
+        
+        return JSONResponse({"object": "list", "data": models})
+    
+    async def _fetch_models(self, pool: BackendPool) -> List[Dict[str, Any]]:
+        response = await self.upstream.request(pool.select().url, "GET", "/v1/models", timeout=30.0)
+        response.raise_for_status()
+        return response.json().get("data", [])
+    
+    @staticmethod
+    def _record_backend_status(pool: BackendPool, backend: Backend, status_code: int) -> None:
+        """Passive health check: server errors count against the replica, client errors do not."""
+        if status_code >= 500:
+            pool.record_failure(backend)
+        else:
+            pool.record_success(backend)
+    
+    def check_rate_limit(
+        self,
+        headers: Dict[str, str],
+        start_time: float,
+        request_metrics: Dict[str, Any]
+    ) -> Optional[JSONResponse]:
+        """Charge the request to its client's budgets; returns a 429 response if they are exhausted."""
+        key = self.rate_limiter.client_key(headers)
+        tokens = self.rate_limiter.token_charge(request_metrics.get("max_tokens"))
+        retry_after = self.rate_limiter.acquire(key, tokens)
+        if retry_after is None:
+            # Settled against the actual usage when the request is recorded
+            request_metrics["rate_limit"] = (key, tokens)
+            return None
+        
+        message = f"Rate limit exceeded, retry after {retry_after:.1f}s"
+        logger.debug("[%s] Rate limited client %s", request_metrics.get("request_id"), key)
+        self._record_failed_request(start_time, request_metrics, 429, "rate_limited", message)
+        return JSONResponse(
+            {"error": {"message": message, "type": "rate_limit_error", "param": None, "code": "rate_limited"}},
+            status_code=429,
+            headers={"retry-after": str(max(1, int(retry_after + 0.999)))}
+        )
+    
+    def _complete(self, request_metrics: Dict[str, Any], request: CompletionRequest) -> None:
+        """Log and record a finished request, settling its rate limit charge."""
+        charge = request_metrics.pop("rate_limit", None)
+        if charge is not None and charge[1]:
+            key, charged = charge
+            if request.cache_hit or request.coalesced:
+                # Answered without generating anything
+                used = 0
+            elif request.total_tokens is not None:
+                used = request.total_tokens
+            elif request.completion_tokens is not None:
+                used = request.completion_tokens
+            else:
+                # Usage unknown: failures are refunded, successes keep the pre-charge
+                used = charged if request.success else 0
+            self.rate_limiter.settle(key, charged, used)
+        
+        self._log_completion(request_metrics, request)
+        record_request_from_model(request)
+    
+    @staticmethod
+    def _log_completion(request_metrics: Dict[str, Any], request: CompletionRequest) -> None:
+        """Emit the single structured INFO record for a finished request."""
+        log_event(
+            logger, logging.INFO, "Request completed",
+            request_id=request_metrics.get("request_id"),
+            model=request.model,
+            backend=request.backend,
+            streaming=request.is_streaming,
+            success=request.success,
+            status=request.status_code,
+            response_time_ms=request.response_time_ms,
+            ttft_ms=request.time_to_first_token_ms,
+            itl_p95_ms=round(request.itl_p95_ms, 1) if request.itl_p95_ms is not None else None,
+            total_tokens=request.total_tokens,
+            finish_reason=request.finish_reason,
+            cache_hit=request.cache_hit or None,
+            coalesced=request.coalesced or None,
+            error_type=request.error_type
+        )
     
     @safe_metrics_recording
     def _record_successful_request(
@@ -296,7 +914,8 @@ class ProxyService:
         first_token_time: float,
         last_token_time: float,
         usage: Optional[Dict[str, Any]],
-        finish_reason: str
+        finish_reason: str,
+        itl_stats: Optional[Dict[str, Optional[float]]] = None
     ) -> None:
         """Record a successful streaming request."""
         total_time_ms = int((last_token_time - start_time) * 1000)
@@ -314,6 +933,7 @@ class ProxyService:
             tokens_per_second = (total_tokens / (time_to_last_token_ms / 1000))
         
         request = CompletionRequest(
+            started_at_ms=int(start_time * 1000),
             success=True,
             status_code=200,
             response_time_ms=total_time_ms,
@@ -324,16 +944,22 @@ class ProxyService:
             temperature=request_metrics["temperature"],
             top_p=request_metrics["top_p"],
             message_count=request_metrics["message_count"],
+            backend=request_metrics.get("backend"),
+            coalesced=request_metrics.get("coalesced", False),
+            queue_time_ms=request_metrics.get("queue_time_ms"),
+            hedge_outcome=request_metrics.get("hedge_outcome"),
+            retry_count=request_metrics.get("retry_count"),
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
             total_tokens=total_tokens,
             finish_reason=finish_reason,
             time_to_first_token_ms=time_to_first_token_ms,
             time_to_last_token_ms=time_to_last_token_ms,
-            tokens_per_second=tokens_per_second
+            tokens_per_second=tokens_per_second,
+            **(itl_stats or {})
         )
         
-        record_request_from_model(request)
+        self._complete(request_metrics, request)
     
     @safe_metrics_recording
     def _record_successful_non_streaming_request(
@@ -358,6 +984,7 @@ class ProxyService:
             tokens_per_second = (total_tokens / response_time_ms) * 1000
         
         request = CompletionRequest(
+            started_at_ms=int(start_time * 1000),
             success=True,
             status_code=status_code,
             response_time_ms=response_time_ms,
@@ -368,6 +995,11 @@ class ProxyService:
             temperature=request_metrics["temperature"],
             top_p=request_metrics["top_p"],
             message_count=request_metrics["message_count"],
+            backend=request_metrics.get("backend"),
+            coalesced=request_metrics.get("coalesced", False),
+            queue_time_ms=request_metrics.get("queue_time_ms"),
+            hedge_outcome=request_metrics.get("hedge_outcome"),
+            retry_count=request_metrics.get("retry_count"),
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
             total_tokens=total_tokens,
@@ -377,7 +1009,84 @@ class ProxyService:
             tokens_per_second=tokens_per_second
         )
         
-        record_request_from_model(request)
+        self._complete(request_metrics, request)
+    
+    @safe_metrics_recording
+    def _record_cache_hit(
+        self,
+        start_time: float,
+        request_metrics: Dict[str, Any],
+        cached: CachedResponse,
+        first_token_time: float
+    ) -> None:
+        """Record a request answered from the response cache."""
+        response_time_ms = int((time.time() - start_time) * 1000)
+        
+        request = CompletionRequest(
+            started_at_ms=int(start_time * 1000),
+            success=True,
+            status_code=cached.status_code,
+            response_time_ms=response_time_ms,
+            model=request_metrics["model"],
+            origin=request_metrics["origin"],
+            is_streaming=request_metrics["is_streaming"],
+            max_tokens=request_metrics["max_tokens"],
+            temperature=request_metrics["temperature"],
+            top_p=request_metrics["top_p"],
+            message_count=request_metrics["message_count"],
+            prompt_tokens=cached.prompt_tokens,
+            completion_tokens=cached.completion_tokens,
+            total_tokens=cached.total_tokens,
+            finish_reason=cached.finish_reason,
+            time_to_first_token_ms=int((first_token_time - start_time) * 1000),
+            time_to_last_token_ms=response_time_ms,
+            cache_hit=True,
+            cache_saved_ms=cached.response_time_ms
+        )
+        
+        self._complete(request_metrics, request)
+    
+    @safe_metrics_recording
+    def _record_cancelled_request(
+        self,
+        start_time: float,
+        request_metrics: Dict[str, Any],
+        first_token_time: Optional[float],
+        usage: Optional[Dict[str, Any]],
+        content_chunks: Optional[int]
+    ) -> None:
+        """Record a stream the client abandoned, with the tokens generated until then."""
+        cancel_time = time.time()
+        
+        # Usage is normally only reported at the end; count content events instead
+        completion_tokens = usage.get("completion_tokens") if usage else content_chunks
+        
+        request = CompletionRequest(
+            started_at_ms=int(start_time * 1000),
+            success=False,
+            status_code=499,
+            response_time_ms=int((cancel_time - start_time) * 1000),
+            model=request_metrics["model"],
+            origin=request_metrics["origin"],
+            is_streaming=request_metrics["is_streaming"],
+            max_tokens=request_metrics["max_tokens"],
+            temperature=request_metrics["temperature"],
+            top_p=request_metrics["top_p"],
+            message_count=request_metrics["message_count"],
+            backend=request_metrics.get("backend"),
+            coalesced=request_metrics.get("coalesced", False),
+            queue_time_ms=request_metrics.get("queue_time_ms"),
+            hedge_outcome=request_metrics.get("hedge_outcome"),
+            retry_count=request_metrics.get("retry_count"),
+            prompt_tokens=usage.get("prompt_tokens") if usage else None,
+            completion_tokens=completion_tokens,
+            total_tokens=usage.get("total_tokens") if usage else None,
+            time_to_first_token_ms=int((first_token_time - start_time) * 1000) if first_token_time else None,
+            error_type="client_cancelled",
+            error_message="Client disconnected" + (f" after {completion_tokens} tokens" if completion_tokens is not None else "")
+        )
+        
+        self._complete(request_metrics, request)
     
     @safe_metrics_recording
     def _record_failed_request(
@@ -392,6 +1101,7 @@ class ProxyService:
         response_time_ms = int((time.time() - start_time) * 1000)
         
         request = CompletionRequest(
+            started_at_ms=int(start_time * 1000),
             success=False,
             status_code=status_code,
             response_time_ms=response_time_ms,
@@ -402,8 +1112,13 @@ class ProxyService:
             temperature=request_metrics["temperature"],
             top_p=request_metrics["top_p"],
             message_count=request_metrics["message_count"],
+            backend=request_metrics.get("backend"),
+            coalesced=request_metrics.get("coalesced", False),
+            queue_time_ms=request_metrics.get("queue_time_ms"),
+            hedge_outcome=request_metrics.get("hedge_outcome"),
+            retry_count=request_metrics.get("retry_count"),
             error_type=error_type,
             error_message=error_message
         )
         
-        record_request_from_model(request)
+        self._complete(request_metrics, request)
@@ -0,0 +1,156 @@
+"""
+Per-client rate limiting with token buckets.
+
+Each client, identified by its Origin header or a hash of its
+Authorization header, has a request budget and a token budget that refill
+continuously at the configured rate per minute and hold at most one
+minute's worth. A request pre-charges its max_tokens (or an estimate when
+it sets none) against the token budget; once the response is recorded the
+charge is settled against the tokens it actually used.
+
+Budgets live in memory in a fixed number of shards. The event loop is
+single-threaded, so no locking is needed; the shards keep the periodic
+eviction of idle clients to a small slice of the table per pass, so a
+check costs a dict lookup and some arithmetic.
+"""
+
+import time
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+KEY_SOURCES = ("origin", "api_key")
+
+# Key shared by clients that send no Origin / Authorization header
+ANONYMOUS_KEY = "-"
+
+# One shard is scanned for idle clients every this many checks
+PRUNE_EVERY = 1024
+
+
+class ClientBudget:
+    """Remaining requests and tokens of one client."""
+    __slots__ = ("requests", "tokens", "updated")
+
+    def __init__(self, requests: float, tokens: float, updated: float):
+        self.requests = requests
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Request and token budgets per client key."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        key_by: str = "origin",
+        token_estimate: int = 256,
+        shards: int = 16
+    ):
+        if key_by not in KEY_SOURCES:
+            raise ValueError(f"Unknown rate limit key '{key_by}', expected one of {', '.join(KEY_SOURCES)}")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.key_by = key_by
+        self.token_estimate = token_estimate
+        self._shards: List[Dict[str, ClientBudget]] = [{} for _ in range(shards)]
+        self._checks = 0
+
+        # Counters
+        self.allowed_total = 0
+        self.rejected_total = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["RateLimiter"]:
+        """Rate limiter from the environment, or None when no budget is configured."""
+        if Config.RATE_LIMIT_REQUESTS_PER_MINUTE <= 0 and Config.RATE_LIMIT_TOKENS_PER_MINUTE <= 0:
+            return None
+        return cls(
+            Config.RATE_LIMIT_REQUESTS_PER_MINUTE,
+            Config.RATE_LIMIT_TOKENS_PER_MINUTE,
+            key_by=Config.RATE_LIMIT_KEY,
+            token_estimate=Config.RATE_LIMIT_TOKEN_ESTIMATE
+        )
+
+    def client_key(self, headers: Dict[str, str]) -> str:
+        """The key a request is limited by; API keys are only kept hashed."""
+        if self.key_by == "api_key":
+            authorization = headers.get("authorization")
+            if not authorization:
+                return ANONYMOUS_KEY
+            return hashlib.sha256(authorization.encode()).hexdigest()[:16]
+        return headers.get("origin") or ANONYMOUS_KEY
+
+    def token_charge(self, max_tokens: Optional[int]) -> int:
+        """Tokens pre-charged for a request."""
+        if self.tokens_per_minute <= 0:
+            return 0
+        return max_tokens if isinstance(max_tokens, int) and max_tokens > 0 else self.token_estimate
+
+    def _budget(self, key: str, now: float) -> ClientBudget:
+        shard = self._shards[hash(key) % len(self._shards)]
+        budget = shard.get(key)
+        if budget is None:
+            budget = shard[key] = ClientBudget(self.requests_per_minute, self.tokens_per_minute, now)
+            return budget
+        # Refill for the time since the last check, up to one minute's worth
+        elapsed = now - budget.updated
+        if elapsed > 0:
+            budget.requests = min(self.requests_per_minute, budget.requests + elapsed * self.requests_per_minute / 60)
+            budget.tokens = min(self.tokens_per_minute, budget.tokens + elapsed * self.tokens_per_minute / 60)
+            budget.updated = now
+        return budget
+
+    def acquire(self, key: str, tokens: int = 0) -> Optional[float]:
+        """Charge one request and tokens to key; returns None if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self._prune(self._shards[(self._checks // PRUNE_EVERY) % len(self._shards)], now)
+
+        budget = self._budget(key, now)
+        retry_after = 0.0
+        if self.requests_per_minute > 0 and budget.requests < 1:
+            retry_after = (1 - budget.requests) * 60 / self.requests_per_minute
+        if self.tokens_per_minute > 0:
+            # A request larger than the whole budget waits for a full bucket
+            needed = min(tokens, self.tokens_per_minute)
+            if budget.tokens < needed:
+                retry_after = max(retry_after, (needed - budget.tokens) * 60 / self.tokens_per_minute)
+        if retry_after > 0:
+            self.rejected_total += 1
+            return retry_after
+
+        if self.requests_per_minute > 0:
+            budget.requests -= 1
+        budget.tokens -= tokens
+        self.allowed_total += 1
+        return None
+
+    def settle(self, key: str, charged: int, used: int) -> None:
+        """Replace a request's pre-charge with the tokens it used; overruns leave the client in debt."""
+        budget = self._shards[hash(key) % len(self._shards)].get(key)
+        if budget is not None:
+            budget.tokens = min(self.tokens_per_minute, budget.tokens + charged - used)
+
+    def _prune(self, shard: Dict[str, ClientBudget], now: float) -> None:
+        """Drop clients idle long enough for their budgets to have refilled."""
+        for key in [key for key, budget in shard.items() if now - budget.updated > 60]:
+            del shard[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current rate limiting state for the /proxy/stats endpoint."""
+        return {
+            "key_by": self.key_by,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "clients": sum(len(shard) for shard in self._shards),
+            "allowed_total": self.allowed_total,
+            "rejected_total": self.rejected_total
+        }
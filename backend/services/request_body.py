@@ -0,0 +1,109 @@
+"""
+Reading chat completion request bodies.
+
+By default the whole body is read before it is forwarded. With body
+streaming enabled, bodies larger than the sniff window are forwarded to
+the backend as they arrive: only the head is buffered, scanned with the
+incremental RequestFieldScanner until the model and stream fields are
+known (which is all routing needs), and the rest flows through to the
+upstream request while the scanner picks up the remaining fields. A body
+without a stream field before its messages is a non-streaming request,
+the API's default; a stream field after the messages is not seen in time.
+
+Bodies whose model only comes after the messages cannot be routed from
+their head, so they are buffered in full as before. A
+maximum body size is enforced from Content-Length up front and by
+counting bytes as they are read, in both modes.
+"""
+
+import logging
+from typing import Dict, Any, AsyncIterator, Callable, Optional, Union
+
+from starlette.requests import Request
+
+from backend.services.request_parsing import RequestFieldScanner
+
+logger = logging.getLogger(__name__)
+
+# Fields needed before a body can be routed and forwarded; stream defaults to false
+ROUTING_FIELDS = ("model",)
+
+
+class RequestBodyTooLarge(Exception):
+    """A request body over the configured maximum size."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Request body exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class StreamedRequestBody:
+    """A request body forwarded upstream while it is still arriving.
+
+    Iterating it (as httpx does when it is passed as content) yields the
+    buffered head and then the rest of the upload; it can be sent once.
+    """
+
+    def __init__(self, head: bytes, rest: AsyncIterator[bytes], scanner: RequestFieldScanner, max_bytes: int = 0):
+        self.head = head
+        self.size = len(head)
+        self.max_bytes = max_bytes
+        self._rest = rest
+        self._scanner = scanner
+        self._consumed = False
+        # Called with the complete fields once the whole body has been read
+        self.on_complete: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @property
+    def fields(self) -> Optional[Dict[str, Any]]:
+        """Fields scanned so far; the message count is only known once the upload has finished."""
+        return self._scanner.fields()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self._consumed:
+            raise RuntimeError("Streamed request body can only be sent once")
+        self._consumed = True
+        yield self.head
+        async for chunk in self._rest:
+            self.size += len(chunk)
+            if self.max_bytes and self.size > self.max_bytes:
+                raise RequestBodyTooLarge(self.max_bytes)
+            self._scanner.feed(chunk)
+            yield chunk
+        fields = self._scanner.fields()
+        if fields is not None and self.on_complete is not None:
+            self.on_complete(fields)
+
+
+async def read_request_body(
+    request: Request,
+    max_bytes: int = 0,
+    streaming: bool = False,
+    sniff_bytes: int = 16384
+) -> Union[bytes, StreamedRequestBody]:
+    """Read a request body, or just its head when it can be streamed upstream.
+
+    Raises RequestBodyTooLarge as soon as the body is known to exceed max_bytes.
+    """
+    length = request.headers.get("content-length")
+    if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+        raise RequestBodyTooLarge(max_bytes)
+
+    chunks = request.stream()
+    scanner = RequestFieldScanner() if streaming else None
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if max_bytes and len(body) > max_bytes:
+            raise RequestBodyTooLarge(max_bytes)
+        if scanner is not None and not scanner.error:
+            scanner.feed(chunk)
+            # A body whose fields only turn up at its end has been read whole already
+            routable = (
+                scanner.has_fields(*ROUTING_FIELDS) and (scanner.has_fields("stream") or scanner.seen_messages)
+                and not scanner.error and not scanner.complete
+            )
+            if routable and len(body) >= sniff_bytes:
+                logger.debug("Streaming request body upstream after a %d byte head", len(body))
+                return StreamedRequestBody(bytes(body), chunks, scanner, max_bytes)
+    return bytes(body)
@@ -0,0 +1,46 @@
+"""
+Budget for extra upstream requests.
+
+Hedges and retries (requests the proxy sends on its own initiative) must
+not multiply the load on backends that are already struggling. A RequestBudget
+earns a fraction of a request for every regular request and spends one for
+every extra request, so extra requests stay within that fraction of the
+traffic over time; a small cap on the balance bounds bursts after quiet
+periods.
+"""
+
+from typing import Dict, Any
+
+
+class RequestBudget:
+    """Allows extra requests up to ratio times the regular ones."""
+
+    def __init__(self, ratio: float, max_balance: float = 10.0, initial_balance: float = 0.0):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = min(initial_balance, max_balance)
+
+        # Counters
+        self.spent_total = 0
+        self.denied_total = 0
+
+    def deposit(self) -> None:
+        """Earn credit for one regular request."""
+        self.balance = min(self.balance + self.ratio, self.max_balance)
+
+    def try_spend(self) -> bool:
+        """Spend credit for one extra request, if there is enough."""
+        if self.balance < 1:
+            self.denied_total += 1
+            return False
+        self.balance -= 1
+        self.spent_total += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ratio": self.ratio,
+            "balance": round(self.balance, 2),
+            "spent_total": self.spent_total,
+            "denied_total": self.denied_total
+        }
@@ -0,0 +1,147 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+While a deterministic request is being answered by the backend, identical
+requests do not start their own upstream call: non-streaming ones wait for
+the response of the first (the leader), streaming ones subscribe to its
+stream. A stream is read from the backend by a background task and fanned
+out to every subscriber; subscribers that join late are first sent the
+events they missed, so every client receives the complete response. Once
+every subscriber has gone away the upstream stream is cancelled.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StreamFlight:
+    """One upstream stream shared by every client asking for it."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        # Set by the leader's stream handler: replica used and how the stream ended
+        self.backend: Optional[str] = None
+        self.outcome: Optional[Dict[str, Any]] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Every chunk of the stream, from the start, as it arrives."""
+        self.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.done:
+                    break
+                await self._changed.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                # Nobody is reading any more: stop the upstream generation
+                self.abandoned = True
+                self.task.cancel()
+
+
+class RequestCoalescer:
+    """Shares one upstream call between identical concurrent requests."""
+
+    def __init__(self, streams: bool = False):
+        self.streams = streams
+        self._requests: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, StreamFlight] = {}
+
+        # Counters
+        self.leaders_total = 0
+        self.coalesced_total = 0
+
+    async def request(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run call once for all concurrent callers with the same key; returns (result, coalesced)."""
+        future = self._requests.get(key)
+        if future is not None:
+            self.coalesced_total += 1
+            # Shielded so a follower going away does not cancel the leader's call
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._requests[key] = future
+        self.leaders_total += 1
+        try:
+            result = await call()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.set_exception(RuntimeError("Coalesced request was cancelled"))
+            else:
+                future.set_exception(e)
+            # Followers re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._requests[key]
+
+    def stream(self, key: str, source: Callable[[StreamFlight], AsyncIterator[bytes]]) -> Tuple[StreamFlight, bool]:
+        """Join the stream for key, starting source in the background if there is none; returns (flight, coalesced)."""
+        flight = self._streams.get(key)
+        if flight is not None and not flight.abandoned:
+            self.coalesced_total += 1
+            return flight, True
+
+        flight = StreamFlight()
+        self._streams[key] = flight
+        self.leaders_total += 1
+
+        async def run():
+            try:
+                async for chunk in source(flight):
+                    flight.publish(chunk)
+                flight.finish()
+            except Exception as e:
+                flight.finish(e)
+            except asyncio.CancelledError as e:
+                flight.finish(e)
+                raise
+            finally:
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+
+        flight.task = asyncio.get_running_loop().create_task(run())
+        return flight, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current coalescing counters for the /proxy/stats endpoint."""
+        return {
+            "streams": self.streams,
+            "in_flight_requests": len(self._requests),
+            "in_flight_streams": len(self._streams),
+            "leaders_total": self.leaders_total,
+            "coalesced_total": self.coalesced_total
+        }
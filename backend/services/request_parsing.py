@@ -0,0 +1,366 @@
+"""
+Request body field extraction for chat completion requests.
+
+The proxy only needs a handful of top-level scalars from each request
+(model, stream, max_tokens, temperature, top_p) and the number of messages.
+RequestFieldScanner walks the raw JSON bytes, capturing just those values
+and counting the elements of the messages array without building any of
+the message objects, so large prompts are never materialised as Python
+objects. Anything unexpected makes the scanner give up and callers fall
+back to a full JSON parse.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, Any, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional fast parser
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Top-level keys whose values are captured
+SCALAR_FIELDS = {b"model", b"stream", b"max_tokens", b"temperature", b"top_p"}
+MESSAGES_FIELD = b"messages"
+
+# Next byte that changes the scanner state outside of a string
+STRUCTURAL = re.compile(rb'[{}\[\]",:]')
+# Same, inside nested containers where colons do not matter
+NESTED = re.compile(rb'[{}\[\]",]')
+# Body of a JSON string up to (not including) its closing quote or a trailing backslash
+STRING_BODY = re.compile(rb'(?:[^"\\]++|\\.)*+', re.DOTALL)
+
+QUOTE = 0x22
+BACKSLASH = 0x5C
+
+# Escaped quotes tolerated in skipped strings before the scan gives up; each
+# costs a Python-level iteration, so escape-heavy bodies go to the C parser
+MAX_ESCAPED_QUOTES = 256
+
+# Scanner states at the top level of the request object
+START, FIRST_KEY, KEY, COLON, VALUE, AFTER_VALUE, DONE = range(7)
+
+
+class RequestFieldScanner:
+    """Incremental scanner that extracts top-level request fields from raw JSON bytes."""
+
+    def __init__(self):
+        self.state = START
+        self.stack = bytearray()  # Open containers below the top-level object
+        self.in_string = False
+        self.escape = False
+        self.capture: Optional[bytearray] = None
+        self.scalar = bytearray()
+        self.key: Optional[bytes] = None
+        self.raw_values: Dict[bytes, bytes] = {}
+        self.message_count: Optional[int] = None
+        self.in_messages = False
+        self.seen_messages = False  # The messages array has been reached
+        self.message_commas = 0
+        self.message_objects = 0
+        self.escaped_quotes = 0
+        self.error = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the whole top-level object has been scanned successfully."""
+        return self.state == DONE and not self.error
+
+    def has_fields(self, *names: str) -> bool:
+        """Whether the given top-level fields have already been seen."""
+        return all(name.encode() in self.raw_values for name in names)
+
+    def feed(self, chunk: bytes) -> None:
+        """Scan the next chunk of the body."""
+        pos = 0
+        end = len(chunk)
+        while pos < end and not self.error:
+            if self.in_string:
+                pos = self._scan_string(chunk, pos, end)
+                continue
+            if self.stack:
+                pos = self._skip_nested(chunk, pos, end)
+                continue
+
+            match = STRUCTURAL.search(chunk, pos)
+            stop = match.start() if match else end
+            if stop > pos:
+                self._gap(chunk[pos:stop])
+            if match is None:
+                break
+            pos = stop + 1
+            self._structural(chunk[stop])
+
+    def _scan_string(self, chunk: bytes, pos: int, end: int) -> int:
+        """Consume string content, returning the position after what was consumed."""
+        if self.escape:
+            self.escape = False
+            if self.capture is not None:
+                self.capture += chunk[pos:pos + 1]
+            return pos + 1
+
+        if self.capture is None:
+            stop = self._skip_string(chunk, pos, end)
+        else:
+            stop = STRING_BODY.match(chunk, pos).end()
+            self.capture += chunk[pos:stop]
+        if stop == end:
+            return end
+        if chunk[stop] == BACKSLASH:
+            # Escape sequence split across chunks
+            if self.capture is not None:
+                self.capture += b"\\"
+            self.escape = True
+            return stop + 1
+
+        self.in_string = False
+        self._end_string()
+        return stop + 1
+
+    def _skip_nested(self, chunk: bytes, pos: int, end: int) -> int:
+        """Skip through nested containers (message objects) until back at the top level.
+
+        Only brackets, commas and strings matter here, so this tight loop
+        handles them inline instead of going through _structural.
+        """
+        stack = self.stack
+        count_messages = self.in_messages
+        if count_messages and len(stack) == 1 and not self.message_objects and not self.message_commas:
+            # Until the first element is seen, anything but whitespace is a literal element
+            match = NESTED.search(chunk, pos)
+            if chunk[pos:match.start() if match else end].strip():
+                self.error = True
+                return end
+        while True:
+            match = NESTED.search(chunk, pos)
+            if match is None:
+                return end
+            stop = match.start()
+            char = chunk[stop]
+            pos = stop + 1
+            if char == QUOTE:
+                if count_messages and len(stack) == 1:
+                    # A string message: leave it to the full parser
+                    self.error = True
+                    return end
+                stop = self._skip_string(chunk, pos, end)
+                if stop == end or chunk[stop] == BACKSLASH or self.error:
+                    # String continues in the next chunk; let _scan_string pick it up
+                    self.in_string = True
+                    return pos
+                pos = stop + 1
+            elif char == 0x2C:  # ,
+                if count_messages and len(stack) == 1:
+                    self.message_commas += 1
+            elif char == 0x7B or char == 0x5B:
+                if count_messages and len(stack) == 1:
+                    if char == 0x5B:
+                        # An array message: leave it to the full parser
+                        self.error = True
+                        return end
+                    self.message_objects += 1
+                stack.append(char)
+            elif len(stack) == 1:
+                # Closing the top-level value; _structural handles the state change
+                self._structural(char)
+                return pos
+            else:
+                opener = stack.pop()
+                if (opener == 0x7B) != (char == 0x7D):
+                    self.error = True
+                    return end
+
+    def _skip_string(self, chunk: bytes, pos: int, end: int) -> int:
+        """Find the closing quote of a string that is not captured.
+
+        Uses bytes.find so long message contents are skipped at memchr speed;
+        only escaped quotes cost an extra iteration. Like STRING_BODY, stops
+        at an unpaired backslash that ends the chunk.
+        """
+        while True:
+            quote = chunk.find(b'"', pos)
+            stop = end if quote == -1 else quote
+            backslashes = 0
+            index = stop - 1
+            while index >= pos and chunk[index] == BACKSLASH:
+                backslashes += 1
+                index -= 1
+            if quote == -1:
+                return end - 1 if backslashes % 2 else end
+            if backslashes % 2 == 0:
+                return quote
+            self.escaped_quotes += 1
+            if self.escaped_quotes > MAX_ESCAPED_QUOTES:
+                self.error = True
+                return end
+            pos = quote + 1
+
+    def _gap(self, text: bytes) -> None:
+        """Handle bytes between structural characters (whitespace or scalar literals)."""
+        if self.stack:
+            return
+        if self.state == VALUE:
+            self.scalar += text
+        elif text.strip():
+            self.error = True
+
+    def _structural(self, char: int) -> None:
+        depth = len(self.stack)
+
+        if char == QUOTE:
+            self.in_string = True
+            if depth:
+                return
+            if self.state in (FIRST_KEY, KEY):
+                self.capture = bytearray()
+            elif self.state == VALUE and not self.scalar.strip() and self.key != MESSAGES_FIELD:
+                self.capture = bytearray() if self.key in SCALAR_FIELDS else None
+            else:
+                self.error = True
+            return
+
+        if char in b"{[":
+            if depth:
+                if self.in_messages and depth == 1 and char == 0x7B:
+                    self.message_objects += 1
+                self.stack.append(char)
+            elif self.state == START and char == 0x7B:
+                self.state = FIRST_KEY
+            elif self.state == VALUE and not self.scalar.strip() and self.key not in SCALAR_FIELDS:
+                self.stack.append(char)
+                if self.key == MESSAGES_FIELD:
+                    if char != 0x5B:
+                        self.error = True
+                    self.in_messages = True
+                    self.seen_messages = True
+                    self.message_commas = 0
+                    self.message_objects = 0
+            else:
+                self.error = True
+            return
+
+        if char in b"}]":
+            if depth:
+                opener = self.stack.pop()
+                if (opener == 0x7B) != (char == 0x7D):
+                    self.error = True
+                elif depth == 1:
+                    if self.in_messages:
+                        self._end_messages()
+                    self.state = AFTER_VALUE
+            elif char == 0x7D and self.state in (FIRST_KEY, VALUE, AFTER_VALUE):
+                if self.state == VALUE:
+                    self._end_scalar()
+                self.state = DONE
+            else:
+                self.error = True
+            return
+
+        if char == 0x2C:  # ,
+            if depth:
+                if self.in_messages and depth == 1:
+                    self.message_commas += 1
+            elif self.state == VALUE:
+                self._end_scalar()
+                self.state = KEY
+            elif self.state == AFTER_VALUE:
+                self.state = KEY
+            else:
+                self.error = True
+            return
+
+        # :
+        if depth:
+            return
+        if self.state == COLON:
+            self.state = VALUE
+            self.scalar = bytearray()
+        else:
+            self.error = True
+
+    def _end_string(self) -> None:
+        if self.stack:
+            return
+        if self.state in (FIRST_KEY, KEY):
+            if BACKSLASH in self.capture:
+                # Escaped key names are compared decoded by the full parser
+                self.error = True
+            self.key = bytes(self.capture)
+            self.state = COLON
+        else:
+            if self.capture is not None:
+                self.raw_values[self.key] = b'"' + bytes(self.capture) + b'"'
+            self.state = AFTER_VALUE
+        self.capture = None
+
+    def _end_scalar(self) -> None:
+        text = bytes(self.scalar).strip()
+        if not text or self.key == MESSAGES_FIELD:
+            self.error = True
+        elif self.key in SCALAR_FIELDS:
+            self.raw_values[self.key] = text
+
+    def _end_messages(self) -> None:
+        self.in_messages = False
+        if self.message_objects == 0 and self.message_commas == 0:
+            self.message_count = 0
+        elif self.message_objects == self.message_commas + 1:
+            self.message_count = self.message_objects
+        else:
+            # Literal elements between objects: leave it to the full parser
+            self.error = True
+
+    def fields(self) -> Optional[Dict[str, Any]]:
+        """Return the fields scanned so far, or None if the body could not be scanned."""
+        if self.error:
+            return None
+        try:
+            values = {key.decode(): json.loads(raw) for key, raw in self.raw_values.items()}
+        except ValueError:
+            return None
+        return build_request_fields(values, self.message_count)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Return the extracted fields, or None if the body could not be scanned."""
+        if not self.complete:
+            return None
+        return self.fields()
+
+
+def build_request_fields(values: Dict[str, Any], message_count: Optional[int]) -> Dict[str, Any]:
+    """Shape extracted values the way extract_request_metrics records them."""
+    return {
+        "model": values.get("model"),
+        "is_streaming": values.get("stream", False),
+        "max_tokens": values.get("max_tokens"),
+        "temperature": values.get("temperature"),
+        "top_p": values.get("top_p"),
+        "message_count": message_count if message_count else None
+    }
+
+
+def scan_request_fields(body: bytes) -> Optional[Dict[str, Any]]:
+    """Extract request fields without parsing message contents. Returns None on odd payloads."""
+    scanner = RequestFieldScanner()
+    scanner.feed(body)
+    return scanner.result()
+
+
+def parse_request_fields(body: bytes) -> Dict[str, Any]:
+    """Extract request fields with a full JSON parse (orjson when installed)."""
+    body_dict = orjson.loads(body) if orjson is not None else json.loads(body)
+    messages = body_dict.get("messages", [])
+    return build_request_fields(body_dict, len(messages) if messages else None)
+
+
+def extract_request_fields(body: bytes, mode: str = "partial") -> Dict[str, Any]:
+    """Extract request fields, scanning first and falling back to a full parse."""
+    if mode == "partial":
+        fields = scan_request_fields(body)
+        if fields is not None:
+            return fields
+        logger.debug("Partial request scan failed, falling back to full JSON parse")
+    return parse_request_fields(body)
@@ -0,0 +1,264 @@
+"""
+Response cache for deterministic completions.
+
+Responses to requests that ask for deterministic output (temperature 0)
+are stored under a hash of the canonicalised request body, so repeating
+the request is answered without running inference again. Entries live in
+an in-memory LRU bounded by a byte budget and expire after a TTL; an
+optional SQLite file keeps them across restarts and beyond the memory
+budget. Streamed responses are stored as the SSE bytes that were sent
+and replayed event by event.
+"""
+
+import time
+import json
+import asyncio
+import sqlite3
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Set
+
+from backend.utils.config import Config
+
+try:
+    import orjson
+except ImportError:  # optional, only used for speed
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-entry bookkeeping overhead counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 256
+
+# Remove expired rows from the disk tier once every this many writes
+DISK_PRUNE_EVERY = 100
+
+
+@dataclass
+class CachedResponse:
+    """A stored backend response and what it cost to produce."""
+    content: bytes
+    status_code: int
+    content_type: str
+    is_streaming: bool
+    response_time_ms: int  # backend time of the original response, saved by every hit
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    finish_reason: Optional[str] = None
+    expires_at: float = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + ENTRY_OVERHEAD_BYTES
+
+
+def is_cacheable(request_metrics: Dict[str, Any], headers: Dict[str, str]) -> bool:
+    """Only deterministic requests are cached, and clients can opt out per request."""
+    if request_metrics.get("temperature") != 0:
+        return False
+    cache_control = headers.get("cache-control", "").lower()
+    return "no-cache" not in cache_control and "no-store" not in cache_control
+
+
+def cache_key(body: bytes) -> Optional[str]:
+    """Hash of the request body with keys sorted and whitespace removed, or None if it is not JSON."""
+    try:
+        if orjson is not None:
+            canonical = orjson.dumps(orjson.loads(body), option=orjson.OPT_SORT_KEYS)
+        else:
+            canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except (ValueError, TypeError):
+        return None
+    return hashlib.sha256(canonical).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU with a byte budget and TTL, backed by an optional SQLite tier."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        ttl: float = 3600.0,
+        db_path: Optional[str] = None
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.db_path = db_path or None
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._disk_writes = 0
+        self._disk_ready = False
+        # Strong references to pending disk writes so they are not garbage collected
+        self._pending: Set[asyncio.Task] = set()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls) -> "ResponseCache":
+        """Build a cache from the application configuration."""
+        return cls(
+            max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+            max_entry_bytes=Config.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+            ttl=Config.RESPONSE_CACHE_TTL,
+            db_path=Config.RESPONSE_CACHE_DB_PATH
+        )
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up a response, trying memory first and then disk."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._remove(key)
+
+        if self.db_path:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key, now)
+            except Exception as e:
+                logger.error("Response cache disk lookup failed: %s", e)
+                entry = None
+            if entry is not None:
+                self._store_in_memory(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store a response; the disk write, if any, happens in the background."""
+        if entry.size > self.max_entry_bytes:
+            return
+        entry.expires_at = time.time() + self.ttl
+        self._store_in_memory(key, entry)
+        self.stores += 1
+
+        if self.db_path:
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._disk_put, key, entry))
+            self._pending.add(task)
+            task.add_done_callback(self._disk_put_done)
+
+    def _disk_put_done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Response cache disk write failed: %s", task.exception())
+
+    def _store_in_memory(self, key: str, entry: CachedResponse) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        if not self._disk_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    status_code INTEGER NOT NULL,
+                    content_type TEXT,
+                    is_streaming BOOLEAN,
+                    response_time_ms INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    total_tokens INTEGER,
+                    finish_reason TEXT,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._disk_ready = True
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[CachedResponse]:
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT content, status_code, content_type, is_streaming, response_time_ms,
+                       prompt_tokens, completion_tokens, total_tokens, finish_reason, expires_at
+                FROM response_cache WHERE key = ? AND expires_at > ?
+            """, (key, now)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return CachedResponse(
+            content=row[0], status_code=row[1], content_type=row[2], is_streaming=bool(row[3]),
+            response_time_ms=row[4], prompt_tokens=row[5], completion_tokens=row[6],
+            total_tokens=row[7], finish_reason=row[8], expires_at=row[9]
+        )
+
+    def _disk_put(self, key: str, entry: CachedResponse) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO response_cache (
+                    key, content, status_code, content_type, is_streaming, response_time_ms,
+                    prompt_tokens, completion_tokens, total_tokens, finish_reason, expires_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                key, entry.content, entry.status_code, entry.content_type, entry.is_streaming,
+                entry.response_time_ms, entry.prompt_tokens, entry.completion_tokens,
+                entry.total_tokens, entry.finish_reason, entry.expires_at
+            ))
+            self._disk_writes += 1
+            if self._disk_writes % DISK_PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def flush(self) -> None:
+        """Wait for pending disk writes (called on app shutdown)."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current cache counters for the /proxy/stats endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "disk_tier": bool(self.db_path),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions
+        }
+
+
+# Global response cache instance, used when RESPONSE_CACHE_ENABLED is set
+response_cache = ResponseCache.from_config()
@@ -0,0 +1,82 @@
+"""
+Retries of requests that failed before their first upstream byte.
+
+A request whose backend could not be reached, or dropped the connection
+before sending anything, has shown the client nothing yet, so it can be
+sent again: to another replica of its pool when there is one, otherwise
+to the same backend. Retries wait a jittered exponential backoff (full
+jitter, so clients failing together do not retry together) and are paid
+for from a global RequestBudget, so a backend outage costs at most a
+fixed fraction of extra requests instead of multiplying the load on the
+replicas left.
+"""
+
+import random
+import logging
+from typing import Dict, Any, Optional
+
+import httpx
+
+from backend.services.request_budget import RequestBudget
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Failures where the backend cannot have sent anything the client would see. Read
+# timeouts are left out: the request has already waited the full timeout once
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.WriteError,
+)
+
+
+class RetryPolicy:
+    """Up to max_retries retries per request with full-jitter backoff, within a retry budget."""
+
+    def __init__(self, max_retries: int, budget: RequestBudget, base_delay: float = 0.1, max_delay: float = 2.0):
+        self.max_retries = max_retries
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # Counters
+        self.retries_total = 0
+        self.exhausted_total = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["RetryPolicy"]:
+        """Build the retry policy from the application configuration, or None if retries are disabled."""
+        if Config.RETRY_MAX_RETRIES <= 0:
+            return None
+        return cls(
+            Config.RETRY_MAX_RETRIES,
+            # Starts full so the first failures after a restart can be retried
+            RequestBudget(Config.RETRY_BUDGET, initial_balance=10.0),
+            base_delay=Config.RETRY_BACKOFF_BASE_MS / 1000,
+            max_delay=Config.RETRY_BACKOFF_MAX_MS / 1000
+        )
+
+    def should_retry(self, error: Exception, retries: int) -> bool:
+        """Whether a request that failed with error, after the given number of retries, may be sent again."""
+        if not isinstance(error, RETRYABLE_ERRORS):
+            return False
+        if retries >= self.max_retries or not self.budget.try_spend():
+            self.exhausted_total += 1
+            return False
+        self.retries_total += 1
+        return True
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to wait before the given retry (1 for the first)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_retries": self.max_retries,
+            "retries_total": self.retries_total,
+            "exhausted_total": self.exhausted_total,
+            "budget": self.budget.get_stats()
+        }
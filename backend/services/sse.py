@@ -0,0 +1,81 @@
+"""
+Incremental Server-Sent Events framing.
+
+Backends are free to coalesce several SSE events into one TCP read or to
+split a single event across reads. SSEFramer keeps a byte buffer across
+chunks and only emits an event once its terminating blank line has arrived.
+"""
+
+from typing import List, Optional
+
+
+class SSEFramer:
+    """Incremental parser that turns raw SSE bytes into complete event payloads."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._trailing_cr = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Add a chunk of the stream and return the data of every completed event."""
+        if not self._buffer and chunk.endswith(b"\n\n") and chunk.startswith(b"data:"):
+            # Fast path for the common case of exactly one single-line event per chunk
+            if chunk.find(b"\n") == len(chunk) - 2 and not self._trailing_cr and b"\r" not in chunk:
+                return [chunk[6:-2] if chunk[5:6] == b" " else chunk[5:-2]]
+
+        if self._trailing_cr or b"\r" in chunk:
+            chunk = self._normalize_newlines(chunk)
+        self._buffer += chunk
+
+        events = []
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n\n", max(start, self._scan_from))
+            if end == -1:
+                break
+            data = self._parse_event(bytes(self._buffer[start:end]))
+            if data is not None:
+                events.append(data)
+            start = end + 2
+            self._scan_from = start
+
+        if start:
+            del self._buffer[:start]
+        # Only the last byte can begin a boundary that completes in the next chunk
+        self._scan_from = max(0, len(self._buffer) - 1)
+        return events
+
+    def flush(self) -> List[bytes]:
+        """Return the data of a final event that was not terminated by a blank line."""
+        remaining = bytes(self._buffer)
+        self._buffer.clear()
+        self._scan_from = 0
+        self._trailing_cr = False
+        if not remaining.strip():
+            return []
+        data = self._parse_event(remaining.rstrip(b"\n"))
+        return [data] if data is not None else []
+
+    def _normalize_newlines(self, chunk: bytes) -> bytes:
+        """Convert CRLF and CR line endings to LF, including CRLF pairs split across chunks."""
+        if self._trailing_cr and chunk.startswith(b"\n"):
+            chunk = chunk[1:]
+        self._trailing_cr = chunk.endswith(b"\r")
+        return chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+    @staticmethod
+    def _parse_event(block: bytes) -> Optional[bytes]:
+        """Extract the (possibly multi-line) data field of one event block."""
+        data_lines = []
+        for line in block.split(b"\n"):
+            if line.startswith(b"data:"):
+                value = line[5:]
+                if value.startswith(b" "):
+                    value = value[1:]
+                data_lines.append(value)
+            # Comments (":") and event/id/retry fields carry nothing the proxy records
+
+        if not data_lines:
+            return None
+        return b"\n".join(data_lines)
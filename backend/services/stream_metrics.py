@@ -0,0 +1,145 @@
+"""
+Metrics extraction for streamed chat completions.
+
+StreamMetrics is fed the raw upstream bytes, frames them into SSE events
+and records the usage and finish reason carried by those events, as well as
+the inter-token latency (ITL) between chunks that carry generated content.
+The bytes themselves are forwarded to the client untouched by the caller.
+"""
+
+import re
+import json
+import time
+import logging
+from typing import Dict, Any, Optional
+
+from backend.services.sse import SSEFramer
+from backend.utils.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# Only events matching one of these can change the recorded usage or finish
+# reason; every other event (content deltas, "usage": null, "finish_reason":
+# null) is forwarded without being decoded or JSON-parsed.
+USAGE_MARKER = re.compile(rb'"usage"\s*:\s*\{')
+FINISH_REASON_MARKER = re.compile(rb'"finish_reason"\s*:\s*"')
+
+# Events with a non-empty generated string (content, reasoning, tool call arguments)
+CONTENT_MARKER = re.compile(rb'"(?:content|reasoning_content|text|arguments)"\s*:\s*"[^"]')
+# Compact content delta, checked with a literal find before falling back to the regex
+COMPACT_CONTENT = b'content":"'
+
+# Fallback extraction for usage in events that are not valid JSON
+PROMPT_TOKENS_PATTERN = re.compile(rb'"prompt_tokens":(\d+)')
+COMPLETION_TOKENS_PATTERN = re.compile(rb'"completion_tokens":(\d+)')
+TOTAL_TOKENS_PATTERN = re.compile(rb'"total_tokens":(\d+)')
+
+
+class StreamMetrics:
+    """Accumulates usage and finish reason across the events of one stream."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.framer = SSEFramer()
+        self.final_usage: Optional[Dict[str, Any]] = None
+        self.finish_reason = "stream_complete"
+        self.event_count = 0
+        self.parsed_count = 0
+        # Events carrying generated content, about one per token
+        self.content_count = 0
+        self.done = False
+        # Gaps between content-bearing chunks, without keeping every timestamp
+        self.itl = LatencySketch()
+        self._last_content_time: Optional[float] = None
+
+    def feed(self, chunk: bytes, now: Optional[float] = None) -> None:
+        """Process a raw chunk from the upstream response, received at monotonic time now."""
+        has_content = False
+        for data in self.framer.feed(chunk):
+            if self._carries_content(data):
+                has_content = True
+                self.content_count += 1
+            self.observe_event(data)
+
+        if has_content:
+            now = time.monotonic() if now is None else now
+            if self._last_content_time is not None:
+                self.itl.add((now - self._last_content_time) * 1000)
+            self._last_content_time = now
+
+    @staticmethod
+    def _carries_content(data: bytes) -> bool:
+        """Whether an event carries a non-empty generated string."""
+        key = data.find(COMPACT_CONTENT)
+        if key != -1 and data[key + 10:key + 11] != b'"':
+            return True
+        return CONTENT_MARKER.search(data) is not None
+
+    def itl_stats(self) -> Dict[str, Optional[float]]:
+        """Per-request inter-token latency statistics in milliseconds (None without two content chunks)."""
+        itl = self.itl
+        return {
+            "itl_mean_ms": itl.mean,
+            "itl_p50_ms": itl.quantile(0.5),
+            "itl_p95_ms": itl.quantile(0.95),
+            "itl_p99_ms": itl.quantile(0.99),
+            "itl_max_ms": itl.max,
+        }
+
+    def finish(self) -> None:
+        """Process any final event left in the buffer when the stream ends."""
+        for data in self.framer.flush():
+            self.observe_event(data)
+
+    def observe_event(self, data: bytes) -> None:
+        """Inspect the data payload of one complete SSE event."""
+        self.event_count += 1
+        request_id = self.request_id
+
+        # Cheap byte scan first: most events are content deltas we never need to parse
+        if not (USAGE_MARKER.search(data) or FINISH_REASON_MARKER.search(data)):
+            if data.startswith(b"[DONE]") and data.strip() == b"[DONE]":
+                self.done = True
+                logger.debug("[%s] Stream ended with [DONE] marker", request_id)
+            return
+
+        self.parsed_count += 1
+        try:
+            chunk_data = json.loads(data)
+
+            # Check if this chunk contains usage info
+            if 'usage' in chunk_data and chunk_data['usage']:
+                usage = chunk_data['usage']
+                if usage.get('prompt_tokens') or usage.get('completion_tokens') or usage.get('total_tokens'):
+                    self.final_usage = usage
+                    logger.debug("[%s] Captured usage from stream: %s", request_id, usage)
+                else:
+                    logger.debug("[%s] Usage found but no token data: %s", request_id, usage)
+
+            # Check for finish reason
+            if 'choices' in chunk_data and chunk_data['choices']:
+                choice = chunk_data['choices'][0]
+                if 'finish_reason' in choice and choice['finish_reason']:
+                    self.finish_reason = choice['finish_reason']
+                    logger.debug("[%s] Captured finish reason: %s", request_id, self.finish_reason)
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            # Not a JSON event or missing expected fields
+            logger.debug("[%s] JSON parse error for event: %r... Error: %s", request_id, data[:200], e)
+            self._extract_usage_fallback(data)
+
+    def _extract_usage_fallback(self, data: bytes) -> None:
+        """Try to extract usage from a malformed JSON event."""
+        if b'usage' not in data or (b'prompt_tokens' not in data and b'completion_tokens' not in data):
+            return
+
+        prompt_match = PROMPT_TOKENS_PATTERN.search(data)
+        completion_match = COMPLETION_TOKENS_PATTERN.search(data)
+        total_match = TOTAL_TOKENS_PATTERN.search(data)
+
+        if prompt_match and completion_match and total_match:
+            self.final_usage = {
+                'prompt_tokens': int(prompt_match.group(1)),
+                'completion_tokens': int(completion_match.group(1)),
+                'total_tokens': int(total_match.group(1))
+            }
+            logger.debug("[%s] Extracted usage from malformed JSON: %s", self.request_id, self.final_usage)
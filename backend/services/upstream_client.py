@@ -0,0 +1,174 @@
+"""
+Shared upstream HTTP clients for the LLM Metrics Proxy.
+
+One long-lived httpx.AsyncClient is kept per backend so that TCP/TLS
+connections are reused across requests instead of being re-established
+for every completion.
+"""
+
+import logging
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+import httpx
+
+from backend.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClientPool:
+    """Owns one pooled httpx.AsyncClient per backend base URL."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 300.0,
+        connect_timeout: float = 10.0
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+        # Utilisation counters, used to size the pool
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @classmethod
+    def from_config(cls) -> "UpstreamClientPool":
+        """Build a client pool from the application configuration."""
+        return cls(
+            max_connections=Config.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.UPSTREAM_KEEPALIVE_EXPIRY,
+            http2=Config.UPSTREAM_HTTP2,
+            timeout=Config.UPSTREAM_TIMEOUT,
+            connect_timeout=Config.UPSTREAM_CONNECT_TIMEOUT
+        )
+
+    def _create_client(self, base_url: str) -> httpx.AsyncClient:
+        """Create a pooled client for a single backend."""
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        logger.info(f"Creating upstream client for {base_url} (max_connections={self.max_connections}, "
+                    f"keepalive={self.max_keepalive_connections}, http2={http2})")
+        return httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            http2=http2,
+            # A backend that is down fails at the connect timeout instead of the (generation length) read timeout
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        )
+
+    async def start(self, base_urls) -> None:
+        """Create clients for the given backends up front (called on app startup)."""
+        for base_url in base_urls:
+            self.get_client(base_url)
+
+    async def close(self) -> None:
+        """Close all clients and their pooled connections (called on app shutdown)."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close upstream client: {e}")
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """Return the long-lived client for a backend, creating it if needed."""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = self._create_client(base_url)
+            self._clients[base_url] = client
+        return client
+
+    def _begin(self) -> None:
+        self.requests_total += 1
+        self.in_flight += 1
+        if self.in_flight > self.peak_in_flight:
+            self.peak_in_flight = self.in_flight
+
+    @asynccontextmanager
+    async def stream(
+        self, base_url: str, method: str, path: str, **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        """Open a streamed request to a backend; the connection is returned to the pool on exit."""
+        client = self.get_client(base_url)
+        self._begin()
+        try:
+            async with client.stream(method, path, **kwargs) as response:
+                yield response
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def request(self, base_url: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request to a backend and read the full response."""
+        client = self.get_client(base_url)
+        self._begin()
+        try:
+            return await client.request(method, path, **kwargs)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool utilisation counters for every backend client."""
+        backends = {}
+        for base_url, client in self._clients.items():
+            backends[base_url] = self._connection_stats(client)
+
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "http2": self.http2,
+            "timeout": self.timeout,
+            "connect_timeout": self.connect_timeout,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "backends": backends
+        }
+
+    @staticmethod
+    def _connection_stats(client: httpx.AsyncClient) -> Dict[str, Optional[int]]:
+        """Inspect the underlying connection pool of a client."""
+        stats: Dict[str, Optional[int]] = {"connections": None, "idle": None, "active": None}
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return stats
+
+        idle = sum(1 for conn in connections if conn.is_idle())
+        stats["connections"] = len(connections)
+        stats["idle"] = idle
+        stats["active"] = len(connections) - idle
+        return stats
+
+
+# Global client pool instance
+upstream_clients = UpstreamClientPool.from_config()
@@ -0,0 +1,142 @@
+"""
+Tests for backend selection and health checking.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.backend_pool import BackendPool
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestBackendPool(unittest.TestCase):
+    """Test cases for BackendPool selection and passive health."""
+
+    def test_least_outstanding(self):
+        """The replica with the fewest in-flight requests is chosen."""
+        pool = BackendPool(["http://a", "http://b", "http://c"])
+        a, b, c = pool.backends
+        pool.begin(a)
+        pool.begin(a)
+        pool.begin(c)
+
+        self.assertIs(pool.select(), b)
+
+    def test_ties_rotate(self):
+        """Idle replicas share sequential traffic instead of the first taking it all."""
+        pool = BackendPool(["http://a", "http://b"])
+        chosen = {pool.select().url for _ in range(4)}
+        self.assertEqual(chosen, {"http://a", "http://b"})
+
+    def test_ewma_ttft(self):
+        """The replica with the lower smoothed TTFT wins, weighted by its load."""
+        pool = BackendPool(["http://a", "http://b"], strategy="ewma_ttft", ewma_alpha=0.5)
+        a, b = pool.backends
+        pool.record_success(a, ttft_ms=100)
+        pool.record_success(a, ttft_ms=200)
+        pool.record_success(b, ttft_ms=300)
+        self.assertEqual(a.ewma_ttft_ms, 150)
+
+        self.assertIs(pool.select(), a)
+        pool.begin(a)
+        pool.begin(a)
+        # 150 * 3 in flight now scores worse than 300 * 1
+        self.assertIs(pool.select(), b)
+
+    def test_unknown_strategy(self):
+        """Unknown routing strategies are rejected."""
+        with self.assertRaises(ValueError):
+            BackendPool(["http://a"], strategy="random")
+
+    def test_passive_ejection_and_recovery(self):
+        """Repeated failures take a replica out of rotation until its ejection expires."""
+        pool = BackendPool(["http://a", "http://b"], failure_threshold=2, eject_seconds=30)
+        a, b = pool.backends
+        pool.record_failure(a)
+        self.assertTrue(a.healthy)
+        pool.record_failure(a)
+        self.assertFalse(a.healthy)
+
+        self.assertEqual({pool.select().url for _ in range(4)}, {"http://b"})
+
+        # Once the ejection expires the replica gets another try
+        a.ejected_at = time.monotonic() - 31
+        self.assertIn("http://a", {pool.select().url for _ in range(4)})
+        pool.record_success(a)
+        self.assertTrue(a.healthy)
+        self.assertEqual(a.consecutive_failures, 0)
+
+    def test_all_unhealthy_still_routes(self):
+        """When every replica is ejected, traffic is still sent somewhere."""
+        pool = BackendPool(["http://a", "http://b"], failure_threshold=1)
+        for backend in pool.backends:
+            pool.record_failure(backend)
+
+        self.assertIn(pool.select(), pool.backends)
+
+
+class TestBackendRouting(unittest.IsolatedAsyncioTestCase):
+    """Test active health checks and routing through ProxyService."""
+
+    async def asyncSetUp(self):
+        """Serve two mock replicas, the second of which can be made to fail."""
+        self.failing = set()
+        self.upstream = UpstreamClientPool()
+        for url in ("http://a", "http://b"):
+            def handler(request: httpx.Request, url=url) -> httpx.Response:
+                if url in self.failing:
+                    return httpx.Response(503)
+                return httpx.Response(200, json={
+                    "choices": [{"finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                })
+            self.upstream._clients[url] = httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler))
+
+        self.pool = BackendPool(["http://a", "http://b"], failure_threshold=1)
+        self.proxy = ProxyService(self.pool, self.upstream)
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self):
+        return {
+            "model": "m", "origin": None, "is_streaming": False, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    async def test_active_health_check(self):
+        """A failed probe ejects a replica and a passing probe brings it back."""
+        self.failing.add("http://b")
+        await self.pool.check_health(self.upstream)
+        self.assertFalse(self.pool.backends[1].healthy)
+        self.assertTrue(self.pool.backends[0].healthy)
+
+        self.failing.clear()
+        await self.pool.check_health(self.upstream)
+        self.assertTrue(self.pool.backends[1].healthy)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_requests_record_backend(self, mock_record):
+        """Requests spread over replicas, record which one served them and avoid failing ones."""
+        served = []
+        for _ in range(2):
+            await self.proxy.handle_non_streaming_response(b"{}", {}, time.time(), self.request_metrics(), "req_1")
+            served.append(mock_record.call_args[0][0].backend)
+        self.assertEqual(set(served), {"http://a", "http://b"})
+
+        self.failing.add("http://b")
+        for _ in range(4):
+            await self.proxy.handle_non_streaming_response(b"{}", {}, time.time(), self.request_metrics(), "req_1")
+        # One 503 ejects b; the rest go to a
+        self.assertEqual(self.pool.backends[1].errors_total, 1)
+        self.assertEqual(self.pool.backends[0].requests_total, 4)
+        self.assertEqual([b.in_flight for b in self.pool.backends], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+Tests for per-backend circuit breakers.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.backend_pool import Backend, BackendPool
+from backend.services.circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(error_rate=0.5, min_requests=10, window=10, open_seconds=30, probes=2, slow_ms=1000)
+
+    def open_breaker(self):
+        for ok in [True, False] * 5:
+            self.breaker.record(ok)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def elapse_open_period(self):
+        self.breaker.changed_at -= 31
+
+    def test_opens_on_error_rate(self):
+        """The circuit opens once min_requests are in the window and enough of them failed."""
+        for _ in range(9):
+            self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allows(time.monotonic()))
+        self.assertEqual(self.breaker.transitions[-1]["reason"], "9/10 requests failed in 10s")
+
+    def test_opens_on_slow_rate(self):
+        """Answers whose first byte took over slow_ms count towards the slow rate."""
+        for ttft in [1500, 200] * 5:
+            self.breaker.record(True, ttft)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_old_outcomes_leave_the_window(self):
+        """Failures older than the window no longer count."""
+        for _ in range(9):
+            self.breaker.record(False)
+        for bucket in self.breaker._buckets:
+            bucket[0] -= 10
+        self.breaker.record(False)
+        self.assertEqual((self.breaker.state, self.breaker.requests), (CLOSED, 1))
+
+    def test_half_open_probes_close(self):
+        """After open_seconds a limited number of probes go through; their success closes the circuit."""
+        self.open_breaker()
+        self.elapse_open_period()
+        now = time.monotonic()
+
+        for _ in range(2):
+            self.assertTrue(self.breaker.allows(now))
+            self.breaker.on_select()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allows(now))
+
+        self.breaker.record(True, 100)
+        self.breaker.record(True, 100)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual([t["to"] for t in self.breaker.transitions], [OPEN, HALF_OPEN, CLOSED])
+
+    def test_failed_probe_reopens(self):
+        """A failed or slow probe opens the circuit for another open_seconds."""
+        self.open_breaker()
+        self.elapse_open_period()
+        self.assertTrue(self.breaker.allows(time.monotonic()))
+        self.breaker.on_select()
+        self.breaker.record(True, 5000)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.opened_total, 2)
+        self.assertGreater(self.breaker.retry_after(time.monotonic()), 29)
+
+    def test_lost_probes_are_replaced(self):
+        """Probes that never report back do not keep the circuit half-open forever."""
+        self.open_breaker()
+        self.elapse_open_period()
+        for _ in range(2):
+            self.breaker.allows(time.monotonic())
+            self.breaker.on_select()
+        self.assertFalse(self.breaker.allows(time.monotonic()))
+        self.elapse_open_period()
+        self.assertTrue(self.breaker.allows(time.monotonic()))
+
+
+class TestBackendPoolCircuits(unittest.TestCase):
+    """Test routing around open circuits."""
+
+    def setUp(self):
+        self.pool = BackendPool([Backend(url, CircuitBreaker(min_requests=2)) for url in ("http://a", "http://b")])
+        self.a, self.b = self.pool.backends
+
+    def test_open_circuit_is_routed_around(self):
+        """Requests go to the replicas whose circuit is closed."""
+        self.pool.record_failure(self.a)
+        self.pool.record_failure(self.a)
+        self.assertEqual(self.a.breaker.state, OPEN)
+        self.assertTrue(all(self.pool.select() is self.b for _ in range(5)))
+        self.assertEqual(self.pool.get_stats()["backends"]["http://a"]["circuit"], OPEN)
+
+    def test_all_open_fails_fast(self):
+        """With every circuit open the pool refuses instead of trying a dead replica."""
+        for backend in self.pool.backends:
+            self.pool.record_failure(backend)
+            self.pool.record_failure(backend)
+        with self.assertRaises(CircuitOpen) as raised:
+            self.pool.select()
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(self.a.breaker.rejected_total, 1)
+
+
+class TestProxyCircuitOpen(unittest.IsolatedAsyncioTestCase):
+    """Test requests to a pool whose circuits are all open."""
+
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            return httpx.Response(500)
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://down"] = httpx.AsyncClient(base_url="http://down", transport=httpx.MockTransport(handler))
+        self.pool = BackendPool([Backend("http://down", CircuitBreaker(min_requests=2, open_seconds=30))])
+        self.proxy = ProxyService(self.pool, self.upstream)
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    def request_metrics(self, stream: bool):
+        return {
+            "model": "m", "origin": None, "is_streaming": stream, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_fails_fast_once_open(self, mock_record):
+        """Server errors open the circuit; later requests get a 503 without reaching the backend."""
+        for _ in range(2):
+            await self.proxy.handle_non_streaming_response(b'{}', {}, time.time(), self.request_metrics(False), "req_1")
+        self.assertEqual(self.calls, 2)
+
+        response = await self.proxy.handle_non_streaming_response(b'{}', {}, time.time(), self.request_metrics(False), "req_1")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "30")
+
+        response = await self.proxy.handle_streaming_response(b'{}', {}, time.time(), self.request_metrics(True), "req_1")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(mock_record.call_args[0][0].error_type, "circuit_open")
+
+
+class TestProxyStreamFailure(unittest.IsolatedAsyncioTestCase):
+    """Test a stream that fails before its first chunk while breakers hold the response."""
+
+    async def asyncSetUp(self):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused")
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://down"] = httpx.AsyncClient(base_url="http://down", transport=httpx.MockTransport(handler))
+        self.pool = BackendPool([Backend("http://down", CircuitBreaker(min_requests=20))])
+        self.proxy = ProxyService(self.pool, self.upstream)
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_failure_recorded_once(self, mock_record):
+        """A connection error before the first byte gives a 500 and a single streaming_error row."""
+        request_metrics = {
+            "model": "m", "origin": None, "is_streaming": True, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+        response = await self.proxy.handle_streaming_response(b'{}', {}, time.time(), request_metrics, "req_1")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mock_record.call_count, 1)
+        self.assertEqual(mock_record.call_args[0][0].error_type, "streaming_error")
+
+
+if __name__ == '__main__':
+    unittest.main()
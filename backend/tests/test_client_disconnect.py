@@ -0,0 +1,109 @@
+"""
+Tests for cancelling upstream streams when clients disconnect.
+"""
+
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.request_coalescer import RequestCoalescer
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestClientDisconnect(unittest.IsolatedAsyncioTestCase):
+    """Test that abandoned streams are closed upstream and recorded as client_cancelled."""
+
+    async def asyncSetUp(self):
+        """Stream a long generation from a mock backend that notes when it is stopped."""
+        self.calls = 0
+        self.sent = 0
+        self.upstream_closed = asyncio.Event()
+
+        async def body():
+            try:
+                for _ in range(1000):
+                    self.sent += 1
+                    yield b'data: {"choices":[{"delta":{"content":"tok"},"finish_reason":null}]}\n\n'
+                    await asyncio.sleep(0.005)
+                yield b'data: [DONE]\n\n'
+            finally:
+                self.upstream_closed.set()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            return httpx.Response(200, content=body())
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self):
+        return {
+            "model": "m", "origin": None, "is_streaming": True, "max_tokens": None,
+            "temperature": 0, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    async def serve(self, response, chunks: int):
+        """Run the response as an ASGI app for a client that disconnects after some chunks."""
+        received = 0
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal received
+            if message["type"] == "http.response.body" and message.get("body"):
+                received += 1
+                if received == chunks:
+                    disconnected.set()
+
+        await response({"type": "http"}, receive, send)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_disconnect_closes_upstream(self, mock_record):
+        """A client leaving mid-stream closes the upstream stream and records the tokens so far."""
+        proxy = ProxyService("http://backend", self.upstream)
+        response = await proxy.handle_streaming_response(b'{"stream": true}', {}, time.time(), self.request_metrics(), "req_1")
+
+        await self.serve(response, chunks=3)
+        await asyncio.wait_for(self.upstream_closed.wait(), 1)
+
+        self.assertLess(self.sent, 10)
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.status_code, recorded.error_type), (499, "client_cancelled"))
+        self.assertGreaterEqual(recorded.completion_tokens, 3)
+        self.assertIsNotNone(recorded.time_to_first_token_ms)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_shared_stream_outlives_one_client(self, mock_record):
+        """A coalesced stream keeps going while a client still reads it and stops when all have left."""
+        proxy = ProxyService("http://backend", self.upstream, coalescer=RequestCoalescer(streams=True))
+        body = b'{"stream": true, "temperature": 0}'
+        first = await proxy.handle_streaming_response(body, {}, time.time(), self.request_metrics(), "req_1")
+        second = await proxy.handle_streaming_response(body, {}, time.time(), self.request_metrics(), "req_2")
+
+        leaving = asyncio.ensure_future(self.serve(first, chunks=2))
+        await self.serve(second, chunks=6)
+        await leaving
+        await asyncio.wait_for(self.upstream_closed.wait(), 1)
+
+        self.assertEqual(self.calls, 1)
+        self.assertGreaterEqual(self.sent, 6)
+        self.assertLess(self.sent, 20)
+        recorded = [call[0][0] for call in mock_record.call_args_list]
+        self.assertEqual([request.error_type for request in recorded], ["client_cancelled"] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Tests for concurrency limits and the admission queue.
+"""
+
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.concurrency_limiter import (
+    ConcurrencyLimiter, ConcurrencyLimits, AdmissionRejected, parse_limit_overrides
+)
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestConcurrencyLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ConcurrencyLimiter."""
+
+    async def test_waiters_admitted_in_order(self):
+        """Requests over the limit wait and are admitted first come, first served."""
+        limiter = ConcurrencyLimiter(limit=1, max_queue=5, max_wait=1)
+        admitted = []
+
+        async def request(name):
+            await limiter.acquire()
+            admitted.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        await asyncio.gather(*(request(name) for name in "abc"))
+
+        self.assertEqual(admitted, ["a", "b", "c"])
+        self.assertEqual((limiter.active, limiter.queued), (0, 0))
+        self.assertEqual(limiter.queued_total, 2)
+
+    async def test_full_queue_rejected(self):
+        """A request finding the queue full is rejected with a 429 straight away."""
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1, max_wait=1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        self.assertEqual((rejected.exception.status_code, rejected.exception.error_type), (429, "queue_full"))
+
+        limiter.release()
+        await waiting
+        self.assertEqual(limiter.active, 1)
+
+    async def test_wait_timeout_rejected(self):
+        """A request waiting longer than max_wait is rejected with a 503 and leaves the queue."""
+        limiter = ConcurrencyLimiter(limit=1, max_queue=5, max_wait=0.01)
+        await limiter.acquire()
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        self.assertEqual((rejected.exception.status_code, rejected.exception.error_type), (503, "queue_timeout"))
+        self.assertEqual(limiter.queued, 0)
+
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    def test_limits_per_scope(self):
+        """Limiters are keyed on backend URL or model, with overrides."""
+        limits = ConcurrencyLimits(2, scope="model", overrides=parse_limit_overrides("big-model=1; tiny=0"))
+        self.assertIs(limits.get("http://a", "m"), limits.get("http://b", "m"))
+        self.assertEqual(limits.get("http://a", "big-model").limit, 1)
+        self.assertIsNone(limits.get("http://a", "tiny"))
+
+        limits = ConcurrencyLimits(2, overrides=parse_limit_overrides("http://a/=4"))
+        self.assertEqual(limits.get("http://a", "m").limit, 4)
+        self.assertIsNot(limits.get("http://a", "m"), limits.get("http://b", "m"))
+
+        with self.assertRaises(ValueError):
+            parse_limit_overrides("no-limit")
+
+
+class TestAdmissionControl(unittest.IsolatedAsyncioTestCase):
+    """Test that ProxyService queues and rejects requests over the limit."""
+
+    async def asyncSetUp(self):
+        """Serve slow completions and streams from a mock backend that tracks its parallelism."""
+        self.active = 0
+        self.peak = 0
+
+        async def body():
+            yield b'data: {"choices":[{"delta":{"content":"Hi"},"finish_reason":"stop"}]}\n\n'
+            self.active -= 1
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(0.02)
+            if b'"stream": true' in request.content:
+                return httpx.Response(200, content=body())
+            self.active -= 1
+            return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}]})
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self, is_streaming: bool):
+        return {
+            "model": "m", "origin": None, "is_streaming": is_streaming, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_requests_queued(self, mock_record):
+        """Requests over the limit wait for a slot and record the time they waited."""
+        proxy = ProxyService("http://backend", self.upstream, limits=ConcurrencyLimits(1, max_wait=5))
+        await asyncio.gather(*(
+            proxy.handle_non_streaming_response(b'{}', {}, time.time(), self.request_metrics(False), "req_1")
+            for _ in range(3)
+        ))
+
+        self.assertEqual(self.peak, 1)
+        recorded = [call[0][0] for call in mock_record.call_args_list]
+        self.assertTrue(all(request.success for request in recorded))
+        queue_times = sorted(request.queue_time_ms for request in recorded)
+        self.assertEqual(queue_times[0], 0)
+        self.assertGreaterEqual(queue_times[2], 30)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_streams_rejected_with_status(self, mock_record):
+        """A stream turned away while queued gets a 503 response instead of a broken stream."""
+        proxy = ProxyService("http://backend", self.upstream, limits=ConcurrencyLimits(1, max_wait=0.005))
+
+        first = await proxy.handle_streaming_response(b'{"stream": true}', {}, time.time(), self.request_metrics(True), "req_1")
+        second = await proxy.handle_streaming_response(b'{"stream": true}', {}, time.time(), self.request_metrics(True), "req_2")
+        self.assertEqual(second.status_code, 503)
+
+        self.assertIn(b"Hi", b"".join([chunk async for chunk in first.body_iterator]))
+        self.assertEqual(proxy.limits.get("http://backend", "m").active, 0)
+        recorded = [call[0][0] for call in mock_record.call_args_list]
+        self.assertEqual(sorted((request.status_code, request.error_type) for request in recorded), [(200, None), (503, "queue_timeout")])
+
+
+if __name__ == '__main__':
+    unittest.main()
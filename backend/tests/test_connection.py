@@ -0,0 +1,92 @@
+"""
+Tests for the per-thread database connections.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from backend.database.connection import get_db_connection, close_all_connections, retry_on_busy
+
+
+class TestDatabaseConnections(unittest.TestCase):
+    """Test cases for get_db_connection and close_all_connections."""
+
+    def setUp(self):
+        """Point the connections at a temporary database."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.patcher = patch('backend.database.connection.get_db_path', return_value=self.temp_db.name)
+        self.patcher.start()
+        with get_db_connection() as conn:
+            conn.execute("CREATE TABLE items (value INTEGER)")
+            conn.commit()
+
+    def tearDown(self):
+        """Close the connections and remove the database."""
+        close_all_connections()
+        self.patcher.stop()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_connection_is_reused_per_thread(self):
+        """A thread gets the same connection every time; other threads get their own."""
+        with get_db_connection() as first, get_db_connection() as second:
+            self.assertIs(first, second)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_db_connection().__enter__()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], first)
+
+    def test_pragmas_are_applied(self):
+        """Connections are opened in WAL mode with the configured settings."""
+        with get_db_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+            self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)
+            self.assertGreater(conn.execute("PRAGMA busy_timeout").fetchone()[0], 0)
+
+    def test_uncommitted_changes_are_rolled_back(self):
+        """A block that does not commit leaves nothing behind, as a closed connection would."""
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+        with get_db_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+
+    def test_close_all_connections_reopens(self):
+        """After close_all_connections the next use opens a fresh connection."""
+        with get_db_connection() as old:
+            pass
+        close_all_connections()
+        with get_db_connection() as new:
+            self.assertIsNot(new, old)
+            self.assertEqual(new.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            old.execute("SELECT 1")
+
+    def test_retry_on_busy(self):
+        """Busy errors are retried; other errors are raised at once."""
+        calls = []
+
+        @retry_on_busy
+        def write(error):
+            calls.append(error)
+            if len(calls) == 1:
+                raise error
+            return len(calls)
+
+        self.assertEqual(write(sqlite3.OperationalError("database is locked")), 2)
+        calls.clear()
+        with self.assertRaises(sqlite3.OperationalError):
+            write(sqlite3.OperationalError("no such table: items"))
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
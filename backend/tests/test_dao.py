@@ -13,7 +13,10 @@ from unittest.mock import patch, MagicMock
 from datetime import datetime
 
 from backend.database.dao import CompletionRequestsDAO
-from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, SCHEMA_VERSION_TABLE
+from backend.database.connection import get_db_connection
+from backend.database.rollups import create_rollup_statements
+from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, SCHEMA_VERSION_TABLE, create_index_statements
+from backend.utils.timestamps import parse_timestamp
 from shared.types import CompletionRequestData, Metrics
 
 class TestCompletionRequestsDAO(unittest.TestCase):
@@ -29,6 +32,8 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         with sqlite3.connect(self.temp_db.name) as conn:
             cursor = conn.cursor()
             cursor.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_rollup_statements():
+                cursor.execute(statement)
             cursor.execute(SCHEMA_VERSION_TABLE)
             conn.commit()
         
@@ -50,7 +55,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
     def test_insert_completion_request(self):
         """Test inserting a completion request."""
         test_data = {
-            'timestamp': '2024-01-15T10:00:00',
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
             'success': True,
             'status_code': 200,
             'response_time_ms': 1500,
@@ -86,17 +91,42 @@ class TestCompletionRequestsDAO(unittest.TestCase):
             row = cursor.fetchone()
             
             self.assertIsNotNone(row)
-            self.assertEqual(row[1], test_data['timestamp'])  # timestamp
             self.assertEqual(row[2], test_data['success'])    # success
             self.assertEqual(row[3], test_data['status_code']) # status_code
             self.assertEqual(row[4], test_data['response_time_ms']) # response_time_ms
             self.assertEqual(row[5], test_data['model'])      # model
+            
+            cursor.execute("SELECT timestamp_ms FROM completion_requests WHERE id = ?", (request_id,))
+            self.assertEqual(cursor.fetchone()[0], 1705312800000)
     
+    def test_insert_completion_requests_batch(self):
+        """Test inserting a batch of completion requests in one transaction."""
+        rows = [
+            {
+                'timestamp_ms': parse_timestamp(f'2024-01-15T10:00:0{i}'),
+                'success': True,
+                'status_code': 200,
+                'response_time_ms': 1000 + i,
+                'model': 'gpt-3.5-turbo',
+                'is_streaming': bool(i % 2)
+            }
+            for i in range(3)
+        ]
+
+        inserted = self.dao.insert_completion_requests(rows)
+
+        self.assertEqual(inserted, 3)
+        self.assertEqual(self.dao.insert_completion_requests([]), 0)
+        with sqlite3.connect(self.temp_db.name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT response_time_ms, origin FROM completion_requests ORDER BY id")
+            self.assertEqual(cursor.fetchall(), [(1000, None), (1001, None), (1002, None)])
+
     def test_get_completion_requests(self):
         """Test retrieving completion requests."""
         # Insert test data
         test_data = {
-            'timestamp': '2024-01-15T10:00:00',
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
             'success': True,
             'status_code': 200,
             'response_time_ms': 1500,
@@ -128,7 +158,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         request = requests[0]
         
         self.assertIsInstance(request, CompletionRequestData)
-        self.assertEqual(request.timestamp, test_data['timestamp'])
+        self.assertEqual(request.timestamp, '2024-01-15T10:00:00.000')
         self.assertEqual(request.success, test_data['success'])
         self.assertEqual(request.model, test_data['model'])
         self.assertEqual(request.tokens['total'], test_data['total_tokens'])
@@ -138,7 +168,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         # Insert multiple test records
         test_records = [
             {
-                'timestamp': '2024-01-15T10:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 1000,
@@ -160,7 +190,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
                 'error_message': None
             },
             {
-                'timestamp': '2024-01-15T11:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T11:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 2000,
@@ -191,28 +221,38 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         
         # Verify metrics
         self.assertIsInstance(metrics, Metrics)
-        self.assertEqual(metrics.total_requests, 2)
-        self.assertEqual(metrics.successful_requests, 2)
-        self.assertEqual(metrics.failed_requests, 0)
-        self.assertEqual(metrics.success_rate, 1.0)
-        self.assertEqual(metrics.avg_response_time_ms, 1500)  # (1000 + 2000) / 2
-        self.assertEqual(metrics.streaming_requests, 1)
-        self.assertEqual(metrics.non_streaming_requests, 1)
-        
-        # Check model distribution
-        self.assertEqual(metrics.model_distribution['gpt-3.5-turbo'], 1)
-        self.assertEqual(metrics.model_distribution['gpt-4'], 1)
-        
-        # Check finish reasons
-        self.assertEqual(metrics.finish_reasons['stop'], 1)
-        self.assertEqual(metrics.finish_reasons['length'], 1)
+        total = metrics.requests.total
+        self.assertEqual((total.total, total.successful, total.failed), (2, 2, 0))
+        self.assertEqual(total.avg_response_time_ms, 1500)  # (1000 + 2000) / 2
+        
+        streamed = metrics.requests.streamed
+        self.assertEqual((streamed.total, streamed.successful, streamed.failed), (1, 1, 0))
+        self.assertEqual(streamed.avg_response_time_ms, 1000)
+        self.assertEqual(streamed.avg_time_to_first_token_ms, 200)
+        self.assertEqual(streamed.avg_completion_duration_ms, 800)
+        self.assertEqual((streamed.tokens.total, streamed.tokens.prompt_total, streamed.tokens.completion_total), (80, 50, 30))
+        self.assertEqual(streamed.tokens.avg_tokens_per_second, 20.0)
+        
+        non_streamed = metrics.requests.non_streamed
+        self.assertEqual((non_streamed.total, non_streamed.tokens.total), (1, 180))
+        self.assertIsNone(non_streamed.avg_time_to_first_token_ms)
+        self.assertEqual(non_streamed.error_types, {})
+        
+        # Check model and origin distributions
+        self.assertEqual(metrics.model_distribution, {'gpt-3.5-turbo': 1, 'gpt-4': 1})
+        self.assertEqual(metrics.origin_distribution, {'test1': 1, 'test2': 1})
+        
+        # Only the first request is in a range ending before the second
+        metrics = self.dao.get_metrics(end_ms=parse_timestamp('2024-01-15T10:30:00'))
+        self.assertEqual(metrics.requests.total.total, 1)
+        self.assertEqual(metrics.model_distribution, {'gpt-3.5-turbo': 1})
     
     def test_get_completion_requests_with_date_filtering(self):
         """Test date filtering in completion requests."""
         # Insert test data with different timestamps
         test_records = [
             {
-                'timestamp': '2024-01-15T10:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 1000,
@@ -234,7 +274,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
                 'error_message': None
             },
             {
-                'timestamp': '2024-01-16T10:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-16T10:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 2000,
@@ -261,19 +301,19 @@ class TestCompletionRequestsDAO(unittest.TestCase):
             self.dao.insert_completion_request(record)
         
         # Test start date filtering
-        requests = self.dao.get_completion_requests(start_date='2024-01-16T00:00:00')
+        requests = self.dao.get_completion_requests(start_ms=parse_timestamp('2024-01-16T00:00:00'))
         self.assertEqual(len(requests), 1)
         self.assertEqual(requests[0].model, 'gpt-4')
         
         # Test end date filtering
-        requests = self.dao.get_completion_requests(end_date='2024-01-15T23:59:59')
+        requests = self.dao.get_completion_requests(end_ms=parse_timestamp('2024-01-15T23:59:59'))
         self.assertEqual(len(requests), 1)
         self.assertEqual(requests[0].model, 'gpt-3.5-turbo')
         
         # Test date range filtering
         requests = self.dao.get_completion_requests(
-            start_date='2024-01-15T09:00:00',
-            end_date='2024-01-15T11:00:00'
+            start_ms=parse_timestamp('2024-01-15T09:00:00'),
+            end_ms=parse_timestamp('2024-01-15T11:00:00')
         )
         self.assertEqual(len(requests), 1)
         self.assertEqual(requests[0].model, 'gpt-3.5-turbo')
@@ -282,7 +322,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         """Test data integrity validation."""
         # Insert valid data
         test_data = {
-            'timestamp': '2024-01-15T10:00:00',
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
             'success': True,
             'status_code': 200,
             'response_time_ms': 1000,
@@ -337,7 +377,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         
         # Insert a record
         test_data = {
-            'timestamp': '2024-01-15T10:00:00',
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
             'success': True,
             'status_code': 200,
             'response_time_ms': 1000,
@@ -365,12 +405,98 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         count = self.dao.get_row_count()
         self.assertEqual(count, 1)
     
+    def test_get_metrics_inter_token_latency(self):
+        """Test that streamed requests report inter-token latency statistics."""
+        base_record = {
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
+            'success': True,
+            'status_code': 200,
+            'response_time_ms': 1000,
+            'model': 'gpt-4',
+            'is_streaming': True
+        }
+        self.dao.insert_completion_request({
+            **base_record, 'itl_mean_ms': 20.0, 'itl_p50_ms': 18.0, 'itl_p95_ms': 40.0,
+            'itl_p99_ms': 60.0, 'itl_max_ms': 80.0
+        })
+        self.dao.insert_completion_request({
+            **base_record, 'itl_mean_ms': 30.0, 'itl_p50_ms': 22.0, 'itl_p95_ms': 60.0,
+            'itl_p99_ms': 100.0, 'itl_max_ms': 250.0
+        })
+        # Streamed request without ITL (single chunk) and a non-streamed request
+        self.dao.insert_completion_request(base_record)
+        self.dao.insert_completion_request({**base_record, 'is_streaming': False})
+        
+        itl = self.dao.get_metrics().requests.streamed.inter_token_latency
+        
+        self.assertEqual(itl.reported_count, 2)
+        self.assertEqual(itl.avg_mean_ms, 25.0)
+        self.assertEqual(itl.avg_p50_ms, 20.0)
+        self.assertEqual(itl.avg_p95_ms, 50.0)
+        self.assertEqual(itl.avg_p99_ms, 80.0)
+        self.assertEqual(itl.max_ms, 250.0)
+    
+    def test_get_metrics_backend_distribution(self):
+        """Test that latency is broken down per backend replica."""
+        base_record = {
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
+            'success': True,
+            'status_code': 200,
+            'model': 'gpt-4',
+            'is_streaming': True
+        }
+        self.dao.insert_completion_request({
+            **base_record, 'backend': 'http://a:11434', 'response_time_ms': 1000,
+            'time_to_first_token_ms': 100, 'itl_p95_ms': 30.0
+        })
+        self.dao.insert_completion_request({
+            **base_record, 'backend': 'http://a:11434', 'response_time_ms': 2000,
+            'time_to_first_token_ms': 300, 'itl_p95_ms': 50.0
+        })
+        self.dao.insert_completion_request({
+            **base_record, 'backend': 'http://b:11434', 'response_time_ms': 500,
+            'success': False, 'status_code': 502
+        })
+        # Requests recorded before replicas were tracked are left out
+        self.dao.insert_completion_request({**base_record, 'response_time_ms': 700})
+        
+        backends = self.dao.get_metrics().backend_distribution
+        
+        self.assertEqual(list(backends), ['http://a:11434', 'http://b:11434'])
+        self.assertEqual(backends['http://a:11434'].total, 2)
+        self.assertEqual(backends['http://a:11434'].avg_response_time_ms, 1500)
+        self.assertEqual(backends['http://a:11434'].avg_time_to_first_token_ms, 200)
+        self.assertEqual(backends['http://a:11434'].avg_itl_p95_ms, 40.0)
+        self.assertEqual(backends['http://b:11434'].failed, 1)
+        self.assertIsNone(backends['http://b:11434'].avg_time_to_first_token_ms)
+    
+    def test_get_metrics_response_cache(self):
+        """Test that cache hits report their ratio and the backend time they saved."""
+        base_record = {
+            'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
+            'success': True,
+            'status_code': 200,
+            'model': 'gpt-4',
+            'is_streaming': False
+        }
+        self.dao.insert_completion_request({**base_record, 'response_time_ms': 2000})
+        self.dao.insert_completion_request({**base_record, 'response_time_ms': 4, 'cache_hit': True, 'cache_saved_ms': 2000})
+        self.dao.insert_completion_request({**base_record, 'response_time_ms': 6, 'cache_hit': True, 'cache_saved_ms': 1500})
+        self.dao.insert_completion_request({**base_record, 'response_time_ms': 1800})
+        
+        cache = self.dao.get_metrics().response_cache
+        
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.hit_ratio, 0.5)
+        self.assertEqual(cache.saved_time_ms, 3500)
+        self.assertEqual(cache.avg_hit_response_time_ms, 5)
+    
     def test_get_metrics_with_origin_distribution(self):
         """Test that origin distribution is properly populated in metrics."""
         # Insert test data with different origins
         test_records = [
             {
-                'timestamp': '2024-01-15T10:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T10:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 1000,
@@ -392,7 +518,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
                 'error_message': None
             },
             {
-                'timestamp': '2024-01-15T10:30:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T10:30:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 1200,
@@ -414,7 +540,7 @@ class TestCompletionRequestsDAO(unittest.TestCase):
                 'error_message': None
             },
             {
-                'timestamp': '2024-01-15T11:00:00',
+                'timestamp_ms': parse_timestamp('2024-01-15T11:00:00'),
                 'success': True,
                 'status_code': 200,
                 'response_time_ms': 800,
@@ -462,5 +588,86 @@ class TestCompletionRequestsDAO(unittest.TestCase):
         self.assertEqual(origin_items[0][0], 'https://example.com')  # 2 requests
         self.assertEqual(origin_items[1][0], 'https://app.mycompany.com')  # 1 request
 
+
+class TestQueryPlans(unittest.TestCase):
+    """Index use of the DAO queries, so a query change cannot silently fall back to table scans."""
+    
+    def setUp(self):
+        """Set up an indexed test database with a few rows."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_index_statements() + create_rollup_statements():
+                conn.execute(statement)
+        
+        self.patcher = patch('backend.database.connection.get_db_path', return_value=self.temp_db.name)
+        self.patcher.start()
+        self.dao = CompletionRequestsDAO()
+        self.dao.insert_completion_requests([
+            {'timestamp_ms': parse_timestamp(f'2024-01-15T10:00:0{i}'), 'success': True, 'status_code': 200, 'response_time_ms': 1000,
+             'model': 'llama3', 'origin': 'test', 'is_streaming': i % 2 == 0, 'time_to_first_token_ms': 100}
+            for i in range(4)
+        ])
+    
+    def tearDown(self):
+        """Clean up test database."""
+        self.patcher.stop()
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def query_plans(self, call):
+        """Run a DAO call and return {query: [plan details]} for each SELECT it issued."""
+        queries = []
+        with get_db_connection() as conn:
+            conn.set_trace_callback(queries.append)
+            try:
+                call()
+            finally:
+                conn.set_trace_callback(None)
+            return {
+                " ".join(query.split()): [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+                for query in queries if query.lstrip().upper().startswith("SELECT")
+            }
+    
+    def assert_no_table_scans(self, plans):
+        for query, plan in plans.items():
+            for detail in plan:
+                if detail.startswith("SCAN completion_requests"):
+                    self.assertIn("INDEX", detail, f"Full table scan for: {query}")
+    
+    def test_get_metrics_uses_indexes(self):
+        """Whole buckets are searched in the rollup and sketch tables, the edges in the timestamp index."""
+        plans = self.query_plans(lambda: self.dao.get_metrics(
+            start_ms=parse_timestamp('2024-01-15T10:00:30'), end_ms=parse_timestamp('2024-01-15T13:30:00')
+        ))
+        self.assertEqual(len(plans), 2)
+        self.assert_no_table_scans(plans)
+        raw_search = "SEARCH completion_requests USING INDEX idx_completion_requests_timestamp (timestamp_ms>? AND timestamp_ms<?)"
+        for plan, suffix in zip(plans.values(), ["", "_sketches"]):
+            self.assertEqual([detail for detail in plan if detail.startswith("SEARCH")], [
+                f"SEARCH completion_requests_hourly{suffix} USING PRIMARY KEY (bucket_ms>? AND bucket_ms<?)",
+                f"SEARCH completion_requests_minutely{suffix} USING PRIMARY KEY (bucket_ms>? AND bucket_ms<?)",
+                f"SEARCH completion_requests_minutely{suffix} USING PRIMARY KEY (bucket_ms>? AND bucket_ms<?)",
+                raw_search,
+                raw_search,
+            ])
+        
+        # Without a range every bucket is whole and no raw rows are read
+        plans = self.query_plans(lambda: self.dao.get_metrics())
+        details = " ".join(detail for plan in plans.values() for detail in plan)
+        self.assertIn("SCAN completion_requests_hourly", details)
+        self.assertIn("SCAN completion_requests_hourly_sketches", details)
+        self.assertNotIn("completion_requests ", details)
+    
+    def test_completion_requests_and_first_byte_times_use_indexes(self):
+        """Recent requests are read in timestamp order from the index; first byte times by timestamp range."""
+        plans = self.query_plans(lambda: self.dao.get_completion_requests(start_ms=parse_timestamp('2024-01-15'), limit=10))
+        self.assert_no_table_scans(plans)
+        self.assertNotIn("TEMP B-TREE", " ".join(detail for plan in plans.values() for detail in plan))
+        
+        plans = self.query_plans(lambda: self.dao.get_first_byte_times(parse_timestamp('2024-01-15')))
+        self.assertIn("SEARCH completion_requests USING INDEX idx_completion_requests_timestamp", list(plans.values())[0][0])
+
 if __name__ == '__main__':
     unittest.main()
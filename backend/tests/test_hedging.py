@@ -0,0 +1,229 @@
+"""
+Tests for hedged requests.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.database.dao import completion_requests_dao
+from backend.database.rollups import create_rollup_statements
+from backend.database.schema import COMPLETION_REQUESTS_SCHEMA
+from backend.services.hedging import HedgeDelays, Hedging, race
+from backend.services.proxy_service import ProxyService
+from backend.services.request_budget import RequestBudget
+from backend.services.upstream_client import UpstreamClientPool
+from backend.utils.timestamps import now_ms, parse_timestamp
+
+
+class TestRace(unittest.IsolatedAsyncioTestCase):
+    """Test cases for race."""
+
+    async def attempt(self, result, delay: float, error: Exception = None):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(result)
+            raise
+        if error is not None:
+            raise error
+        return result
+
+    async def run_race(self, primary, hedge, delay=0.02):
+        self.cancelled = []
+        self.discarded = []
+
+        async def discard(result):
+            self.discarded.append(result)
+
+        return await race(primary, delay, lambda: hedge, accept=lambda result: result != "bad", discard=discard)
+
+    async def test_fast_primary_is_not_hedged(self):
+        """A first byte within the delay never starts the hedge."""
+        hedge = self.attempt("hedge", 0)
+        self.assertEqual(await self.run_race(self.attempt("primary", 0), hedge), ("primary", None))
+        hedge.close()
+
+    async def test_hedge_wins_and_primary_is_cancelled(self):
+        """The hedge's answer is used when it comes first, and the stuck primary is cancelled."""
+        result = await self.run_race(self.attempt("primary", 1), self.attempt("hedge", 0))
+        self.assertEqual(result, ("hedge", "won"))
+        self.assertEqual(self.cancelled, ["primary"])
+
+    async def test_failed_hedge_loses(self):
+        """A hedge that fails leaves the primary's answer, however late."""
+        result = await self.run_race(self.attempt("primary", 0.05), self.attempt("hedge", 0, ConnectionError()))
+        self.assertEqual(result, ("primary", "lost"))
+
+    async def test_rejected_answer_waits_for_the_other(self):
+        """A server error from one attempt only wins if the other fails too; the unused answer is discarded."""
+        result = await self.run_race(self.attempt("primary", 0.05), self.attempt("bad", 0))
+        self.assertEqual(result, ("primary", "lost"))
+        self.assertEqual(self.discarded, ["bad"])
+
+        result = await self.run_race(self.attempt("bad", 0.05), self.attempt("hedge", 0, ConnectionError()))
+        self.assertEqual(result, ("bad", "lost"))
+
+    async def test_no_hedge_available(self):
+        """Without a hedge the primary is awaited as usual."""
+        self.assertEqual(await self.run_race(self.attempt("primary", 0.05), None), ("primary", None))
+
+
+class TestRequestBudget(unittest.TestCase):
+    """Test cases for RequestBudget."""
+
+    def test_extra_requests_stay_within_ratio(self):
+        """Over many requests at most ratio of them can spend."""
+        budget = RequestBudget(0.05)
+        spent = 0
+        for _ in range(1000):
+            budget.deposit()
+            spent += budget.try_spend()
+        self.assertEqual(spent, 50)
+        self.assertEqual(budget.denied_total, 950)
+
+    def test_balance_is_capped(self):
+        """Quiet periods cannot save up more than max_balance extra requests."""
+        budget = RequestBudget(1.0, max_balance=3)
+        for _ in range(100):
+            budget.deposit()
+        self.assertEqual(sum(budget.try_spend() for _ in range(10)), 3)
+
+
+class TestHedgeDelays(unittest.TestCase):
+    """Test learning hedge delays from recorded requests."""
+
+    def setUp(self):
+        """Database with a spread of first byte times for one model."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_rollup_statements():
+                conn.execute(statement)
+        self.patcher = patch('backend.database.connection.get_db_path', return_value=self.temp_db.name)
+        self.patcher.start()
+
+        now = now_ms()
+        rows = [
+            {"timestamp_ms": now, "success": True, "status_code": 200, "response_time_ms": 5000, "model": "llama3",
+             "is_streaming": True, "time_to_first_token_ms": ttft, "queue_time_ms": 10}
+            for ttft in range(110, 1110, 10)
+        ]
+        # Not backend first byte times: failures, cache hits and old requests
+        rows.append({**rows[0], "success": False, "time_to_first_token_ms": 60000})
+        rows.append({**rows[0], "cache_hit": True, "time_to_first_token_ms": 1})
+        rows.append({**rows[0], "timestamp_ms": parse_timestamp("2020-01-01T00:00:00"), "time_to_first_token_ms": 60000})
+        completion_requests_dao.insert_completion_requests(rows)
+
+    def tearDown(self):
+        """Clean up the database."""
+        self.patcher.stop()
+        os.unlink(self.temp_db.name)
+
+    def test_p95_per_model(self):
+        """The delay is the percentile of first byte times less queue waits, per model and mode."""
+        delays = HedgeDelays(quantile=0.95, min_samples=20)
+        delays.load()
+
+        self.assertAlmostEqual(delays.delay_ms("llama3", True), 1040, delta=15)
+        self.assertIsNone(delays.delay_ms("llama3", False))
+        self.assertIsNone(delays.delay_ms("other", True))
+
+    def test_min_samples_and_default(self):
+        """Models with too little history use the default delay, if any."""
+        delays = HedgeDelays(min_samples=1000, default_delay_ms=2000)
+        delays.load()
+        self.assertEqual(delays.delay_ms("llama3", True), 2000)
+
+
+class TestHedgedProxy(unittest.IsolatedAsyncioTestCase):
+    """Test hedging through the proxy service."""
+
+    async def asyncSetUp(self):
+        """Two replicas; the first one is stuck for a second before answering."""
+        self.closed = []
+
+        def backend(url: str, stall: float):
+            async def body():
+                try:
+                    await asyncio.sleep(stall)
+                    yield f'data: {{"choices":[{{"delta":{{"content":"{url}"}},"finish_reason":"stop"}}]}}\n\n'.encode()
+                    yield b'data: [DONE]\n\n'
+                finally:
+                    self.closed.append(url)
+
+            async def handler(request: httpx.Request) -> httpx.Response:
+                if b'"stream": true' in await request.aread():
+                    return httpx.Response(200, content=body())
+                await asyncio.sleep(stall)
+                return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}], "backend": url})
+
+            return httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler))
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://stuck"] = backend("http://stuck", 1.0)
+        self.upstream._clients["http://fast"] = backend("http://fast", 0)
+        self.hedging = Hedging(HedgeDelays(default_delay_ms=20), RequestBudget(1.0))
+        self.proxy = ProxyService(["http://stuck", "http://fast"], self.upstream, hedging=self.hedging)
+        # Always route to the stuck replica first
+        self.proxy.router.pools[0].select = lambda exclude=(): self.proxy.router.pools[0].backends[1 if exclude else 0]
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self, stream: bool):
+        return {
+            "model": "m", "origin": None, "is_streaming": stream, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_streaming_hedge_wins(self, mock_record):
+        """The hedge's stream is relayed, the stuck one closed and the win recorded."""
+        started = time.monotonic()
+        response = await self.proxy.handle_streaming_response(
+            b'{"stream": true}', {}, time.time(), self.request_metrics(True), "req_1"
+        )
+        content = b"".join([chunk async for chunk in response.body_iterator])
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertIn(b"http://fast", content)
+        self.assertIn("http://stuck", self.closed)
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.backend, recorded.hedge_outcome), ("http://fast", "won"))
+        self.assertEqual((self.hedging.wins, self.hedging.losses), (1, 0))
+        self.assertEqual([backend.in_flight for backend in self.proxy.router.pools[0].backends], [0, 0])
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_non_streaming_hedge_wins(self, mock_record):
+        """Non-streaming requests are hedged on the whole response."""
+        response = await self.proxy.handle_non_streaming_response(
+            b'{"stream": false}', {}, time.time(), self.request_metrics(False), "req_1"
+        )
+
+        self.assertIn(b"http://fast", response.body)
+        self.assertEqual(mock_record.call_args[0][0].hedge_outcome, "won")
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_budget_exhausted(self, mock_record):
+        """Without budget the request waits for the stuck replica."""
+        self.hedging.budget = RequestBudget(0.0)
+        response = await self.proxy.handle_non_streaming_response(
+            b'{"stream": false}', {}, time.time(), self.request_metrics(False), "req_1"
+        )
+
+        self.assertIn(b"http://stuck", response.body)
+        self.assertIsNone(mock_record.call_args[0][0].hedge_outcome)
+        self.assertEqual(self.hedging.hedged_total, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tests for the mergeable latency sketch.
+"""
+
+import random
+import unittest
+
+from backend.utils.latency_sketch import LatencySketch
+
+
+def exact_quantile(values, q):
+    """Nearest-rank quantile matching the sketch's rank convention."""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class TestLatencySketch(unittest.TestCase):
+    """Test cases for LatencySketch."""
+
+    def setUp(self):
+        """Generate a long-tailed latency sample."""
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(3, 0.8) for _ in range(5000)] + [0.0] * 10
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Quantile estimates are within the configured relative error."""
+        sketch = LatencySketch(relative_accuracy=0.01)
+        for value in self.values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.95, 0.99):
+            expected = exact_quantile(self.values, q)
+            self.assertAlmostEqual(sketch.quantile(q), expected, delta=expected * 0.011)
+        self.assertEqual(sketch.quantile(0.001), 0.0)
+        self.assertEqual(sketch.max, max(self.values))
+        self.assertAlmostEqual(sketch.mean, sum(self.values) / len(self.values))
+
+    def test_merge_equals_single_sketch(self):
+        """Merging sketches gives the same result as one sketch of all values."""
+        combined = LatencySketch()
+        left = LatencySketch()
+        right = LatencySketch()
+        for i, value in enumerate(self.values):
+            combined.add(value)
+            (left if i % 3 else right).add(value)
+
+        left.merge(right)
+        self.assertEqual(left.count, combined.count)
+        self.assertEqual(left.buckets, combined.buckets)
+        self.assertEqual(left.quantile(0.99), combined.quantile(0.99))
+
+    def test_serialization_round_trip(self):
+        """A sketch survives to_dict/from_dict unchanged."""
+        sketch = LatencySketch()
+        for value in self.values[:100]:
+            sketch.add(value)
+
+        restored = LatencySketch.from_dict(sketch.to_dict())
+        self.assertEqual(restored.to_dict(), sketch.to_dict())
+        self.assertEqual(restored.quantile(0.95), sketch.quantile(0.95))
+
+    def test_empty_and_mismatched(self):
+        """Empty sketches have no quantiles; differing accuracies cannot merge."""
+        self.assertIsNone(LatencySketch().quantile(0.5))
+        self.assertIsNone(LatencySketch().mean)
+        with self.assertRaises(ValueError):
+            LatencySketch(0.01).merge(LatencySketch(0.02))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests for queued, structured and sampled logging.
+"""
+
+import io
+import json
+import time
+import queue
+import logging
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.utils.config import Config
+from backend.utils.logging_config import LoggingManager, DroppingQueueHandler, log_event
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestLoggingManager(unittest.TestCase):
+    """Test cases for LoggingManager and its handlers."""
+
+    def setUp(self):
+        """Remember the root logger configuration."""
+        self.root = logging.getLogger()
+        self.saved_handlers = list(self.root.handlers)
+        self.saved_level = self.root.level
+        self.manager = LoggingManager()
+        self.output = io.StringIO()
+
+    def tearDown(self):
+        """Restore the root logger configuration."""
+        self.manager.shutdown()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.saved_handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.saved_level)
+
+    def test_structured_text_record(self):
+        """Structured fields are appended as key=value pairs by the listener."""
+        self.manager.configure("requests", "text", stream=self.output)
+        log_event(logging.getLogger("test"), logging.INFO, "Request completed",
+                  request_id="req_1", status=200, error_type=None)
+        self.manager.shutdown()
+
+        line = self.output.getvalue().strip()
+        self.assertIn("Request completed request_id=req_1 status=200", line)
+        self.assertNotIn("error_type", line)
+
+    def test_structured_json_record(self):
+        """JSON output puts structured fields at the top level."""
+        self.manager.configure("requests", "json", stream=self.output)
+        log_event(logging.getLogger("test"), logging.INFO, "Request completed", request_id="req_1", status=200)
+        self.manager.shutdown()
+
+        entry = json.loads(self.output.getvalue())
+        self.assertEqual(entry["message"], "Request completed")
+        self.assertEqual(entry["request_id"], "req_1")
+        self.assertEqual(entry["status"], 200)
+
+    def test_volume_sets_level(self):
+        """The errors volume filters out INFO records."""
+        self.manager.configure("errors", "text", stream=self.output)
+        logging.getLogger("test").info("hidden")
+        logging.getLogger("test").warning("shown")
+        self.manager.shutdown()
+
+        self.assertNotIn("hidden", self.output.getvalue())
+        self.assertIn("shown", self.output.getvalue())
+
+    def test_unknown_volume(self):
+        """Unknown volumes are rejected."""
+        with self.assertRaises(ValueError):
+            self.manager.configure("loud", "text", stream=self.output)
+
+    def test_full_queue_drops_records(self):
+        """A full queue drops records instead of blocking the caller."""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "message %s", ("arg",), None)
+        handler.handle(record)
+        handler.handle(record)
+
+        self.assertEqual(handler.dropped, 1)
+        # Formatting is left to the listener
+        self.assertEqual(handler.queue.get_nowait().args, ("arg",))
+
+
+class TestStreamLogging(unittest.IsolatedAsyncioTestCase):
+    """Test that streamed requests log per-chunk records only when sampled."""
+
+    async def asyncSetUp(self):
+        """Serve a 10-chunk stream from a mock backend."""
+        chunks = [b'data: {"choices":[{"delta":{"content":"x"},"finish_reason":null}]}\n\n'] * 10
+
+        async def body():
+            for chunk in chunks:
+                yield chunk
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=body())
+
+        self.pool = UpstreamClientPool()
+        self.pool._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+        self.proxy = ProxyService("http://backend", self.pool)
+        self.request_metrics = {
+            "model": "m", "origin": None, "is_streaming": True, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.pool.close()
+
+    async def stream(self):
+        response = await self.proxy.handle_streaming_response(b"{}", {}, time.time(), self.request_metrics, "req_1")
+        async for _ in response.body_iterator:
+            pass
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_chunk_logs_are_sampled(self, mock_record):
+        """At debug, only one in LOG_CHUNK_SAMPLE_RATE chunks is logged."""
+        with patch.object(Config, "LOG_CHUNK_SAMPLE_RATE", 5):
+            with self.assertLogs("backend.services.proxy_service", level=logging.DEBUG) as logs:
+                await self.stream()
+
+        chunk_logs = [line for line in logs.output if "Chunk " in line]
+        self.assertEqual(len(chunk_logs), 2)
+        mock_record.assert_called_once()
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_one_info_record_per_request(self, mock_record):
+        """At INFO a streamed request produces a single structured summary record."""
+        with self.assertLogs("backend.services", level=logging.INFO) as logs:
+            await self.stream()
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].fields["request_id"], "req_1")
+        self.assertEqual(logs.records[0].fields["status"], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
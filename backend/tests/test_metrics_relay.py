@@ -0,0 +1,94 @@
+"""
+Tests for relaying metrics records to the writer process.
+"""
+
+import os
+import asyncio
+import tempfile
+import unittest
+
+from backend.database.dao import CompletionRequestsDAO
+from backend.services.metrics_relay import MetricsRelayClient, MetricsRelayServer
+from backend.services.metrics_writer import MetricsWriter
+
+
+class TestMetricsRelay(unittest.IsolatedAsyncioTestCase):
+    """Test cases for MetricsRelayClient and MetricsRelayServer."""
+
+    async def asyncSetUp(self):
+        """Serve a relay whose writer collects the rows it would insert."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "writer.sock")
+        self.written = []
+        self.writer = MetricsWriter(sink=self.written.extend, batch_size=10, flush_interval=0.01)
+        self.writer.start()
+        self.server = MetricsRelayServer(self.socket_path, self.writer)
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        """Stop the relay and its writer."""
+        await self.server.stop()
+        await self.writer.stop()
+        self.directory.cleanup()
+
+    def record(self, i: int):
+        return {"timestamp": f"2026-01-01T00:00:{i:02d}", "success": True, "status_code": 200,
+                "response_time_ms": i, "model": "m"}
+
+    async def written_rows(self, count: int):
+        for _ in range(100):
+            if len(self.written) >= count:
+                break
+            await asyncio.sleep(0.01)
+        return self.written
+
+    async def test_batches_reach_writer(self):
+        """Records arrive as rows of values in INSERT_FIELDS order."""
+        client = MetricsRelayClient(self.socket_path)
+        await asyncio.to_thread(client.send_batch, [self.record(i) for i in range(25)])
+        client.close()
+
+        rows = await self.written_rows(25)
+        fields = CompletionRequestsDAO.INSERT_FIELDS
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[3][fields.index("response_time_ms")], 3)
+        self.assertIsNone(rows[3][fields.index("backend")])
+
+    async def test_other_field_order(self):
+        """Rows from a worker with a different field list are reordered."""
+        client = MetricsRelayClient(self.socket_path, fields=["model", "response_time_ms", "unknown"])
+        await asyncio.to_thread(client.send_batch, [{"model": "m", "response_time_ms": 7, "unknown": 1}])
+        client.close()
+
+        rows = await self.written_rows(1)
+        fields = CompletionRequestsDAO.INSERT_FIELDS
+        self.assertEqual((rows[0][fields.index("model")], rows[0][fields.index("response_time_ms")]), ("m", 7))
+
+    async def test_reconnects_after_writer_restart(self):
+        """A client whose connection dropped reconnects on the next batch."""
+        client = MetricsRelayClient(self.socket_path)
+        await asyncio.to_thread(client.send_batch, [self.record(1)])
+        await self.written_rows(1)
+
+        await self.server.stop()
+        await self.server.start()
+        # The first send after the restart may still succeed into the closed socket buffer
+        for i in range(3):
+            try:
+                await asyncio.to_thread(client.send_batch, [self.record(i)])
+            except OSError:
+                pass
+            await asyncio.sleep(0.01)
+        client.close()
+
+        self.assertGreater(len(await self.written_rows(2)), 1)
+
+    async def test_unreachable_writer_raises(self):
+        """Sending without a writer process fails, so the batch is counted as failed."""
+        client = MetricsRelayClient(os.path.join(self.directory.name, "missing.sock"))
+        with self.assertRaises(OSError):
+            client.send_batch([self.record(1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Tests for the write-behind metrics recorder.
+"""
+
+import asyncio
+import unittest
+
+from backend.services.metrics_writer import MetricsWriter
+
+
+class TestMetricsWriter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for MetricsWriter."""
+
+    def setUp(self):
+        """Collect written batches in memory instead of the database."""
+        self.batches = []
+
+    def sink(self, rows):
+        self.batches.append(list(rows))
+
+    async def test_write_inline_when_not_running(self):
+        """Without a background task records are written immediately."""
+        writer = MetricsWriter(sink=self.sink)
+        self.assertTrue(writer.submit({"id": 1}))
+        self.assertEqual(self.batches, [[{"id": 1}]])
+
+    async def test_batches_by_size(self):
+        """A full batch is written without waiting for the flush interval."""
+        writer = MetricsWriter(sink=self.sink, batch_size=3, flush_interval=60)
+        writer.start()
+        for i in range(3):
+            writer.submit({"id": i})
+
+        for _ in range(50):
+            if self.batches:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+        self.assertEqual(self.batches, [[{"id": 0}, {"id": 1}, {"id": 2}]])
+        self.assertEqual(writer.batches_total, 1)
+
+    async def test_flush_on_interval(self):
+        """A partial batch is written once the flush interval elapses."""
+        writer = MetricsWriter(sink=self.sink, batch_size=100, flush_interval=0.01)
+        writer.start()
+        writer.submit({"id": 1})
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(self.batches, [[{"id": 1}]])
+        await writer.stop()
+
+    async def test_flush_on_stop(self):
+        """Queued records are written when the writer stops."""
+        writer = MetricsWriter(sink=self.sink, batch_size=100, flush_interval=60)
+        writer.start()
+        for i in range(5):
+            writer.submit({"id": i})
+        await writer.stop()
+
+        self.assertEqual(sum(len(batch) for batch in self.batches), 5)
+        self.assertEqual(writer.written_total, 5)
+        self.assertEqual(writer.queue_depth, 0)
+        self.assertFalse(writer.is_running)
+
+    async def test_drop_newest_overflow(self):
+        """New records are dropped and counted when the queue is full."""
+        writer = MetricsWriter(sink=self.sink, max_queue_size=2, batch_size=100, flush_interval=60)
+        writer.start()
+        results = [writer.submit({"id": i}) for i in range(4)]
+        await writer.stop()
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(writer.dropped_total, 2)
+        self.assertEqual(self.batches, [[{"id": 0}, {"id": 1}]])
+
+    async def test_drop_oldest_overflow(self):
+        """The oldest queued record is evicted when the queue is full."""
+        writer = MetricsWriter(sink=self.sink, max_queue_size=2, batch_size=100,
+                               flush_interval=60, overflow_policy="drop_oldest")
+        writer.start()
+        for i in range(4):
+            writer.submit({"id": i})
+        await writer.stop()
+
+        self.assertEqual(writer.dropped_total, 2)
+        self.assertEqual(self.batches, [[{"id": 2}, {"id": 3}]])
+
+    async def test_sink_failure_is_counted(self):
+        """A failing sink does not stop the writer."""
+        def failing_sink(rows):
+            raise RuntimeError("database is locked")
+
+        writer = MetricsWriter(sink=failing_sink, batch_size=100, flush_interval=60)
+        writer.start()
+        writer.submit({"id": 1})
+        await writer.stop()
+
+        self.assertEqual(writer.failed_total, 1)
+        self.assertEqual(writer.written_total, 0)
+
+    def test_invalid_overflow_policy(self):
+        """Unknown overflow policies are rejected."""
+        with self.assertRaises(ValueError):
+            MetricsWriter(sink=self.sink, overflow_policy="block")
+
+
+if __name__ == '__main__':
+    unittest.main()
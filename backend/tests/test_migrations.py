@@ -18,10 +18,13 @@ from backend.database.safe_migrations import (
 from backend.database.schema import (
     get_schema_version, set_schema_version, 
     schema_needs_migration, validate_schema,
-    CURRENT_SCHEMA_VERSION
+    CURRENT_SCHEMA_VERSION, COMPLETION_REQUESTS_SCHEMA
 )
 from backend.database.backup import create_file_backup, create_backup_table
 
+# completion_requests as of schema version 11, before the epoch millisecond columns
+SCHEMA_11_TABLE = COMPLETION_REQUESTS_SCHEMA.replace(",\n    timestamp_ms INTEGER,\n    started_at_ms INTEGER", "")
+
 class TestSafeMigrationManager(unittest.TestCase):
     """Test cases for SafeMigrationManager."""
     
@@ -208,6 +211,21 @@ class TestSafeMigrationManager(unittest.TestCase):
                     
                     self.assertFalse(success)
     
+    def test_run_migration_step_defers_validation(self):
+        """Only the last migration validates; earlier ones predate parts of the current schema."""
+        first = MigrationStep(1, "First migration", lambda: None)
+        self.migration_manager.add_migration(first)
+        self.migration_manager.add_migration(MigrationStep(2, "Second migration", lambda: None))
+        
+        with patch('backend.database.safe_migrations.create_backup_table', return_value="test_table_backup"), \
+             patch('backend.database.safe_migrations.set_schema_version', return_value=True), \
+             patch('backend.database.safe_migrations.validate_schema', return_value=(False, ["Missing column"])) as mock_validate_schema:
+            self.assertTrue(self.migration_manager.run_migration_step(first))
+            mock_validate_schema.assert_not_called()
+            
+            self.assertFalse(self.migration_manager.run_migration_step(self.migration_manager.migrations[1]))
+            mock_validate_schema.assert_called_once()
+    
     def test_run_migration_step_exception(self):
         """Test migration step failure due to exception."""
         def test_migration():
@@ -481,6 +499,233 @@ class TestMigrationFunctions(unittest.TestCase):
             cursor.execute("PRAGMA table_info(completion_requests)")
             columns = [col[1] for col in cursor.fetchall()]
             self.assertIn('origin', columns)
+    
+    def test_add_itl_columns(self):
+        """Test adding the inter-token latency columns to an existing table."""
+        from backend.database.safe_migrations import add_itl_columns, ITL_COLUMNS
+        
+        # A version 3 table without the ITL columns
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("""
+                CREATE TABLE completion_requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    success BOOLEAN NOT NULL,
+                    is_streaming BOOLEAN
+                )
+            """)
+            conn.execute("INSERT INTO completion_requests (success, is_streaming) VALUES (1, 1)")
+            conn.commit()
+        
+        # Running twice is harmless
+        add_itl_columns()
+        add_itl_columns()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(completion_requests)")
+            columns = {col[1]: col[2] for col in cursor.fetchall()}
+            for column in ITL_COLUMNS:
+                self.assertEqual(columns[column], 'REAL')
+            
+            cursor.execute("SELECT itl_p95_ms FROM completion_requests")
+            self.assertIsNone(cursor.fetchone()[0])
+    
+    def test_add_backend_column(self):
+        """Test adding the backend column to an existing table."""
+        from backend.database.safe_migrations import add_backend_column
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("""
+                CREATE TABLE completion_requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    success BOOLEAN NOT NULL
+                )
+            """)
+            conn.commit()
+        
+        # Running twice is harmless
+        add_backend_column()
+        add_backend_column()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(completion_requests)")
+            columns = {col[1]: col[2] for col in cursor.fetchall()}
+            self.assertEqual(columns['backend'], 'TEXT')
+    
+    def test_add_cache_columns(self):
+        """Test adding the response cache columns; existing rows are not hits."""
+        from backend.database.safe_migrations import add_cache_columns
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("""
+                CREATE TABLE completion_requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    success BOOLEAN NOT NULL
+                )
+            """)
+            conn.execute("INSERT INTO completion_requests (success) VALUES (1)")
+            conn.commit()
+        
+        add_cache_columns()
+        add_cache_columns()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT cache_hit, cache_saved_ms FROM completion_requests")
+            self.assertEqual(cursor.fetchone(), (0, None))
+    
+    def test_add_coalesced_column(self):
+        """Test adding the coalesced column; existing rows are not coalesced."""
+        from backend.database.safe_migrations import add_coalesced_column
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("CREATE TABLE completion_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, success BOOLEAN NOT NULL)")
+            conn.execute("INSERT INTO completion_requests (success) VALUES (1)")
+            conn.commit()
+        
+        add_coalesced_column()
+        add_coalesced_column()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT coalesced FROM completion_requests").fetchone(), (0,))
+
+    def test_add_queue_time_column(self):
+        """Test adding the queue_time_ms column; existing rows have no queue time."""
+        from backend.database.safe_migrations import add_queue_time_column
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("CREATE TABLE completion_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, success BOOLEAN NOT NULL)")
+            conn.execute("INSERT INTO completion_requests (success) VALUES (1)")
+            conn.commit()
+        
+        add_queue_time_column()
+        add_queue_time_column()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT queue_time_ms FROM completion_requests").fetchone(), (None,))
+    
+    def test_add_hedge_outcome_column(self):
+        """Test adding the hedge_outcome column; existing rows were not hedged."""
+        from backend.database.safe_migrations import add_hedge_outcome_column
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("CREATE TABLE completion_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, success BOOLEAN NOT NULL)")
+            conn.execute("INSERT INTO completion_requests (success) VALUES (1)")
+            conn.commit()
+        
+        add_hedge_outcome_column()
+        add_hedge_outcome_column()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT hedge_outcome FROM completion_requests").fetchone(), (None,))
+    
+    def test_add_retry_count_column(self):
+        """Test adding the retry_count column; existing rows were not retried."""
+        from backend.database.safe_migrations import add_retry_count_column
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("CREATE TABLE completion_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, success BOOLEAN NOT NULL)")
+            conn.execute("INSERT INTO completion_requests (success) VALUES (1)")
+            conn.commit()
+        
+        add_retry_count_column()
+        add_retry_count_column()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT retry_count FROM completion_requests").fetchone(), (None,))
+    
+    def test_add_query_indexes(self):
+        """Test adding the schema version 11 query indexes, on the text timestamp."""
+        from backend.database.safe_migrations import add_query_indexes, SCHEMA_11_INDEXES
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(SCHEMA_11_TABLE)
+            conn.execute("INSERT INTO completion_requests (success, timestamp) VALUES (1, '2024-01-15T10:00:00')")
+            conn.commit()
+        
+        add_query_indexes()
+        add_query_indexes()
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            for name, columns in SCHEMA_11_INDEXES.items():
+                index_columns = tuple(column[2] for column in conn.execute(f"PRAGMA index_info({name})"))
+                self.assertEqual(index_columns, columns)
+    
+    def test_validate_schema_indexes(self):
+        """validate_schema reports missing indexes and indexes over other columns."""
+        from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, COMPLETION_REQUESTS_INDEXES, create_index_statements
+        from backend.database.rollups import create_rollup_statements
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_rollup_statements():
+                conn.execute(statement)
+        
+        is_valid, errors = validate_schema()
+        self.assertFalse(is_valid)
+        self.assertEqual(errors, [f"Missing index {name}" for name in COMPLETION_REQUESTS_INDEXES])
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            for statement in create_index_statements():
+                conn.execute(statement)
+        self.assertEqual(validate_schema(), (True, []))
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute("DROP INDEX idx_completion_requests_model_timestamp")
+            conn.execute("CREATE INDEX idx_completion_requests_model_timestamp ON completion_requests (model)")
+        is_valid, errors = validate_schema()
+        self.assertFalse(is_valid)
+        self.assertIn("idx_completion_requests_model_timestamp", errors[0])
+    
+    def test_convert_timestamps_to_epoch_ms(self):
+        """Test converting ISO timestamps to epoch milliseconds in batches and moving the indexes to them."""
+        from backend.database.safe_migrations import add_query_indexes, convert_timestamps_to_epoch_ms, add_rollup_tables
+        
+        local_time = '2024-01-15T10:00:00.250000'
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(SCHEMA_11_TABLE)
+            # isoformat() local times, a CURRENT_TIMESTAMP default (UTC) and an unparseable value
+            for timestamp in [local_time] * 4 + ['2024-01-15 10:00:00', 'not a date']:
+                conn.execute("INSERT INTO completion_requests (success, response_time_ms, timestamp) VALUES (1, 1000, ?)", (timestamp,))
+            conn.commit()
+        add_query_indexes()
+        
+        with patch('backend.database.safe_migrations.TIMESTAMP_BATCH_SIZE', 2):
+            convert_timestamps_to_epoch_ms()
+            convert_timestamps_to_epoch_ms()
+        
+        local_ms = int(datetime.fromisoformat(local_time).timestamp() * 1000)
+        with sqlite3.connect(self.temp_db.name) as conn:
+            rows = conn.execute("SELECT timestamp_ms, started_at_ms FROM completion_requests ORDER BY id").fetchall()
+        self.assertEqual(rows, [(local_ms, local_ms - 1000)] * 4 + [(1705312800000, 1705312799000), (None, None)])
+        add_rollup_tables()
+        self.assertEqual(validate_schema(), (True, []))
+    
+    def test_add_rollup_tables(self):
+        """Test rolling up existing requests into the rollup tables, more than once."""
+        from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, create_index_statements
+        from backend.database.safe_migrations import add_rollup_tables
+        
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_index_statements():
+                conn.execute(statement)
+            for offset_ms in [0, 1000, 3600 * 1000]:
+                conn.execute("INSERT INTO completion_requests (timestamp_ms, success, response_time_ms) VALUES (?, 1, 1000)",
+                             (1705312800000 + offset_ms,))
+        
+        is_valid, errors = validate_schema()
+        self.assertFalse(is_valid)
+        self.assertEqual(errors, [f"Missing rollup table completion_requests_{table}"
+                                  for table in ["minutely", "hourly", "minutely_sketches", "hourly_sketches"]])
+        
+        add_rollup_tables()
+        add_rollup_tables()
+        self.assertEqual(validate_schema(), (True, []))
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT bucket_ms, requests FROM completion_requests_hourly").fetchall(),
+                             [(1705312800000, 2), (1705316400000, 1)])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+"""
+Tests for model-aware routing.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.utils.config import Config
+from backend.services.backend_pool import BackendPool
+from backend.services.model_router import ModelRouter, parse_model_routes
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestModelRouter(unittest.TestCase):
+    """Test cases for ModelRouter lookups."""
+
+    def setUp(self):
+        """Route llama models, one exact qwen model and everything else."""
+        self.llama = BackendPool(["http://llama"])
+        self.llama_70b = BackendPool(["http://big"])
+        self.qwen = BackendPool(["http://qwen"])
+        self.default = BackendPool(["http://default"])
+        self.router = ModelRouter([
+            ("llama3*", self.llama),
+            ("llama3.1:70b", self.llama_70b),
+            ("qwen2.5-coder:?b", self.qwen),
+        ], self.default)
+
+    def test_exact_name_wins(self):
+        """An exact name beats a glob configured before it."""
+        self.assertIs(self.router.route("llama3.1:70b"), self.llama_70b)
+
+    def test_glob_patterns(self):
+        """Glob patterns match whole model names, case-sensitively."""
+        self.assertIs(self.router.route("llama3.1:8b"), self.llama)
+        self.assertIs(self.router.route("qwen2.5-coder:7b"), self.qwen)
+        self.assertIs(self.router.route("qwen2.5-coder:14b"), self.default)
+        self.assertIs(self.router.route("LLAMA3"), self.default)
+
+    def test_default_pool(self):
+        """Unmatched and missing models go to the default pool."""
+        self.assertIs(self.router.route("gpt-4"), self.default)
+        self.assertIs(self.router.route(None), self.default)
+
+    def test_lookups_are_memoised(self):
+        """Repeated lookups are served from the cache."""
+        self.router.route("llama3.1:8b")
+        self.assertIs(self.router._cache["llama3.1:8b"], self.llama)
+
+    def test_parse_model_routes(self):
+        """Routes are parsed from the MODEL_ROUTES format."""
+        routes = parse_model_routes(" llama3*=http://a:11434/, http://b:11434 ; qwen*=http://c:8000;")
+        self.assertEqual(routes, [
+            ("llama3*", ["http://a:11434", "http://b:11434"]),
+            ("qwen*", ["http://c:8000"])
+        ])
+        with self.assertRaises(ValueError):
+            parse_model_routes("llama3*")
+
+    def test_from_config_shares_backends(self):
+        """A replica listed in several pools is one Backend with shared load and health."""
+        with patch.object(Config, "BACKEND_URLS", "http://a,http://b"), \
+             patch.object(Config, "MODEL_ROUTES", "llama*=http://b;qwen*=http://c"):
+            router = ModelRouter.from_config()
+
+        self.assertIs(router.route("llama3").backends[0], router.default.backends[1])
+        self.assertEqual(router.urls, ["http://a", "http://b", "http://c"])
+        self.assertEqual(router.get_stats()["routes"], {"llama*": ["http://b"], "qwen*": ["http://c"]})
+
+
+class TestModelRouting(unittest.IsolatedAsyncioTestCase):
+    """Test routing and model listing through ProxyService."""
+
+    async def asyncSetUp(self):
+        """Serve a llama replica, a default replica and an unreachable one."""
+        self.models = {
+            "http://llama": ["llama3.1:8b", "shared"],
+            "http://default": ["gpt-4", "shared"],
+        }
+        self.upstream = UpstreamClientPool()
+        for url in ("http://llama", "http://default", "http://down"):
+            def handler(request: httpx.Request, url=url) -> httpx.Response:
+                if url == "http://down":
+                    raise httpx.ConnectError("refused")
+                if request.url.path == "/v1/models":
+                    return httpx.Response(200, json={
+                        "object": "list", "data": [{"id": model, "object": "model"} for model in self.models[url]]
+                    })
+                return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}], "usage": {}})
+            self.upstream._clients[url] = httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler))
+
+        self.router = ModelRouter([("llama*", BackendPool(["http://llama"]))], BackendPool(["http://default"]))
+        self.proxy = ProxyService(self.router, self.upstream)
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_request_routed_by_model(self, mock_record):
+        """Chat requests go to the pool of their model."""
+        for model, backend in (("llama3.1:8b", "http://llama"), ("gpt-4", "http://default")):
+            request_metrics = {
+                "model": model, "origin": None, "is_streaming": False, "max_tokens": None,
+                "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+            }
+            await self.proxy.handle_non_streaming_response(b"{}", {}, time.time(), request_metrics, "req_1")
+            self.assertEqual(mock_record.call_args[0][0].backend, backend)
+
+    async def test_models_merged(self):
+        """/v1/models lists every pool's models once."""
+        response = await self.proxy.list_models()
+        models = [model["id"] for model in httpx.Response(200, content=response.body).json()["data"]]
+        self.assertEqual(models, ["gpt-4", "shared", "llama3.1:8b"])
+
+    async def test_models_skip_failed_pool(self):
+        """An unreachable pool is left out of the list; only all failing is an error."""
+        self.router.routes.append(("mistral*", BackendPool(["http://down"])))
+        response = await self.proxy.list_models()
+        self.assertEqual(len(httpx.Response(200, content=response.body).json()["data"]), 3)
+
+        self.proxy.router = ModelRouter([("llama*", BackendPool(["http://down"]))], BackendPool(["http://down"]))
+        with self.assertRaises(httpx.ConnectError):
+            await self.proxy.list_models()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests for the cached /v1/models list.
+"""
+
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.models_cache import ModelsCache
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestModelsCache(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ModelsCache."""
+
+    async def asyncSetUp(self):
+        """Serve a models list from a mock backend that counts its calls."""
+        self.calls = 0
+        self.delay = 0.0
+        self.models = ["llama3"]
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if request.url.path == "/v1/models":
+                return httpx.Response(200, json={"object": "list", "data": [{"id": model} for model in self.models]})
+            return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}]})
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+        self.cache = ModelsCache(ttl=60, max_stale=300)
+        self.proxy = ProxyService("http://backend", self.upstream, models_cache=self.cache)
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    async def test_fresh_list_is_cached(self):
+        """Only the first request within the TTL reaches the backend."""
+        first = await self.proxy.list_models()
+        second = await self.proxy.list_models()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first.body, second.body)
+        self.assertEqual(self.cache.get_stats()["models"], 1)
+
+    async def test_stale_list_served_while_revalidating(self):
+        """A stale list is returned at once while a single background request refreshes it."""
+        await self.proxy.list_models()
+        self.cache.entry.fetched_at -= 120
+        self.delay = 0.05
+        self.models = ["llama3", "qwen2.5"]
+
+        started = time.monotonic()
+        responses = await asyncio.gather(*(self.proxy.list_models() for _ in range(3)))
+        self.assertLess(time.monotonic() - started, self.delay)
+        self.assertTrue(all(b"qwen2.5" not in response.body for response in responses))
+
+        await asyncio.sleep(self.delay * 2)
+        self.assertEqual(self.calls, 2)
+        self.assertIn(b"qwen2.5", (await self.proxy.list_models()).body)
+        self.assertEqual(self.cache.stale_hits, 3)
+
+    async def test_expired_list_served_when_backend_down(self):
+        """A list past its max staleness is still returned if the refresh fails."""
+        await self.proxy.list_models()
+        self.cache.entry.fetched_at -= 1000
+
+        async def down(request):
+            raise httpx.ConnectError("refused")
+
+        self.upstream._clients["http://backend"]._transport = httpx.MockTransport(down)
+        response = await self.proxy.list_models()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"llama3", response.body)
+        self.assertEqual(self.cache.refresh_errors, 1)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_unknown_model_rejected(self, mock_record):
+        """A model missing from the list is rejected with a 404 and recorded as model_not_found."""
+        self.assertTrue(await self.proxy.is_known_model("llama3"))
+        self.assertFalse(await self.proxy.is_known_model("gpt-4"))
+
+        request_metrics = {
+            "model": "gpt-4", "origin": None, "is_streaming": False, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+        response = self.proxy.reject_unknown_model(time.time(), request_metrics)
+
+        self.assertEqual(response.status_code, 404)
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.status_code, recorded.error_type), (404, "model_not_found"))
+
+    async def test_new_model_found_after_recheck(self):
+        """A model added after the list was fetched is accepted once the list is refreshed."""
+        await self.proxy.list_models()
+        self.models = ["llama3", "qwen2.5"]
+        self.assertFalse(await self.proxy.is_known_model("qwen2.5"))
+
+        self.cache.entry.fetched_at -= self.cache.recheck_interval
+        self.assertTrue(await self.proxy.is_known_model("qwen2.5"))
+
+
+if __name__ == '__main__':
+    unittest.main()
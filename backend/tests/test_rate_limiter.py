@@ -0,0 +1,105 @@
+"""
+Tests for per-client rate limiting.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+
+from backend.services.rate_limiter import RateLimiter, ANONYMOUS_KEY
+from backend.services.proxy_service import ProxyService
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for RateLimiter."""
+
+    def test_request_budget(self):
+        """A client gets one minute's requests, then waits for the bucket to refill."""
+        limiter = RateLimiter(requests_per_minute=2)
+        self.assertIsNone(limiter.acquire("a"))
+        self.assertIsNone(limiter.acquire("a"))
+
+        retry_after = limiter.acquire("a")
+        self.assertAlmostEqual(retry_after, 30, delta=0.1)
+        self.assertIsNone(limiter.acquire("b"))
+
+        # Half a minute later one request has been refilled
+        limiter._shards[hash("a") % len(limiter._shards)]["a"].updated -= 30
+        self.assertIsNone(limiter.acquire("a"))
+
+    def test_token_precharge_settled(self):
+        """The max_tokens pre-charge is replaced by the tokens actually used."""
+        limiter = RateLimiter(tokens_per_minute=1000)
+        self.assertIsNone(limiter.acquire("a", 800))
+        self.assertIsNotNone(limiter.acquire("a", 800))
+
+        limiter.settle("a", 800, 100)
+        self.assertIsNone(limiter.acquire("a", 800))
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        """A request asking for more than the whole budget is allowed once the bucket is full."""
+        limiter = RateLimiter(tokens_per_minute=1000)
+        self.assertIsNone(limiter.acquire("a", 5000))
+        self.assertIsNotNone(limiter.acquire("a", 1))
+
+    def test_client_keys(self):
+        """Clients are keyed on Origin, or on a hash of the Authorization header."""
+        self.assertEqual(RateLimiter(key_by="origin").client_key({"origin": "app"}), "app")
+        self.assertEqual(RateLimiter(key_by="origin").client_key({}), ANONYMOUS_KEY)
+
+        limiter = RateLimiter(key_by="api_key")
+        key = limiter.client_key({"authorization": "Bearer sk-secret"})
+        self.assertNotIn("secret", key)
+        self.assertEqual(key, limiter.client_key({"authorization": "Bearer sk-secret"}))
+        self.assertNotEqual(key, limiter.client_key({"authorization": "Bearer sk-other"}))
+
+        with self.assertRaises(ValueError):
+            RateLimiter(key_by="ip")
+
+    def test_idle_clients_pruned(self):
+        """Clients whose budgets have fully refilled are eventually forgotten."""
+        limiter = RateLimiter(requests_per_minute=10, shards=1)
+        limiter.acquire("idle")
+        limiter._shards[0]["idle"].updated -= 120
+        for _ in range(1024):
+            limiter.acquire("busy")
+        self.assertEqual(limiter.get_stats()["clients"], 1)
+
+
+class TestRateLimitedProxying(unittest.TestCase):
+    """Test that ProxyService rejects and settles rate limited requests."""
+
+    def request_metrics(self, max_tokens=None):
+        return {
+            "model": "m", "origin": "app", "is_streaming": False, "max_tokens": max_tokens,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    def test_rejection_recorded(self, mock_record):
+        """An over-budget request gets a 429 and is recorded as rate_limited."""
+        proxy = ProxyService("http://backend", rate_limiter=RateLimiter(requests_per_minute=1))
+        self.assertIsNone(proxy.check_rate_limit({"origin": "app"}, time.time(), self.request_metrics()))
+
+        response = proxy.check_rate_limit({"origin": "app"}, time.time(), self.request_metrics())
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "60")
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.status_code, recorded.error_type), (429, "rate_limited"))
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    def test_usage_settled_on_completion(self, mock_record):
+        """Recording a request settles its pre-charge against the reported usage."""
+        limiter = RateLimiter(tokens_per_minute=1000)
+        proxy = ProxyService("http://backend", rate_limiter=limiter)
+        request_metrics = self.request_metrics(max_tokens=900)
+        self.assertIsNone(proxy.check_rate_limit({"origin": "app"}, time.time(), request_metrics))
+
+        proxy._record_successful_non_streaming_request(time.time(), request_metrics, 200, 50, 150, 200, "stop")
+
+        budget = limiter._shards[hash("app") % len(limiter._shards)]["app"]
+        self.assertAlmostEqual(budget.tokens, 800, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Tests for reading and streaming request bodies.
+"""
+
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+from starlette.requests import Request
+
+from backend.services.proxy_service import ProxyService
+from backend.services.request_body import read_request_body, StreamedRequestBody, RequestBodyTooLarge
+from backend.services.upstream_client import UpstreamClientPool
+
+
+def make_request(body: bytes, chunk_size: int = 1024, content_length: bool = True) -> Request:
+    """A request whose body arrives in chunks, as the ASGI server delivers it."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+    received = []
+
+    async def receive():
+        received.append(1)
+        return messages[len(received) - 1]
+
+    headers = [(b"content-length", str(len(body)).encode())] if content_length else []
+    return Request({"type": "http", "method": "POST", "path": "/v1/chat/completions", "headers": headers}, receive)
+
+
+def chat_body(stream: bool, messages: int = 50, content_size: int = 1000, fields_first: bool = True) -> bytes:
+    fields = {"model": "llama3", "stream": stream, "max_tokens": 64}
+    conversation = {"messages": [{"role": "user", "content": "x" * content_size} for _ in range(messages)]}
+    body = {**fields, **conversation} if fields_first else {**conversation, **fields}
+    return json.dumps(body).encode()
+
+
+class TestReadRequestBody(unittest.IsolatedAsyncioTestCase):
+    """Test cases for read_request_body."""
+
+    async def test_buffered_by_default(self):
+        """Without streaming the whole body is read."""
+        body = chat_body(stream=False)
+        self.assertEqual(await read_request_body(make_request(body)), body)
+
+    async def test_large_body_streams_after_head(self):
+        """Once the routing fields are in the sniffed head the rest is left unread."""
+        body = chat_body(stream=True)
+        read = await read_request_body(make_request(body), streaming=True, sniff_bytes=4096)
+
+        self.assertIsInstance(read, StreamedRequestBody)
+        self.assertLess(len(read.head), 8192)
+        self.assertEqual((read.fields["model"], read.fields["is_streaming"]), ("llama3", True))
+        self.assertIsNone(read.fields["message_count"])
+
+        completed = {}
+        read.on_complete = completed.update
+        self.assertEqual(b"".join([chunk async for chunk in read]), body)
+        self.assertEqual(completed["message_count"], 50)
+
+    async def test_body_without_stream_field_streams(self):
+        """A large body that leaves out stream is forwarded as a non-streaming request once its messages start."""
+        body = json.dumps({"model": "llama3", "messages": [{"role": "user", "content": "x" * 1000}] * 50}).encode()
+        read = await read_request_body(make_request(body), streaming=True, sniff_bytes=4096)
+
+        self.assertIsInstance(read, StreamedRequestBody)
+        self.assertLess(len(read.head), 8192)
+        self.assertEqual((read.fields["model"], read.fields["is_streaming"]), ("llama3", False))
+        self.assertEqual(b"".join([chunk async for chunk in read]), body)
+
+    async def test_small_and_unroutable_bodies_are_buffered(self):
+        """Bodies within the sniff window, or with the model after the messages, are read in full."""
+        small = chat_body(stream=True, messages=1, content_size=10)
+        late_fields = chat_body(stream=True, fields_first=False)
+        self.assertEqual(await read_request_body(make_request(small), streaming=True, sniff_bytes=4096), small)
+        self.assertEqual(await read_request_body(make_request(late_fields), streaming=True, sniff_bytes=4096), late_fields)
+
+    async def test_max_size_from_content_length(self):
+        """A declared length over the limit is refused before any of the body is read."""
+        with self.assertRaises(RequestBodyTooLarge):
+            await read_request_body(make_request(chat_body(stream=False)), max_bytes=1000)
+
+    async def test_max_size_while_reading(self):
+        """Without a declared length the limit is enforced as the body arrives, in both modes."""
+        body = chat_body(stream=False)
+        with self.assertRaises(RequestBodyTooLarge):
+            await read_request_body(make_request(body, content_length=False), max_bytes=len(body) - 1)
+
+        streamed = await read_request_body(
+            make_request(body, content_length=False), max_bytes=len(body) - 1, streaming=True, sniff_bytes=4096
+        )
+        with self.assertRaises(RequestBodyTooLarge):
+            async for _ in streamed:
+                pass
+
+
+class TestStreamedUpload(unittest.IsolatedAsyncioTestCase):
+    """Test forwarding streamed bodies through the proxy service."""
+
+    async def asyncSetUp(self):
+        """Mock backend that reads the whole upload before answering."""
+        self.uploads = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.uploads.append(await request.aread())
+            if json.loads(self.uploads[-1]).get("stream"):
+                return httpx.Response(200, content=b'data: {"choices":[{"delta":{"content":"hi"},"finish_reason":"stop"}]}\n\ndata: [DONE]\n\n')
+            return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}], "usage": {"total_tokens": 3}})
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+        self.proxy = ProxyService("http://backend", self.upstream)
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    async def forward(self, body: bytes, max_bytes: int = 0):
+        request = make_request(body, content_length=False)
+        read = await read_request_body(request, max_bytes, streaming=True, sniff_bytes=4096)
+        self.assertIsInstance(read, StreamedRequestBody)
+        metrics = self.proxy.extract_request_metrics(request, read)
+        metrics["request_id"] = "req_1"
+        handle = self.proxy.handle_streaming_response if metrics["is_streaming"] else self.proxy.handle_non_streaming_response
+        return await handle(read, {}, time.time(), metrics, "req_1"), metrics
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_non_streaming_upload(self, mock_record):
+        """The backend receives the whole body and the row gets the fields scanned during the upload."""
+        body = chat_body(stream=False)
+        response, _ = await self.forward(body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.uploads, [body])
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.model, recorded.message_count, recorded.max_tokens), ("llama3", 50, 64))
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_streaming_upload(self, mock_record):
+        """Streamed responses work the same with a streamed upload."""
+        body = chat_body(stream=True)
+        response, _ = await self.forward(body)
+        chunks = [chunk async for chunk in response.body_iterator]
+
+        self.assertEqual(self.uploads, [body])
+        self.assertTrue(b"".join(chunks).endswith(b"data: [DONE]\n\n"))
+        self.assertEqual(mock_record.call_args[0][0].message_count, 50)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_oversized_upload_gets_413(self, mock_record):
+        """An upload going over the limit mid-stream is answered with a 413, not a backend error."""
+        for stream in (False, True):
+            body = chat_body(stream=stream)
+            response, _ = await self.forward(body, max_bytes=len(body) - 1)
+
+            self.assertEqual(response.status_code, 413)
+            recorded = mock_record.call_args[0][0]
+            self.assertEqual((recorded.status_code, recorded.error_type), (413, "request_too_large"))
+        self.assertEqual(self.uploads, [])
+        self.assertEqual(self.proxy.router.pools[0].backends[0].consecutive_failures, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
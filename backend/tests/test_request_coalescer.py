@@ -0,0 +1,164 @@
+"""
+Tests for single-flight request coalescing.
+"""
+
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.request_coalescer import RequestCoalescer
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestRequestCoalescer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for RequestCoalescer."""
+
+    async def test_concurrent_requests_share_call(self):
+        """Concurrent callers with the same key get the leader's result."""
+        coalescer = RequestCoalescer()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "response"
+
+        results = await asyncio.gather(*(coalescer.request("k", call) for _ in range(3)))
+
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [("response", False), ("response", True), ("response", True)])
+        self.assertEqual(coalescer.get_stats()["in_flight_requests"], 0)
+
+    async def test_errors_reach_followers(self):
+        """A failed leader call fails its followers too, and later calls start afresh."""
+        coalescer = RequestCoalescer()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise httpx.ConnectError("refused")
+
+        results = await asyncio.gather(*(coalescer.request("k", call) for _ in range(2)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, httpx.ConnectError) for result in results))
+
+        async def ok():
+            return "response"
+
+        self.assertEqual(await coalescer.request("k", ok), ("response", False))
+
+    async def test_late_subscriber_gets_whole_stream(self):
+        """A subscriber joining mid-stream is sent the chunks it missed first."""
+        coalescer = RequestCoalescer(streams=True)
+        release = asyncio.Event()
+
+        async def source(flight):
+            yield b"a"
+            await release.wait()
+            yield b"b"
+
+        flight, coalesced = coalescer.stream("k", source)
+        self.assertFalse(coalesced)
+        first = flight.subscribe()
+        self.assertEqual(await first.__anext__(), b"a")
+
+        joined, coalesced = coalescer.stream("k", source)
+        self.assertIs(joined, flight)
+        self.assertTrue(coalesced)
+        release.set()
+
+        self.assertEqual([chunk async for chunk in joined.subscribe()], [b"a", b"b"])
+        self.assertEqual([chunk async for chunk in first], [b"b"])
+
+
+class TestCoalescedProxying(unittest.IsolatedAsyncioTestCase):
+    """Test that ProxyService coalesces identical deterministic requests."""
+
+    async def asyncSetUp(self):
+        """Serve slow completions and streams from a mock backend that counts its calls."""
+        self.calls = 0
+        self.stream = [
+            b'data: {"choices":[{"delta":{"content":"Hi"},"finish_reason":null}]}\n\n',
+            b'data: {"choices":[{"delta":{},"finish_reason":"stop"}],"usage":{"total_tokens":5}}\n\n',
+            b'data: [DONE]\n\n'
+        ]
+
+        async def body():
+            for chunk in self.stream:
+                await asyncio.sleep(0.01)
+                yield chunk
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            if b'"stream": true' in request.content:
+                return httpx.Response(200, content=body())
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, json={
+                "choices": [{"finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+            })
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+        self.proxy = ProxyService("http://backend", self.upstream, coalescer=RequestCoalescer(streams=True))
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self, is_streaming: bool, temperature: float = 0):
+        return {
+            "model": "m", "origin": None, "is_streaming": is_streaming, "max_tokens": None,
+            "temperature": temperature, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_non_streaming(self, mock_record):
+        """Identical concurrent requests make one backend call and each get a row."""
+        body = b'{"model": "m", "temperature": 0}'
+        responses = await asyncio.gather(*(
+            self.proxy.handle_non_streaming_response(body, {}, time.time(), self.request_metrics(False), "req_1")
+            for _ in range(3)
+        ))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({response.body for response in responses}), 1)
+        recorded = [call[0][0] for call in mock_record.call_args_list]
+        self.assertEqual(sorted(request.coalesced for request in recorded), [False, True, True])
+        self.assertTrue(all(request.backend == "http://backend" and request.total_tokens == 5 for request in recorded))
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_sampled_requests_not_coalesced(self, mock_record):
+        """Requests with a non-zero temperature each reach the backend."""
+        body = b'{"model": "m", "temperature": 0.7}'
+        await asyncio.gather(*(
+            self.proxy.handle_non_streaming_response(body, {}, time.time(), self.request_metrics(False, 0.7), "req_1")
+            for _ in range(2)
+        ))
+        self.assertEqual(self.calls, 2)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_streams_fan_out(self, mock_record):
+        """Identical concurrent streams share one upstream stream and each get a row."""
+        body = b'{"model": "m", "stream": true, "temperature": 0}'
+
+        async def client():
+            response = await self.proxy.handle_streaming_response(body, {}, time.time(), self.request_metrics(True), "req_1")
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        replies = await asyncio.gather(*(client() for _ in range(3)))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(replies, [b"".join(self.stream)] * 3)
+        recorded = [call[0][0] for call in mock_record.call_args_list]
+        self.assertEqual(sorted(request.coalesced for request in recorded), [False, True, True])
+        self.assertTrue(all(request.success and request.finish_reason == "stop" for request in recorded))
+
+
+if __name__ == '__main__':
+    unittest.main()
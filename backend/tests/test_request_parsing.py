@@ -0,0 +1,127 @@
+"""
+Tests for partial request field extraction.
+"""
+
+import json
+import unittest
+
+from backend.services.request_parsing import (
+    RequestFieldScanner, MAX_ESCAPED_QUOTES, scan_request_fields, parse_request_fields, extract_request_fields
+)
+
+
+def request_body(**overrides) -> bytes:
+    """Encode a chat completion request."""
+    body = {
+        "model": "llama3.1:8b",
+        "messages": [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "Quote: \"hi\" \\ {not: json} [1, 2], done"},
+        ],
+        "stream": True,
+        "max_tokens": 128,
+        "temperature": 0.7,
+        "top_p": 0.95,
+    }
+    body.update(overrides)
+    return json.dumps(body).encode()
+
+
+class TestRequestFieldScanner(unittest.TestCase):
+    """Test cases for RequestFieldScanner."""
+
+    def test_matches_full_parse(self):
+        """The scan extracts the same fields as a full JSON parse."""
+        bodies = [
+            request_body(),
+            request_body(stream=False, max_tokens=None),
+            request_body(messages=[]),
+            request_body(messages=[{"role": "user", "content": [{"type": "text", "text": "nested"}]}]),
+            request_body(tools=[{"type": "function", "function": {"name": "f", "parameters": {}}}]),
+            b'{"messages":[{"role":"user","content":"hi"}],"model":"m\\u00e9"}',
+            b'{ "model" : "m" , "temperature" : 1e-1 }',
+        ]
+        for body in bodies:
+            with self.subTest(body=body[:60]):
+                self.assertEqual(scan_request_fields(body), parse_request_fields(body))
+
+    def test_chunked_feed(self):
+        """Fields are extracted the same way when the body arrives in small pieces."""
+        body = request_body()
+        expected = parse_request_fields(body)
+        for size in (1, 2, 3, 7):
+            scanner = RequestFieldScanner()
+            for i in range(0, len(body), size):
+                scanner.feed(body[i:i + size])
+            with self.subTest(size=size):
+                self.assertEqual(scanner.result(), expected)
+
+    def test_fields_available_before_messages_end(self):
+        """Fields seen before the messages array are available before the body is complete."""
+        body = request_body()
+        scanner = RequestFieldScanner()
+        scanner.feed(body[:body.index(b'"content": "Be')])
+
+        self.assertTrue(scanner.has_fields("model"))
+        self.assertIsNone(scanner.result())
+
+    def test_odd_payloads_are_rejected(self):
+        """Payloads the scanner cannot handle exactly return None."""
+        bodies = [
+            b'{"model":"a",}',
+            b'{"model":"a"',
+            b'[{"model":"a"}]',
+            b'{"messages":"hello"}',
+            b'{"messages":[1,2]}',
+            b'{"model":{"name":"a"}}',
+            b'{"mod\\u0065l":"a"}',
+            b'{"model":"a"} trailing',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertIsNone(scan_request_fields(body))
+
+    def test_single_non_object_message(self):
+        """A lone non-object message defers to the full parser, which counts it, in any chunking."""
+        for messages in [b'[true]', b'["x"]', b'[null]', b'[[]]', b'[ 1 ]', b'[[{}]]']:
+            body = b'{"model":"a","messages":' + messages + b'}'
+            with self.subTest(body=body):
+                self.assertIsNone(scan_request_fields(body))
+                self.assertEqual(extract_request_fields(body), parse_request_fields(body))
+                self.assertEqual(extract_request_fields(body)["message_count"], 1)
+                for size in (1, 2):
+                    scanner = RequestFieldScanner()
+                    for i in range(0, len(body), size):
+                        scanner.feed(body[i:i + size])
+                    self.assertIsNone(scanner.result())
+        self.assertEqual(scan_request_fields(b'{"messages":[ ]}'), parse_request_fields(b'{"messages":[ ]}'))
+
+    def test_escape_heavy_body_gives_up(self):
+        """Many escaped quotes make the scanner defer to the full parser."""
+        content = "\\\"x\\\" " * (MAX_ESCAPED_QUOTES + 1)
+        body = request_body(messages=[{"role": "user", "content": content}])
+
+        self.assertIsNone(scan_request_fields(body))
+        self.assertEqual(extract_request_fields(body), parse_request_fields(body))
+
+
+class TestExtractRequestFields(unittest.TestCase):
+    """Test cases for extract_request_fields."""
+
+    def test_falls_back_to_full_parse(self):
+        """Odd payloads are handled by the full parser."""
+        body = b'{"model":"a","messages":[1,2],}'
+        with self.assertRaises(ValueError):
+            extract_request_fields(body)
+
+        body = b'{"model":"a","messages":[1,2]}'
+        self.assertEqual(extract_request_fields(body)["message_count"], 2)
+
+    def test_full_mode(self):
+        """Full mode always parses the whole body."""
+        body = request_body()
+        self.assertEqual(extract_request_fields(body, "full"), extract_request_fields(body, "partial"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Tests for the response cache.
+"""
+
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.response_cache import ResponseCache, CachedResponse, cache_key, is_cacheable, ENTRY_OVERHEAD_BYTES
+from backend.services.proxy_service import ProxyService
+from backend.services.upstream_client import UpstreamClientPool
+
+
+def entry(content: bytes = b'{"ok":true}') -> CachedResponse:
+    return CachedResponse(
+        content=content, status_code=200, content_type="application/json",
+        is_streaming=False, response_time_ms=1500, total_tokens=12, finish_reason="stop"
+    )
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ResponseCache."""
+
+    def test_cache_key_is_canonical(self):
+        """Key order and whitespace do not change the key; content does."""
+        self.assertEqual(
+            cache_key(b'{"model": "m", "temperature": 0}'),
+            cache_key(b'{"temperature":0,"model":"m"}')
+        )
+        self.assertNotEqual(cache_key(b'{"model": "m"}'), cache_key(b'{"model": "n"}'))
+        self.assertIsNone(cache_key(b'not json'))
+
+    def test_is_cacheable(self):
+        """Only temperature 0 requests are cached, unless the client opts out."""
+        self.assertTrue(is_cacheable({"temperature": 0}, {}))
+        self.assertFalse(is_cacheable({"temperature": 0.7}, {}))
+        self.assertFalse(is_cacheable({"temperature": None}, {}))
+        self.assertFalse(is_cacheable({"temperature": 0}, {"cache-control": "no-cache"}))
+
+    async def test_lru_byte_budget(self):
+        """The least recently used entries are evicted to stay within the byte budget."""
+        cache = ResponseCache(max_bytes=2 * (100 + ENTRY_OVERHEAD_BYTES))
+        cache.put("a", entry(b"a" * 100))
+        cache.put("b", entry(b"b" * 100))
+        await cache.get("a")
+        cache.put("c", entry(b"c" * 100))
+
+        self.assertIsNone(await cache.get("b"))
+        self.assertIsNotNone(await cache.get("a"))
+        self.assertIsNotNone(await cache.get("c"))
+        self.assertEqual(cache.evictions, 1)
+
+    async def test_oversized_entries_skipped(self):
+        """Responses larger than the entry limit are not stored."""
+        cache = ResponseCache(max_entry_bytes=ENTRY_OVERHEAD_BYTES + 10)
+        cache.put("a", entry(b"x" * 11))
+        self.assertIsNone(await cache.get("a"))
+
+    async def test_ttl(self):
+        """Expired entries are misses."""
+        cache = ResponseCache(ttl=60)
+        cache.put("a", entry())
+        with patch("backend.services.response_cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(await cache.get("a"))
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+    async def test_disk_tier(self):
+        """Entries written to disk are found by a new cache after a restart."""
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            cache = ResponseCache(db_path=path)
+            cache.put("a", entry())
+            await cache.flush()
+
+            restarted = ResponseCache(db_path=path)
+            cached = await restarted.get("a")
+            self.assertEqual(cached.content, b'{"ok":true}')
+            self.assertEqual(cached.response_time_ms, 1500)
+            self.assertEqual(restarted.disk_hits, 1)
+            # Promoted to memory
+            await restarted.get("a")
+            self.assertEqual(restarted.disk_hits, 1)
+        finally:
+            os.unlink(path)
+
+
+class TestCachedProxying(unittest.IsolatedAsyncioTestCase):
+    """Test that ProxyService serves repeated deterministic requests from the cache."""
+
+    async def asyncSetUp(self):
+        """Serve completions and streams from a mock backend that counts its calls."""
+        self.calls = 0
+        self.stream = [
+            b'data: {"choices":[{"delta":{"content":"Hi"},"finish_reason":null}]}\n\n',
+            b'data: {"choices":[{"delta":{},"finish_reason":"stop"}],"usage":{"total_tokens":5}}\n\n',
+            b'data: [DONE]\n\n'
+        ]
+
+        async def body():
+            for chunk in self.stream:
+                yield chunk
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            if b'"stream": true' in request.content:
+                return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "Hi"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+            })
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+        self.proxy = ProxyService("http://backend", self.upstream, cache=ResponseCache())
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self, is_streaming: bool, temperature: float = 0):
+        return {
+            "model": "m", "origin": None, "is_streaming": is_streaming, "max_tokens": None,
+            "temperature": temperature, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_non_streaming_hit(self, mock_record):
+        """The second identical request is answered from the cache and recorded as a hit."""
+        body = b'{"model": "m", "temperature": 0}'
+        first = await self.proxy.handle_non_streaming_response(body, {}, time.time(), self.request_metrics(False), "req_1")
+        second = await self.proxy.handle_non_streaming_response(body, {}, time.time(), self.request_metrics(False), "req_2")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.body, first.body)
+        self.assertEqual(second.headers["x-cache"], "HIT")
+        recorded = mock_record.call_args[0][0]
+        self.assertTrue(recorded.cache_hit)
+        self.assertIsNone(recorded.backend)
+        self.assertEqual(recorded.total_tokens, 5)
+        self.assertIsNotNone(recorded.cache_saved_ms)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_sampled_requests_not_cached(self, mock_record):
+        """Requests with a non-zero temperature always reach the backend."""
+        body = b'{"model": "m", "temperature": 0.7}'
+        for _ in range(2):
+            await self.proxy.handle_non_streaming_response(body, {}, time.time(), self.request_metrics(False, 0.7), "req_1")
+        self.assertEqual(self.calls, 2)
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_stream_replay(self, mock_record):
+        """A cached stream is replayed as the same SSE events."""
+        body = b'{"model": "m", "stream": true, "temperature": 0}'
+        replies = []
+        for _ in range(2):
+            response = await self.proxy.handle_streaming_response(body, {}, time.time(), self.request_metrics(True), "req_1")
+            replies.append([chunk async for chunk in response.body_iterator])
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(b"".join(replies[1]), b"".join(self.stream))
+        self.assertEqual(len(replies[1]), 3)
+        recorded = mock_record.call_args[0][0]
+        self.assertTrue(recorded.cache_hit)
+        self.assertEqual(recorded.finish_reason, "stop")
+
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_truncated_stream_not_cached(self, mock_record):
+        """A stream that ends without a finish reason or [DONE] is not replayed to the next client."""
+        self.stream = [b'data: {"choices":[{"delta":{"content":"Hi"},"finish_reason":null}]}\n\n']
+        body = b'{"model": "m", "stream": true, "temperature": 0}'
+        for _ in range(2):
+            response = await self.proxy.handle_streaming_response(body, {}, time.time(), self.request_metrics(True), "req_1")
+            self.assertNotIn("x-cache", response.headers)
+            [chunk async for chunk in response.body_iterator]
+
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(mock_record.call_args[0][0].cache_hit)
+
+
+if __name__ == '__main__':
+    unittest.main()
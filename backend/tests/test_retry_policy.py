@@ -0,0 +1,139 @@
+"""
+Tests for retrying requests that failed before their first upstream byte.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from backend.services.proxy_service import ProxyService
+from backend.services.request_budget import RequestBudget
+from backend.services.retry_policy import RetryPolicy
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for RetryPolicy."""
+
+    def test_only_connection_failures_are_retried(self):
+        """Errors after which the backend may have answered, or waited out a timeout, are not retried."""
+        policy = RetryPolicy(2, RequestBudget(1.0, initial_balance=10))
+        self.assertTrue(policy.should_retry(httpx.ConnectError("refused"), 0))
+        self.assertTrue(policy.should_retry(httpx.RemoteProtocolError("closed"), 0))
+        self.assertFalse(policy.should_retry(httpx.ReadTimeout("slow"), 0))
+        self.assertFalse(policy.should_retry(ValueError(), 0))
+
+    def test_limits(self):
+        """Retries stop at max_retries and when the budget runs out."""
+        policy = RetryPolicy(2, RequestBudget(0.0, initial_balance=1))
+        self.assertFalse(policy.should_retry(httpx.ConnectError("refused"), 2))
+        self.assertTrue(policy.should_retry(httpx.ConnectError("refused"), 0))
+        self.assertFalse(policy.should_retry(httpx.ConnectError("refused"), 0))
+        self.assertEqual((policy.retries_total, policy.exhausted_total), (1, 2))
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Backoff is drawn between 0 and an exponentially growing cap."""
+        policy = RetryPolicy(5, RequestBudget(0.1), base_delay=0.1, max_delay=0.3)
+        delays = [policy.backoff(1) for _ in range(200)]
+        self.assertTrue(all(0 <= delay <= 0.1 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+        self.assertTrue(all(policy.backoff(10) <= 0.3 for _ in range(200)))
+
+
+class TestProxyRetries(unittest.IsolatedAsyncioTestCase):
+    """Test retries through the proxy service."""
+
+    async def asyncSetUp(self):
+        """One replica refusing connections and one healthy replica."""
+        self.calls = []
+
+        def backend(url: str, refuse: bool):
+            async def handler(request: httpx.Request) -> httpx.Response:
+                self.calls.append(url)
+                if refuse:
+                    raise httpx.ConnectError("Connection refused")
+                if b'"stream": true' in request.content:
+                    return httpx.Response(200, content=b'data: {"choices":[{"delta":{"content":"hi"},"finish_reason":"stop"}]}\n\ndata: [DONE]\n\n')
+                return httpx.Response(200, json={"choices": [{"finish_reason": "stop"}]})
+
+            return httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(handler))
+
+        self.upstream = UpstreamClientPool()
+        self.upstream._clients["http://down"] = backend("http://down", True)
+        self.upstream._clients["http://up"] = backend("http://up", False)
+        self.policy = RetryPolicy(2, RequestBudget(0.1, initial_balance=10), base_delay=0.001)
+        self.proxy = ProxyService(["http://down", "http://up"], self.upstream, retry_policy=self.policy)
+        self.pool = self.proxy.router.pools[0]
+        # Route to the failing replica first, then to any other
+        self.pool.select = lambda exclude=(): next(b for b in self.pool.backends if b not in exclude)
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.upstream.close()
+
+    def request_metrics(self, stream: bool):
+        return {
+            "model": "m", "origin": None, "is_streaming": stream, "max_tokens": None,
+            "temperature": None, "top_p": None, "message_count": 1, "request_id": "req_1"
+        }
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_retried_on_other_replica(self, mock_record):
+        """A refused connection is retried on the other replica and counted on the request."""
+        response = await self.proxy.handle_non_streaming_response(
+            b'{"stream": false}', {}, time.time(), self.request_metrics(False), "req_1"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, ["http://down", "http://up"])
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.backend, recorded.retry_count), ("http://up", 1))
+        self.assertEqual([b.consecutive_failures for b in self.pool.backends], [1, 0])
+        self.assertEqual([b.in_flight for b in self.pool.backends], [0, 0])
+
+    @patch('backend.services.proxy_service.record_request_from_model')
+    async def test_streaming_retried(self, mock_record):
+        """Streams are retried the same way, since nothing was sent to the client yet."""
+        response = await self.proxy.handle_streaming_response(
+            b'{"stream": true}', {}, time.time(), self.request_metrics(True), "req_1"
+        )
+        content = b"".join([chunk async for chunk in response.body_iterator])
+
+        self.assertTrue(content.endswith(b"data: [DONE]\n\n"))
+        recorded = mock_record.call_args[0][0]
+        self.assertEqual((recorded.success, recorded.backend, recorded.retry_count), (True, "http://up", 1))
+
+    async def test_body_failure_not_retried(self):
+        """A connection dropped partway through the response body is not sent to another replica."""
+        async def partial_body():
+            yield b'{"choices": ['
+            raise httpx.ReadError("Connection reset")
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls.append("http://down")
+            return httpx.Response(200, content=partial_body())
+
+        await self.upstream._clients["http://down"].aclose()
+        self.upstream._clients["http://down"] = httpx.AsyncClient(base_url="http://down", transport=httpx.MockTransport(handler))
+        with self.assertRaises(httpx.ReadError):
+            await self.proxy.handle_non_streaming_response(
+                b'{"stream": false}', {}, time.time(), self.request_metrics(False), "req_1"
+            )
+        self.assertEqual(self.calls, ["http://down"])
+        self.assertEqual(self.policy.retries_total, 0)
+        self.assertEqual([b.in_flight for b in self.pool.backends], [0, 0])
+
+    async def test_no_budget_fails(self):
+        """Without budget the connection error reaches the caller, as without retries."""
+        self.policy.budget = RequestBudget(0.0)
+        with self.assertRaises(httpx.ConnectError):
+            await self.proxy.handle_non_streaming_response(
+                b'{"stream": false}', {}, time.time(), self.request_metrics(False), "req_1"
+            )
+        self.assertEqual(self.calls, ["http://down"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Tests for the minute and hour rollups of completion requests.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from backend.database.connection import get_db_connection, close_all_connections
+from backend.database.dao import CompletionRequestsDAO
+from backend.database.rollups import ROLLUP_TABLES, SKETCH_TABLES, create_rollup_statements, rebuild_rollups, split_range
+from backend.database.schema import COMPLETION_REQUESTS_SCHEMA, create_index_statements
+from backend.utils.timestamps import parse_timestamp
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+
+
+def make_request(i, timestamp_ms):
+    """A request record; every fifth one fails and every other one streams."""
+    failed = i % 5 == 0
+    return {
+        'timestamp_ms': timestamp_ms, 'success': not failed, 'status_code': 500 if failed else 200,
+        'response_time_ms': 100 + i * 10, 'model': f'model-{i % 3}', 'origin': f'client-{i % 2}',
+        'is_streaming': i % 2 == 0, 'prompt_tokens': 10, 'completion_tokens': 20, 'total_tokens': 30,
+        'time_to_first_token_ms': 50 + i if i % 2 == 0 else None, 'time_to_last_token_ms': 400 if i % 2 == 0 else None,
+        'itl_mean_ms': 4.0 if i % 2 == 0 else None, 'itl_max_ms': float(i) if i % 2 == 0 else None,
+        'backend': f'http://backend-{i % 2}:11434', 'error_type': 'http_error' if failed else None
+    }
+
+
+class TestSplitRange(unittest.TestCase):
+    """Test cases for split_range."""
+
+    def test_unaligned_range(self):
+        """Whole hours come from the hourly table, whole minutes at the edges from the minutely one, the rest is raw."""
+        start = parse_timestamp('2024-01-15T10:00:30')
+        end = parse_timestamp('2024-01-15T13:30:00')
+        hour = parse_timestamp('2024-01-15T11:00:00')
+        self.assertEqual(split_range(start, end), [
+            ('completion_requests_hourly', hour, hour + 2 * HOUR_MS),
+            ('completion_requests_minutely', start + 30 * 1000, hour),
+            ('completion_requests_minutely', hour + 2 * HOUR_MS, end),
+            (None, start, start + 30 * 1000),
+        ])
+
+    def test_sketch_tables(self):
+        """Sketch tables split a range the same way; minutes across an hour boundary stay minutes."""
+        start = parse_timestamp('2024-01-15T10:59:00')
+        self.assertEqual(split_range(start, start + 2 * MINUTE_MS, SKETCH_TABLES),
+                         [('completion_requests_minutely_sketches', start, start + 2 * MINUTE_MS)])
+
+    def test_short_and_unbounded_ranges(self):
+        """A range inside one minute is all raw rows; an unbounded range is the whole hourly table."""
+        start = parse_timestamp('2024-01-15T10:00:10')
+        self.assertEqual(split_range(start, start + 20 * 1000), [(None, start, start + 20 * 1000)])
+        self.assertEqual(split_range(None, None), [('completion_requests_hourly', None, None)])
+
+        hour = parse_timestamp('2024-01-15T10:00:00')
+        self.assertEqual(split_range(hour, None), [('completion_requests_hourly', hour, None)])
+
+
+class TestRollups(unittest.TestCase):
+    """Test cases for keeping the rollups up to date and reading metrics from them."""
+
+    def setUp(self):
+        """Create a test database with the schema, indexes and rollup tables."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        with sqlite3.connect(self.temp_db.name) as conn:
+            conn.execute(COMPLETION_REQUESTS_SCHEMA)
+            for statement in create_index_statements() + create_rollup_statements():
+                conn.execute(statement)
+
+        self.dao = CompletionRequestsDAO()
+        self.patcher = patch('backend.database.connection.get_db_path', return_value=self.temp_db.name)
+        self.patcher.start()
+
+        base = parse_timestamp('2024-01-15T10:00:00')
+        # Spread over three hours, with seconds off the minute so every table and raw edge gets rows
+        self.requests = [make_request(i, base + i * 7 * MINUTE_MS + i * 1000) for i in range(26)]
+        self.dao.insert_completion_requests(self.requests[:20])
+        for request in self.requests[20:]:
+            self.dao.insert_completion_request(request)
+
+    def tearDown(self):
+        close_all_connections()
+        self.patcher.stop()
+        os.unlink(self.temp_db.name)
+
+    def rollup_rows(self):
+        """Every row of every rollup and sketch table."""
+        with get_db_connection() as conn:
+            return {table: set(conn.execute(f"SELECT * FROM {table}").fetchall())
+                    for table in {**ROLLUP_TABLES, **SKETCH_TABLES}}
+
+    def test_inserts_update_rollups(self):
+        """Single and batch inserts keep the rollups equal to a rebuild from the raw rows."""
+        incremental = self.rollup_rows()
+        with get_db_connection() as conn:
+            self.assertEqual(conn.execute("SELECT SUM(requests) FROM completion_requests_hourly").fetchone()[0], 26)
+            self.assertEqual(rebuild_rollups(conn), 26)
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_metrics_match_raw_rows(self):
+        """Metrics over unaligned ranges count exactly the requests inside them."""
+        start = parse_timestamp('2024-01-15T10:10:30')
+        end = parse_timestamp('2024-01-15T12:20:00')
+        expected = [r for r in self.requests if start <= r['timestamp_ms'] <= end]
+
+        metrics = self.dao.get_metrics(start_ms=start, end_ms=end)
+        self.assertEqual(metrics.requests.total.total, len(expected))
+        self.assertEqual(metrics.requests.total.failed, sum(1 for r in expected if not r['success']))
+        self.assertEqual(metrics.requests.streamed.total, sum(1 for r in expected if r['is_streaming']))
+        self.assertEqual(metrics.requests.streamed.inter_token_latency.max_ms,
+                         max(r['itl_max_ms'] for r in expected if r['itl_max_ms'] is not None))
+        self.assertEqual(sum(metrics.model_distribution.values()), len(expected))
+        self.assertEqual(sum(b.total for b in metrics.backend_distribution.values()), len(expected))
+
+    def test_metrics_percentiles(self):
+        """Response time and time to first token percentiles come from the merged sketches."""
+        metrics = self.dao.get_metrics()
+        response_times = sorted(r['response_time_ms'] for r in self.requests)
+        summary = metrics.requests.total
+        self.assertAlmostEqual(summary.p50_response_time_ms, response_times[(len(response_times) - 1) // 2],
+                               delta=response_times[-1] * 0.02)
+        self.assertLessEqual(summary.p50_response_time_ms, summary.p95_response_time_ms)
+        self.assertLessEqual(summary.p95_response_time_ms, summary.p99_response_time_ms)
+
+        streamed = metrics.requests.streamed
+        first_tokens = [r['time_to_first_token_ms'] for r in self.requests if r['time_to_first_token_ms'] is not None]
+        self.assertGreaterEqual(streamed.p50_time_to_first_token_ms, min(first_tokens) * 0.98)
+        self.assertLessEqual(streamed.p99_time_to_first_token_ms, max(first_tokens) * 1.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
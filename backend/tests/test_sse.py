@@ -0,0 +1,141 @@
+"""
+Tests for SSE framing and stream metrics extraction.
+"""
+
+import json
+import unittest
+
+from backend.services.sse import SSEFramer
+from backend.services.stream_metrics import StreamMetrics
+
+
+def sse_event(payload) -> bytes:
+    """Encode a payload as one SSE data event."""
+    return b"data: " + json.dumps(payload).encode() + b"\n\n"
+
+
+class TestSSEFramer(unittest.TestCase):
+    """Test cases for SSEFramer."""
+
+    def test_single_event_per_chunk(self):
+        """One complete event per chunk is emitted as-is."""
+        framer = SSEFramer()
+        self.assertEqual(framer.feed(b'data: {"a": 1}\n\n'), [b'{"a": 1}'])
+
+    def test_coalesced_events(self):
+        """Several events in one chunk are all emitted."""
+        framer = SSEFramer()
+        events = framer.feed(b'data: {"a": 1}\n\ndata: {"b": 2}\n\ndata: [DONE]\n\n')
+        self.assertEqual(events, [b'{"a": 1}', b'{"b": 2}', b'[DONE]'])
+
+    def test_event_split_across_chunks(self):
+        """An event is only emitted once its terminating blank line arrives."""
+        framer = SSEFramer()
+        self.assertEqual(framer.feed(b'data: {"usa'), [])
+        self.assertEqual(framer.feed(b'ge": 3}\n'), [])
+        self.assertEqual(framer.feed(b'\ndata: {"c"'), [b'{"usage": 3}'])
+        self.assertEqual(framer.feed(b': 4}\n\n'), [b'{"c": 4}'])
+
+    def test_crlf_line_endings(self):
+        """CRLF line endings are handled, even when split across chunks."""
+        framer = SSEFramer()
+        self.assertEqual(framer.feed(b'data: {"a": 1}\r\n\r'), [b'{"a": 1}'])
+        self.assertEqual(framer.feed(b'\ndata: {"b": 2}\r'), [])
+        self.assertEqual(framer.feed(b'\n\r\n'), [b'{"b": 2}'])
+
+    def test_multiline_data_and_comments(self):
+        """Multiple data lines are joined and comments/other fields are ignored."""
+        framer = SSEFramer()
+        events = framer.feed(b': keep-alive\n\nevent: message\nid: 7\ndata: line1\ndata:line2\n\n')
+        self.assertEqual(events, [b'line1\nline2'])
+
+    def test_flush_unterminated_event(self):
+        """A final event without a blank line is returned by flush."""
+        framer = SSEFramer()
+        self.assertEqual(framer.feed(b'data: [DONE]\n'), [])
+        self.assertEqual(framer.flush(), [b'[DONE]'])
+        self.assertEqual(framer.flush(), [])
+
+
+class TestStreamMetrics(unittest.TestCase):
+    """Test cases for StreamMetrics."""
+
+    def test_usage_and_finish_reason_in_coalesced_chunk(self):
+        """Usage and finish reason are captured when events share a chunk."""
+        metrics = StreamMetrics("req_test")
+        metrics.feed(
+            sse_event({"choices": [{"delta": {"content": "Hi"}, "finish_reason": None}]})
+            + sse_event({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+            + sse_event({"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}})
+            + b"data: [DONE]\n\n"
+        )
+        metrics.finish()
+
+        self.assertEqual(metrics.finish_reason, "stop")
+        self.assertEqual(metrics.final_usage["total_tokens"], 7)
+        self.assertTrue(metrics.done)
+
+    def test_usage_split_across_chunks(self):
+        """Usage is captured when its event is split across reads."""
+        raw = sse_event({"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}})
+        metrics = StreamMetrics("req_test")
+        for i in range(0, len(raw), 7):
+            metrics.feed(raw[i:i + 7])
+        metrics.finish()
+
+        self.assertEqual(metrics.final_usage, {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7})
+        self.assertEqual(metrics.finish_reason, "stream_complete")
+
+    def test_only_candidate_events_are_parsed(self):
+        """Content deltas are not JSON-parsed; usage and finish_reason events are."""
+        metrics = StreamMetrics("req_test")
+        for i in range(10):
+            metrics.feed(sse_event({"choices": [{"delta": {"content": str(i)}, "finish_reason": None}], "usage": None}))
+        metrics.feed(b'data: {"choices":[{"delta":{},"finish_reason":"length"}]}\n\n')
+        metrics.feed(sse_event({"choices": [], "usage": {"prompt_tokens": 1, "completion_tokens": 10, "total_tokens": 11}}))
+        metrics.feed(b"data: [DONE]\n\n")
+
+        self.assertEqual(metrics.event_count, 13)
+        self.assertEqual(metrics.parsed_count, 2)
+        self.assertEqual(metrics.finish_reason, "length")
+        self.assertEqual(metrics.final_usage["completion_tokens"], 10)
+        self.assertTrue(metrics.done)
+
+    def test_inter_token_latency(self):
+        """Gaps are measured between chunks that carry generated content."""
+        metrics = StreamMetrics("req_test")
+        metrics.feed(sse_event({"choices": [{"delta": {"role": "assistant", "content": ""}}]}), now=0.0)
+        metrics.feed(sse_event({"choices": [{"delta": {"content": "a"}}]}), now=1.0)
+        metrics.feed(sse_event({"choices": [{"delta": {"content": "b"}}]}), now=1.010)
+        # Two events in one chunk arrive together and form a single gap
+        metrics.feed(
+            sse_event({"choices": [{"delta": {"content": "c"}}]}) + sse_event({"choices": [{"delta": {"content": "d"}}]}),
+            now=1.030
+        )
+        metrics.feed(sse_event({"choices": [{"delta": {"content": "e"}}]}), now=1.130)
+        metrics.feed(sse_event({"choices": [{"delta": {}, "finish_reason": "stop"}]}), now=5.0)
+        metrics.feed(b"data: [DONE]\n\n", now=6.0)
+
+        stats = metrics.itl_stats()
+        self.assertEqual(metrics.itl.count, 3)
+        self.assertAlmostEqual(stats["itl_mean_ms"], 130 / 3, places=6)
+        self.assertAlmostEqual(stats["itl_max_ms"], 100.0, places=6)
+        self.assertAlmostEqual(stats["itl_p50_ms"], 20.0, delta=0.5)
+
+    def test_no_inter_token_latency_for_single_chunk(self):
+        """A single content chunk yields no ITL statistics."""
+        metrics = StreamMetrics("req_test")
+        metrics.feed(sse_event({"choices": [{"delta": {"content": "all at once"}}]}), now=1.0)
+
+        self.assertEqual(set(metrics.itl_stats().values()), {None})
+
+    def test_malformed_usage_fallback(self):
+        """Usage is still extracted from an event that is not valid JSON."""
+        metrics = StreamMetrics("req_test")
+        metrics.feed(b'data: {"usage":{"prompt_tokens":1,"completion_tokens":2,"total_tokens":3}\n\n')
+
+        self.assertEqual(metrics.final_usage, {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
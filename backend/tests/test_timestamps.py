@@ -0,0 +1,47 @@
+"""
+Tests for epoch millisecond timestamps and the API date parameters.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from backend.api.metrics import get_metrics
+from backend.utils.timestamps import parse_timestamp, format_timestamp
+
+
+class TestTimestamps(unittest.TestCase):
+    """Test cases for parse_timestamp and format_timestamp."""
+
+    def test_iso_formats_give_the_same_instant(self):
+        """Dates with and without Z, offsets, fractions or a space separator all parse to UTC epoch milliseconds."""
+        expected = 1705312800000
+        for value in ["2024-01-15T10:00:00", "2024-01-15T10:00:00Z", "2024-01-15T10:00:00.000Z",
+                      "2024-01-15 10:00:00", "2024-01-15T11:00:00+01:00", str(expected)]:
+            with self.subTest(value=value):
+                self.assertEqual(parse_timestamp(value), expected)
+        self.assertEqual(parse_timestamp("2024-01-15"), expected - 10 * 3600 * 1000)
+
+    def test_invalid_timestamp(self):
+        with self.assertRaises(ValueError):
+            parse_timestamp("yesterday")
+
+    def test_format_round_trips(self):
+        """Formatted times are naive UTC ISO strings that parse back to the same milliseconds."""
+        self.assertEqual(format_timestamp(1705312800250), "2024-01-15T10:00:00.250")
+        self.assertEqual(parse_timestamp(format_timestamp(1705312800250)), 1705312800250)
+
+    @patch('backend.api.metrics.completion_requests_dao')
+    def test_api_parses_dates_once(self, mock_dao):
+        """The API hands the DAO epoch milliseconds and rejects dates it cannot parse."""
+        get_metrics("2024-01-15T10:00:00.000Z", None)
+        mock_dao.get_metrics.assert_called_once_with(1705312800000, None)
+
+        with self.assertRaises(HTTPException) as raised:
+            get_metrics("last tuesday", None)
+        self.assertEqual(raised.exception.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for the shared upstream HTTP client pool.
+"""
+
+import unittest
+import httpx
+
+from backend.services.upstream_client import UpstreamClientPool
+
+
+class TestUpstreamClientPool(unittest.IsolatedAsyncioTestCase):
+    """Test cases for UpstreamClientPool."""
+
+    async def asyncSetUp(self):
+        """Create a pool whose backend is served by a mock transport."""
+        self.pool = UpstreamClientPool(max_connections=4, max_keepalive_connections=2)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b'data: {"ok": true}\n\n')
+
+        self.pool._clients["http://backend"] = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        """Close the pool."""
+        await self.pool.close()
+
+    async def test_client_is_reused(self):
+        """The same client is returned for every request to a backend."""
+        first = self.pool.get_client("http://backend")
+        second = self.pool.get_client("http://backend")
+        self.assertIs(first, second)
+
+    async def test_request_updates_counters(self):
+        """Completed requests are counted and leave nothing in flight."""
+        response = await self.pool.request("http://backend", "GET", "/v1/models")
+        self.assertEqual(response.status_code, 200)
+
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["requests_total"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["peak_in_flight"], 1)
+        self.assertIn("http://backend", stats["backends"])
+
+    async def test_stream_tracks_in_flight(self):
+        """Streams are in flight until the context manager exits."""
+        async with self.pool.stream("http://backend", "POST", "/v1/chat/completions") as response:
+            self.assertEqual(self.pool.in_flight, 1)
+            body = await response.aread()
+
+        self.assertEqual(body, b'data: {"ok": true}\n\n')
+        self.assertEqual(self.pool.in_flight, 0)
+
+    async def test_connect_timeout_is_separate(self):
+        """Connections time out much sooner than responses, so a down backend fails fast."""
+        pool = UpstreamClientPool(timeout=300.0, connect_timeout=5.0)
+        client = pool.get_client("http://other")
+        self.assertEqual((client.timeout.connect, client.timeout.read), (5.0, 300.0))
+        await pool.close()
+
+    async def test_close_releases_clients(self):
+        """Closing the pool drops all clients."""
+        await self.pool.close()
+        self.assertEqual(self.pool.get_stats()["backends"], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
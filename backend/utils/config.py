@@ -3,7 +3,12 @@ Configuration management for the LLM Metrics Proxy.
 """
 
 import os
-from typing import Optional
+from typing import List, Optional
+
+
+def _env_bool(name: str, default: str = "false") -> bool:
+    """Read a boolean flag from the environment."""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
 
 
 class Config:
@@ -12,13 +17,117 @@ class Config:
     # Backend configuration
     BACKEND_HOST: str = os.getenv("BACKEND_HOST", "ollama")
     BACKEND_PORT: int = int(os.getenv("BACKEND_PORT", "11434"))
-    
+    # Comma-separated replica URLs; when unset the single BACKEND_HOST:BACKEND_PORT backend is used
+    BACKEND_URLS: str = os.getenv("BACKEND_URLS", "")
+    # Model routing table: "pattern=url[,url...];..." with exact names or glob patterns; others go to BACKEND_URLS
+    MODEL_ROUTES: str = os.getenv("MODEL_ROUTES", "")
+
+    # Backend routing and health checking
+    ROUTING_STRATEGY: str = os.getenv("ROUTING_STRATEGY", "least_outstanding")  # least_outstanding or ewma_ttft
+    ROUTING_EWMA_ALPHA: float = float(os.getenv("ROUTING_EWMA_ALPHA", "0.3"))
+    BACKEND_FAILURE_THRESHOLD: int = int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3"))
+    BACKEND_EJECT_SECONDS: float = float(os.getenv("BACKEND_EJECT_SECONDS", "30.0"))
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv("HEALTH_CHECK_INTERVAL", "10.0"))  # 0 disables active checks
+    HEALTH_CHECK_PATH: str = os.getenv("HEALTH_CHECK_PATH", "/v1/models")
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5.0"))
+
+    # Per-backend circuit breakers over a rolling window of request outcomes
+    CIRCUIT_BREAKER_ENABLED: bool = _env_bool("CIRCUIT_BREAKER_ENABLED")
+    CIRCUIT_WINDOW: float = float(os.getenv("CIRCUIT_WINDOW", "10.0"))  # seconds of outcomes the rates cover
+    CIRCUIT_MIN_REQUESTS: int = int(os.getenv("CIRCUIT_MIN_REQUESTS", "20"))  # in the window before the circuit can open
+    CIRCUIT_ERROR_RATE: float = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))  # failed fraction that opens the circuit
+    CIRCUIT_SLOW_MS: float = float(os.getenv("CIRCUIT_SLOW_MS", "0"))  # first byte time counted as slow, 0 disables
+    CIRCUIT_SLOW_RATE: float = float(os.getenv("CIRCUIT_SLOW_RATE", "0.5"))  # slow fraction that opens the circuit
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30.0"))  # before probing again
+    CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "3"))  # successes needed to close
+
     # Proxy configuration
     PROXY_PORT: int = int(os.getenv("PROXY_PORT", "8000"))
     
+    # Request body parsing: "partial" scans only the top-level fields, "full" parses the whole body
+    REQUEST_PARSE_MODE: str = os.getenv("REQUEST_PARSE_MODE", "partial")
+    # Forward large request bodies upstream as they arrive instead of buffering them
+    REQUEST_BODY_STREAMING: bool = _env_bool("REQUEST_BODY_STREAMING")
+    REQUEST_BODY_SNIFF_BYTES: int = int(os.getenv("REQUEST_BODY_SNIFF_BYTES", "16384"))  # smaller bodies are buffered
+    MAX_REQUEST_BODY_BYTES: int = int(os.getenv("MAX_REQUEST_BODY_BYTES", "0"))  # larger bodies get a 413, 0 is unlimited
+    
+    # Upstream HTTP client configuration
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30.0"))
+    UPSTREAM_HTTP2: bool = _env_bool("UPSTREAM_HTTP2")
+    UPSTREAM_TIMEOUT: float = float(os.getenv("UPSTREAM_TIMEOUT", "300.0"))
+    UPSTREAM_CONNECT_TIMEOUT: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10.0"))  # seconds to open a connection
+    
+    # Response cache for deterministic (temperature 0) requests
+    RESPONSE_CACHE_ENABLED: bool = _env_bool("RESPONSE_CACHE_ENABLED")
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_DB_PATH: str = os.getenv("RESPONSE_CACHE_DB_PATH", "")  # optional on-disk tier
+
+    # Single-flight coalescing of identical deterministic requests
+    COALESCE_ENABLED: bool = _env_bool("COALESCE_ENABLED")
+    COALESCE_STREAMS: bool = _env_bool("COALESCE_STREAMS")  # also share streamed responses
+
+    # Cached /v1/models list, served stale while it is refreshed in the background
+    MODELS_CACHE_TTL: float = float(os.getenv("MODELS_CACHE_TTL", "30"))  # 0 disables the cache
+    MODELS_CACHE_MAX_STALE: float = float(os.getenv("MODELS_CACHE_MAX_STALE", "300"))
+    MODELS_VALIDATE: bool = _env_bool("MODELS_VALIDATE")  # reject chat requests for unlisted models with a 404
+
+    # Hedged requests: resent to a secondary backend when the first byte is later than the model's usual
+    HEDGE_ENABLED: bool = _env_bool("HEDGE_ENABLED")
+    HEDGE_BACKEND_URL: str = os.getenv("HEDGE_BACKEND_URL", "")  # another replica of the request's pool when unset
+    HEDGE_QUANTILE: float = float(os.getenv("HEDGE_QUANTILE", "0.95"))  # first byte time percentile to wait for
+    HEDGE_BUDGET: float = float(os.getenv("HEDGE_BUDGET", "0.05"))  # hedges as a fraction of requests
+    HEDGE_WINDOW: float = float(os.getenv("HEDGE_WINDOW", "3600"))  # seconds of history the percentiles cover
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_DEFAULT_DELAY_MS: float = float(os.getenv("HEDGE_DEFAULT_DELAY_MS", "0"))  # models without history, 0 skips them
+
+    # Retries of requests that failed before their first upstream byte
+    RETRY_MAX_RETRIES: int = int(os.getenv("RETRY_MAX_RETRIES", "0"))  # per request, 0 disables retries
+    RETRY_BUDGET: float = float(os.getenv("RETRY_BUDGET", "0.1"))  # retries as a fraction of requests
+    RETRY_BACKOFF_BASE_MS: float = float(os.getenv("RETRY_BACKOFF_BASE_MS", "100"))
+    RETRY_BACKOFF_MAX_MS: float = float(os.getenv("RETRY_BACKOFF_MAX_MS", "2000"))
+
+    # Concurrency limits with an admission queue
+    CONCURRENCY_LIMIT: int = int(os.getenv("CONCURRENCY_LIMIT", "0"))  # requests at once per key, 0 is unlimited
+    CONCURRENCY_LIMIT_SCOPE: str = os.getenv("CONCURRENCY_LIMIT_SCOPE", "backend")  # backend or model
+    CONCURRENCY_LIMIT_OVERRIDES: str = os.getenv("CONCURRENCY_LIMIT_OVERRIDES", "")  # "key=limit;..." per backend URL or model
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))  # waiting requests per key before 429s
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "30.0"))  # seconds before a 503, 0 waits indefinitely
+
+    # Per-client rate limits (token buckets refilled per minute); 0 disables a budget
+    RATE_LIMIT_KEY: str = os.getenv("RATE_LIMIT_KEY", "origin")  # origin or api_key (hashed Authorization header)
+    RATE_LIMIT_REQUESTS_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "0"))
+    RATE_LIMIT_TOKENS_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "0"))
+    RATE_LIMIT_TOKEN_ESTIMATE: int = int(os.getenv("RATE_LIMIT_TOKEN_ESTIMATE", "256"))  # pre-charge without max_tokens
+    
     # Database configuration
     DB_PATH: str = os.getenv("DB_PATH", "./data/metrics.db")
+    # Applied to every (long-lived, per-thread) database connection when it is opened
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # wait for a lock before SQLITE_BUSY
+    DB_BUSY_RETRIES: int = int(os.getenv("DB_BUSY_RETRIES", "3"))  # retries of writes that still got SQLITE_BUSY
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes of the file read via mmap
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # page cache per connection
+    
+    # Metrics recording configuration (write-behind queue)
+    METRICS_QUEUE_SIZE: int = int(os.getenv("METRICS_QUEUE_SIZE", "10000"))
+    METRICS_BATCH_SIZE: int = int(os.getenv("METRICS_BATCH_SIZE", "200"))
+    METRICS_FLUSH_INTERVAL: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "0.5"))
+    METRICS_OVERFLOW_POLICY: str = os.getenv("METRICS_OVERFLOW_POLICY", "drop_newest")
+    # "local" writes the database in this process; "socket" sends records to the metrics writer process
+    METRICS_WRITER_MODE: str = os.getenv("METRICS_WRITER_MODE", "local")
+    METRICS_WRITER_SOCKET: str = os.getenv("METRICS_WRITER_SOCKET", "./data/metrics-writer.sock")
+    METRICS_WRITER_BATCH_SIZE: int = int(os.getenv("METRICS_WRITER_BATCH_SIZE", "2000"))  # commits of the writer process
+    PROXY_WORKERS: int = int(os.getenv("PROXY_WORKERS", "1"))  # more than 1 runs a writer process and socket mode
     
+    # Logging configuration
+    LOG_VOLUME: str = os.getenv("LOG_VOLUME", "requests")  # errors, requests or debug
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text or json
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_CHUNK_SAMPLE_RATE: int = int(os.getenv("LOG_CHUNK_SAMPLE_RATE", "100"))  # 1 in N chunks at debug, 0 disables
+
     # Metrics API configuration
     METRICS_PORT: int = int(os.getenv("METRICS_PORT", "8002"))
     
@@ -26,7 +135,13 @@ class Config:
     def get_backend_url(cls) -> str:
         """Get the backend base URL."""
         return f"http://{cls.BACKEND_HOST}:{cls.BACKEND_PORT}"
-    
+
+    @classmethod
+    def get_backend_urls(cls) -> List[str]:
+        """Get the base URLs of all backend replicas."""
+        urls = [url.strip().rstrip("/") for url in cls.BACKEND_URLS.split(",") if url.strip()]
+        return urls or [cls.get_backend_url()]
+
     @classmethod
     def get_db_path(cls) -> str:
         """Get the database file path."""
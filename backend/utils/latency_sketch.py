@@ -0,0 +1,114 @@
+"""
+Mergeable latency histogram with bounded relative error.
+
+Values are counted in logarithmically sized buckets, so any quantile can be
+estimated within a fixed relative error while memory grows only with the
+logarithm of the value range, not with the number of samples. Two sketches
+with the same accuracy can be merged by adding bucket counts, which makes
+them usable both per request and for aggregating many requests.
+"""
+
+import math
+from typing import Dict, Any, Optional
+
+# Values at or below this (in ms) are counted in a dedicated zero bucket
+MIN_TRACKED_VALUE = 0.001
+
+
+class LatencySketch:
+    """Log-bucketed histogram of latencies in milliseconds."""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inverse_log_gamma = 1 / math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float) -> None:
+        """Record one latency value."""
+        if self.count:
+            if value > self.max:
+                self.max = value
+            elif value < self.min:
+                self.min = value
+        else:
+            self.min = self.max = value
+        self.count += 1
+        self.sum += value
+
+        if value > MIN_TRACKED_VALUE:
+            key = math.ceil(math.log(value) * self._inverse_log_gamma)
+            buckets = self.buckets
+            buckets[key] = buckets.get(key, 0) + 1
+        else:
+            self.zero_count += 1
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1), or None if nothing was recorded."""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(k-1), gamma^k] in relative terms
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Add the samples of another sketch with the same accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        if not other.count:
+            return
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form of the sketch."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencySketch":
+        """Rebuild a sketch from to_dict output."""
+        sketch = cls(data["relative_accuracy"])
+        sketch.buckets = {int(key): count for key, count in data["buckets"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
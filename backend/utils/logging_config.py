@@ -0,0 +1,146 @@
+"""
+Logging configuration for the LLM Metrics Proxy.
+
+Records are handed to a QueueHandler and formatted and written to stderr by
+a QueueListener thread, so the event loop never blocks on log I/O. Request
+handling emits one structured record per completed request at INFO; the
+step-by-step request logs and the (sampled) per-chunk logs are DEBUG only.
+"""
+
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# LOG_VOLUME values and the root level they map to
+LOG_VOLUMES = {
+    "errors": logging.WARNING,   # Warnings and errors only
+    "requests": logging.INFO,    # Lifecycle messages plus one summary record per request
+    "debug": logging.DEBUG,      # Per-request steps and sampled per-chunk records
+}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """Emit a structured record; fields are rendered by the formatter, off the event loop."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leave message formatting to the listener thread.
+
+        Only exception info is rendered here, since traceback objects must not
+        outlive the handling frame. Callers pass immutable arguments, so the
+        record can safely be formatted later.
+        """
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with structured fields appended as key=value pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items() if value is not None)
+        return message
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with structured fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LoggingManager:
+    """Owns the root logger's queue handler and the listener thread that drains it."""
+
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.volume = "requests"
+        self.log_format = "text"
+
+    def configure(
+        self,
+        volume: str = "requests",
+        log_format: str = "text",
+        queue_size: int = 10000,
+        stream=None
+    ) -> None:
+        """Route all logging through a bounded queue drained by a background thread."""
+        if volume not in LOG_VOLUMES:
+            raise ValueError(f"Unknown LOG_VOLUME {volume!r}, expected one of {sorted(LOG_VOLUMES)}")
+        self.shutdown()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JSONFormatter() if log_format == "json" else TextFormatter(TEXT_FORMAT))
+
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=False)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(LOG_VOLUMES[volume])
+
+        self.volume = volume
+        self.log_format = log_format
+        self.listener.start()
+
+    def shutdown(self) -> None:
+        """Flush queued records and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and drop counters for the /proxy/stats endpoint."""
+        return {
+            "volume": self.volume,
+            "format": self.log_format,
+            "queue_depth": self.handler.queue.qsize() if self.handler else 0,
+            "dropped_total": self.handler.dropped if self.handler else 0,
+        }
+
+
+# Global logging manager instance
+logging_manager = LoggingManager()
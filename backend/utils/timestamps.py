@@ -0,0 +1,36 @@
+"""
+Timestamps as UTC epoch milliseconds.
+
+completion_requests stores times as integers so range filters compare
+numbers through an index instead of parsing strings. Times given to the
+API are parsed once here; naive ISO 8601 values are taken to be UTC, which
+is what the dashboard sends (Date.toISOString) and what it expects back.
+"""
+
+import time
+from datetime import datetime, timezone
+
+
+def now_ms() -> int:
+    """The current time in UTC epoch milliseconds."""
+    return int(time.time() * 1000)
+
+
+def parse_timestamp(value: str) -> int:
+    """UTC epoch milliseconds of an ISO 8601 date or time, or of an epoch milliseconds string.
+
+    Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def format_timestamp(timestamp_ms: int) -> str:
+    """ISO 8601 UTC time of epoch milliseconds, without an offset, as the dashboard reads it."""
+    moment = datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc)
+    return moment.replace(tzinfo=None).isoformat(timespec="milliseconds")
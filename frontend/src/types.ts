@@ -162,6 +162,9 @@ export interface RequestsSummary {
   successful: number;
   failed: number;
   avg_response_time_ms: number;
+  p50_response_time_ms?: number;
+  p95_response_time_ms?: number;
+  p99_response_time_ms?: number;
 }
 
 export interface TokenMetrics {
@@ -172,6 +175,15 @@ export interface TokenMetrics {
   avg_tokens_per_second?: number;
 }
 
+export interface InterTokenLatency {
+  reported_count: number;
+  avg_mean_ms?: number;
+  avg_p50_ms?: number;
+  avg_p95_ms?: number;
+  avg_p99_ms?: number;
+  max_ms?: number;
+}
+
 export interface StreamedRequests {
   total: number;
   successful: number;
@@ -182,6 +194,10 @@ export interface StreamedRequests {
   avg_time_to_first_token_ms?: number;
   avg_time_to_last_token_ms?: number;
   avg_completion_duration_ms?: number;
+  p50_time_to_first_token_ms?: number;
+  p95_time_to_first_token_ms?: number;
+  p99_time_to_first_token_ms?: number;
+  inter_token_latency?: InterTokenLatency;
 }
 
 export interface NonStreamedRequests {
@@ -201,9 +217,32 @@ export interface Requests {
   non_streamed: NonStreamedRequests;
 }
 
+export interface BackendMetrics {
+  total: number;
+  successful: number;
+  failed: number;
+  avg_response_time_ms: number;
+  avg_time_to_first_token_ms?: number;
+  avg_itl_p95_ms?: number;
+  avg_queue_time_ms?: number;
+}
+
+export interface ResponseCacheMetrics {
+  hits: number;
+  hit_ratio: number;
+  saved_time_ms: number;
+  avg_hit_response_time_ms?: number;
+}
+
 export interface Metrics {
   timestamp: string;
   requests: Requests;
   model_distribution: { [key: string]: number };
   origin_distribution: { [key: string]: number };
+  backend_distribution: { [key: string]: BackendMetrics };
+  response_cache?: ResponseCacheMetrics;
+  coalesced_requests: number;
+  hedged_requests: number;
+  hedge_wins: number;
+  retried_requests: number;
 }
@@ -50,6 +50,9 @@ class RequestsSummary(BaseModel):
     successful: int
     failed: int
     avg_response_time_ms: float
+    p50_response_time_ms: Optional[float] = None
+    p95_response_time_ms: Optional[float] = None
+    p99_response_time_ms: Optional[float] = None
 
 
 class TokenMetrics(BaseModel):
@@ -66,6 +69,19 @@ class TokenMetrics(BaseModel):
         }
 
 
+class InterTokenLatency(BaseModel):
+    """Inter-token latency statistics of streamed requests.
+    
+    Percentiles are computed per request; these are their averages across requests.
+    """
+    reported_count: int
+    avg_mean_ms: Optional[float] = None
+    avg_p50_ms: Optional[float] = None
+    avg_p95_ms: Optional[float] = None
+    avg_p99_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+
+
 class StreamedRequests(BaseModel):
     """Streaming requests statistics."""
     total: int
@@ -77,6 +93,10 @@ class StreamedRequests(BaseModel):
     avg_time_to_first_token_ms: Optional[float] = None
     avg_time_to_last_token_ms: Optional[float] = None
     avg_completion_duration_ms: Optional[float] = None
+    p50_time_to_first_token_ms: Optional[float] = None
+    p95_time_to_first_token_ms: Optional[float] = None
+    p99_time_to_first_token_ms: Optional[float] = None
+    inter_token_latency: Optional[InterTokenLatency] = None
 
 
 class NonStreamedRequests(BaseModel):
@@ -98,12 +118,37 @@ class Requests(BaseModel):
     non_streamed: NonStreamedRequests
 
 
+class BackendMetrics(BaseModel):
+    """Request and latency statistics of one backend replica."""
+    total: int
+    successful: int
+    failed: int
+    avg_response_time_ms: float
+    avg_time_to_first_token_ms: Optional[float] = None  # successful streamed requests
+    avg_itl_p95_ms: Optional[float] = None
+    avg_queue_time_ms: Optional[float] = None  # requests that went through admission control
+
+
+class ResponseCacheMetrics(BaseModel):
+    """Requests answered from the response cache."""
+    hits: int
+    hit_ratio: float  # hits / all requests
+    saved_time_ms: int  # backend time of the original responses that hits replayed
+    avg_hit_response_time_ms: Optional[float] = None
+
+
 class Metrics(BaseModel):
     """Complete metrics data structure with new nested API design."""
     timestamp: str
     requests: Requests
     model_distribution: Dict[str, int]
     origin_distribution: Dict[str, int]
+    backend_distribution: Dict[str, BackendMetrics] = Field(default_factory=dict)
+    response_cache: Optional[ResponseCacheMetrics] = None
+    coalesced_requests: int = 0  # requests that shared an identical in-flight request's upstream call
+    hedged_requests: int = 0  # requests also sent to a second backend because their first byte was late
+    hedge_wins: int = 0  # hedged requests answered by the second backend
+    retried_requests: int = 0  # requests sent again after failing before their first upstream byte
     
     class Config:
         json_encoders = {